@@ -2,13 +2,29 @@
 FastAPI Backend Server
 API server for Kubernetes deployment and load testing
 Supports multi-user isolation
+
+Middleware policy: do not use Starlette's BaseHTTPMiddleware (@app.middleware("http")
+or subclasses) in this module - it wraps every request in an extra task and buffers
+the body, which roughly halves throughput. Write custom middleware as plain ASGI
+classes with `async def __call__(self, scope, receive, send)` and read anything
+request-scoped (e.g. user id for logging) from scope["path"] / scope["headers"].
 """
+import asyncio
+import hashlib
 import os
+import re
 import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, Optional, List
-from fastapi import FastAPI, HTTPException
+from typing import Dict, Optional, List, Tuple
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
 
@@ -19,22 +35,65 @@ sys.path.insert(0, str(project_root))
 # Import original modules (need to import from src directory)
 sys.path.insert(0, str(project_root / "src"))
 
+# Data directories (resolved once at import)
+_USERS_DIR = project_root / "data" / "users"
+_GLOBAL_DIR = project_root / "data"
+_CHROMA_DIR = _GLOBAL_DIR / "chromadb"  # one shared ChromaDB, one collection per user
+
+# Characters allowed in ChromaDB collection names
+_COLLECTION_NAME_RE = re.compile(r'[a-zA-Z0-9_-]*[a-zA-Z0-9]')
+_UNSAFE_NAME_CHARS_RE = re.compile(r'[^a-zA-Z0-9_-]')
+
 from src.infrastructure.config_manager import ConfigManager
-from src.infrastructure.memory.vector_store import VectorMemoryStore
+from src.infrastructure.api_clients.system_prompt import SystemPrompt
+from src.infrastructure.memory.vector_store import VectorMemoryStore, get_shared_client
 from src.domain.profile.profile_manager import ProfileManager
+from src.domain.memory.conversation_history import ConversationHistory, GREETING_WORDS
 from src.domain.ai.profile_extractor import ProfileExtractor
 from src.domain.ai.providers.mock_provider import MockAIProvider
 from src.domain.ai.providers.openai_provider import OpenAIProvider
 from src.domain.ai.providers.claude_provider import ClaudeProvider
 from src.domain.ai.providers.gemini_provider import GeminiProvider
 
+# Mock mode (for testing/load testing), read once at import
+USE_MOCK_AI = os.getenv('USE_MOCK_AI', 'false').lower() == 'true'
+MOCK_RESPONSE_DELAY = float(os.getenv('MOCK_RESPONSE_DELAY', '1.0'))
+MOCK_CPU_INTENSIVE = os.getenv('MOCK_CPU_INTENSIVE', 'true').lower() == 'true'
+
+# User instance cache limits
+MAX_USER_INSTANCES = int(os.getenv("MAX_USER_INSTANCES", "1024"))
+USER_INSTANCE_IDLE_TIMEOUT = float(os.getenv("USER_INSTANCE_IDLE_TIMEOUT", "1800"))  # seconds
+USER_INSTANCE_JANITOR_INTERVAL = 60  # seconds
+
+
+async def _evict_idle_instances():
+    """Periodically evict user instances that have been idle too long"""
+    while True:
+        await asyncio.sleep(USER_INSTANCE_JANITOR_INTERVAL)
+        evicted = await run_in_threadpool(user_instances.evict_idle, USER_INSTANCE_IDLE_TIMEOUT)
+        if evicted:
+            print(f"🧹 Evicted {evicted} idle user instance(s)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the idle-instance janitor for the lifetime of the server"""
+    janitor = asyncio.create_task(_evict_idle_instances())
+    yield
+    janitor.cancel()
+
+
 app = FastAPI(
     title="AI Desktop Pet API",
     description="Backend API for AI Desktop Pet application",
-    version="2.0.0"
+    version="2.0.0",
+    # orjson serializes large conversation histories much faster than stdlib json
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS configuration (allow cross-origin access)
+# CORSMiddleware is pure ASGI, so it is allowed under the middleware policy above
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Production should restrict to specific domains
@@ -43,8 +102,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global instance storage (independent instance for each user)
-user_instances: Dict[str, Dict] = {}
+# Compress larger responses (conversation histories are repetitive JSON); also pure ASGI
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# AI provider classes by provider name (add new providers here)
+PROVIDER_FACTORIES = {
+    "openai": OpenAIProvider,
+    "claude": ClaudeProvider,
+    "gemini": GeminiProvider,
+}
+
+# Pending vector store writes per store, coalesced by _queue_vector_write
+VECTOR_WRITE_BATCH_WINDOW = 0.01  # seconds
+_pending_vector_writes: Dict[VectorMemoryStore, List[Tuple[str, str]]] = {}
 
 
 # ==================== Request/Response Models ====================
@@ -65,114 +135,255 @@ class HealthResponse(BaseModel):
     version: str
 
 
+class ConversationMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ConversationResponse(BaseModel):
+    user_id: str
+    history: List[ConversationMessage]
+
+
+class ProfileBody(BaseModel):
+    name: Optional[str] = None
+    traits: List[str]
+    goals: List[str]
+    conversation_count: int
+
+
+class ProfileResponse(BaseModel):
+    user_id: str
+    profile: Optional[ProfileBody] = None
+
+
 # ==================== Utility Functions ====================
 
-def get_user_instance(user_id: str) -> Dict:
-    """Get or create user instance (multi-user isolation)"""
-    if user_id not in user_instances:
-        # Create independent instance for each user
-        # Use absolute paths, based on project root directory
-        project_root = Path(__file__).parent.parent.parent
-        user_data_dir = project_root / "data" / "users" / user_id
-        global_data_dir = project_root / "data"
-        
-        user_data_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Initialize ConfigManager (use user-specific directory, support fallback to global config)
-        config_manager = ConfigManager(base_dir=str(user_data_dir), fallback_dir=str(global_data_dir))
-        
-        # Debug: check config file paths
-        print(f"🔍 Config paths for user {user_id}:")
-        print(f"   User config: {user_data_dir / 'config.json'} (exists: {(user_data_dir / 'config.json').exists()})")
-        print(f"   Global config: {global_data_dir / 'config.json'} (exists: {(global_data_dir / 'config.json').exists()})")
-        
-        # Initialize AI Provider
-        # Prioritize real API, even if USE_MOCK_AI=true, use real Provider if API key exists
-        provider_name = os.getenv('AI_PROVIDER', config_manager.get_ai_provider())
-        api_key = os.getenv(f'{provider_name.upper()}_API_KEY') or config_manager.get_api_key(provider_name)
-        model = os.getenv(f'{provider_name.upper()}_MODEL') or config_manager.get_model(provider_name)
+class UserInstanceCache:
+    """
+    LRU cache of user instances (thread-safe)
+    
+    Holds at most maxsize instances; the least recently used one is evicted
+    when full. Evicted instances have their resources released.
+    """
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._instances: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        """Get instance and mark it as recently used (None if not cached)"""
+        with self._lock:
+            instance = self._instances.get(user_id)
+            if instance is not None:
+                self._instances.move_to_end(user_id)
+                instance['_last_used'] = time.monotonic()
+            return instance
+    
+    def add(self, user_id: str, instance: Dict) -> Dict:
+        """
+        Add instance, evicting least recently used ones if over maxsize
         
-        print(f"🔍 Debug - User {user_id}:")
-        print(f"   Provider: {provider_name}")
-        print(f"   Model: {model}")
-        print(f"   API Key present: {bool(api_key)}")
-        print(f"   API Key length: {len(api_key) if api_key else 0}")
-        print(f"   USE_MOCK_AI env: {os.getenv('USE_MOCK_AI', 'false')}")
+        Returns:
+            The cached instance (an existing one wins if another request added it first)
+        """
+        evicted = []
+        with self._lock:
+            existing = self._instances.get(user_id)
+            if existing is not None:
+                evicted.append(instance)
+                instance = existing
+            else:
+                instance['_last_used'] = time.monotonic()
+                self._instances[user_id] = instance
+                while len(self._instances) > self.maxsize:
+                    evicted.append(self._instances.popitem(last=False)[1])
         
-        # Check if Mock mode is forced (for testing/load testing)
-        use_mock = os.getenv('USE_MOCK_AI', 'false').lower() == 'true'
+        for old_instance in evicted:
+            _release_instance(old_instance)
+        return instance
+    
+    def evict_idle(self, max_idle: float) -> int:
+        """Evict instances not used for more than max_idle seconds, returns count"""
+        cutoff = time.monotonic() - max_idle
+        evicted = []
+        with self._lock:
+            # Entries are ordered by last use, so idle ones are at the front
+            while self._instances:
+                user_id, instance = next(iter(self._instances.items()))
+                if instance['_last_used'] >= cutoff:
+                    break
+                del self._instances[user_id]
+                evicted.append(instance)
         
-        if use_mock:
-            # Force Mock mode (even with API key, for testing scenarios)
-            response_delay = float(os.getenv('MOCK_RESPONSE_DELAY', '1.0'))
-            cpu_intensive = os.getenv('MOCK_CPU_INTENSIVE', 'true').lower() == 'true'
-            ai_provider = MockAIProvider(
-                response_delay=response_delay,
-                cpu_intensive=cpu_intensive
-            )
-            print(f"⚠ Using Mock Provider (USE_MOCK_AI=true, for testing/load testing)")
-        elif api_key:
-            # Use real AI Provider
-            if provider_name == "openai":
-                ai_provider = OpenAIProvider(api_key=api_key, model=model)
-                print(f"✓ OpenAI Provider initialized successfully")
-            elif provider_name == "claude":
-                ai_provider = ClaudeProvider(api_key=api_key, model=model)
-                print(f"✓ Claude Provider initialized successfully")
-            elif provider_name == "gemini":
-                ai_provider = GeminiProvider(api_key=api_key, model=model)
-                print(f"✓ Gemini Provider initialized successfully")
-            else:
-                print(f"⚠ Warning: Unknown provider {provider_name}, using Mock Provider")
-                ai_provider = MockAIProvider()
+        for instance in evicted:
+            _release_instance(instance)
+        return len(evicted)
+    
+    def __len__(self) -> int:
+        return len(self._instances)
+
+
+def _release_instance(instance: Dict):
+    """Flush and close resources held by an evicted user instance"""
+    try:
+        if instance['profile_manager']:
+            instance['profile_manager'].save_profile()
+        if instance['vector_store']:
+            instance['vector_store'].close()
+    except Exception as e:
+        print(f"⚠ Warning: Failed to release user instance: {e}")
+
+
+# User instances (multi-user isolation), bounded to avoid unbounded growth under load
+user_instances = UserInstanceCache(maxsize=MAX_USER_INSTANCES)
+
+
+def _collection_name(user_id: str) -> str:
+    """Get the user's ChromaDB collection name (max 63 chars of [a-zA-Z0-9_-])"""
+    name = f"user_{user_id}"
+    if len(name) > 63 or not _COLLECTION_NAME_RE.fullmatch(name):
+        # Keep a readable prefix, the digest keeps distinct user ids distinct
+        digest = hashlib.md5(user_id.encode("utf-8")).hexdigest()
+        name = f"user_{_UNSAFE_NAME_CHARS_RE.sub('_', user_id)[:25]}_{digest}"
+    return name
+
+
+def _migrate_legacy_memory(vector_store: VectorMemoryStore, user_data_dir: Path):
+    """
+    Copy a user's per-user ChromaDB store (data/users/<id>/chromadb, used before the
+    shared client) into their collection, once
+    
+    The old store is kept as a backup; a marker file records the completed copy,
+    so a failed copy is retried on the next start.
+    """
+    legacy_dir = user_data_dir / "chromadb"
+    marker = user_data_dir / "chromadb.migrated"
+    if not legacy_dir.is_dir() or marker.exists():
+        return
+    try:
+        copied = vector_store.import_collection(str(legacy_dir))
+        marker.touch()
+        print(f"✓ Migrated {copied} conversations from {legacy_dir}")
+    except Exception as e:
+        print(f"⚠ Warning: Failed to migrate long-term memory from {legacy_dir}: {e}")
+
+
+def _build_instance(user_id: str) -> Dict:
+    """Create user instance (multi-user isolation)"""
+    # Create independent instance for each user
+    # Use absolute paths, based on project root directory
+    user_data_dir = _USERS_DIR / user_id
+    global_data_dir = _GLOBAL_DIR
+    
+    user_data_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Initialize ConfigManager (use user-specific directory, support fallback to global config)
+    config_manager = ConfigManager(base_dir=str(user_data_dir), fallback_dir=str(global_data_dir))
+    
+    # Debug: check config file paths
+    print(f"🔍 Config paths for user {user_id}:")
+    print(f"   User config: {user_data_dir / 'config.json'} (exists: {(user_data_dir / 'config.json').exists()})")
+    print(f"   Global config: {global_data_dir / 'config.json'} (exists: {(global_data_dir / 'config.json').exists()})")
+    
+    # Initialize AI Provider
+    # Prioritize real API, even if USE_MOCK_AI=true, use real Provider if API key exists
+    provider_name = os.getenv('AI_PROVIDER', config_manager.get_ai_provider())
+    api_key = os.getenv(f'{provider_name.upper()}_API_KEY') or config_manager.get_api_key(provider_name)
+    model = os.getenv(f'{provider_name.upper()}_MODEL') or config_manager.get_model(provider_name)
+    
+    print(f"🔍 Debug - User {user_id}:")
+    print(f"   Provider: {provider_name}")
+    print(f"   Model: {model}")
+    print(f"   API Key present: {bool(api_key)}")
+    print(f"   API Key length: {len(api_key) if api_key else 0}")
+    print(f"   USE_MOCK_AI: {USE_MOCK_AI}")
+    
+    # Check if Mock mode is forced (for testing/load testing)
+    if USE_MOCK_AI:
+        # Force Mock mode (even with API key, for testing scenarios)
+        ai_provider = MockAIProvider(
+            response_delay=MOCK_RESPONSE_DELAY,
+            cpu_intensive=MOCK_CPU_INTENSIVE
+        )
+        print(f"⚠ Using Mock Provider (USE_MOCK_AI=true, for testing/load testing)")
+    elif api_key:
+        # Use real AI Provider
+        provider_cls = PROVIDER_FACTORIES.get(provider_name)
+        if provider_cls:
+            ai_provider = provider_cls(api_key=api_key, model=model)
+            print(f"✓ {provider_cls.__name__} initialized successfully")
         else:
-            # No API key, no forced Mock, use Mock as fallback
-            print(f"⚠ Warning: No API key found for {provider_name}, using Mock Provider")
+            print(f"⚠ Warning: Unknown provider {provider_name}, using Mock Provider")
             ai_provider = MockAIProvider()
-        
-        instance = {
-            'config_manager': config_manager,
-            'vector_store': None,
-            'profile_manager': None,
-            'ai_provider': ai_provider,
-            'profile_extractor': ProfileExtractor(ai_provider) if ai_provider else None,
-            'conversation_history': [],
-        }
-        
-        # Initialize vector store (user-specific)
-        try:
-            instance['vector_store'] = VectorMemoryStore(
-                persist_directory=str(user_data_dir / "chromadb")
-            )
-        except Exception as e:
-            print(f"⚠ Warning: Failed to initialize vector store for user {user_id}: {e}")
-        
-        # Initialize user profile (user-specific)
-        try:
-            instance['profile_manager'] = ProfileManager(
-                profile_file=user_data_dir / "user_profile.json"
-            )
-        except Exception as e:
-            print(f"⚠ Warning: Failed to initialize profile manager for user {user_id}: {e}")
-        
-        user_instances[user_id] = instance
+    else:
+        # No API key, no forced Mock, use Mock as fallback
+        print(f"⚠ Warning: No API key found for {provider_name}, using Mock Provider")
+        ai_provider = MockAIProvider()
+    
+    instance = {
+        'config_manager': config_manager,
+        'vector_store': None,
+        'profile_manager': None,
+        'ai_provider': ai_provider,
+        'profile_extractor': ProfileExtractor(ai_provider) if ai_provider else None,
+        'conversation_history': ConversationHistory(max_messages=20),
+        '_prompt_prefix_cache': None,  # (personality.json mtimes, prefix parts, has_output_example)
+        '_profile_summary_cache': None,  # (profile, profile version, summary text)
+        '_last_used': 0.0,  # time.monotonic() of last access, maintained by UserInstanceCache
+    }
+    
+    # Initialize vector store (user-specific collection in the shared client)
+    try:
+        instance['vector_store'] = VectorMemoryStore(
+            client=get_shared_client(str(_CHROMA_DIR)),
+            collection_name=_collection_name(user_id)
+        )
+        _migrate_legacy_memory(instance['vector_store'], user_data_dir)
+    except Exception as e:
+        print(f"⚠ Warning: Failed to initialize vector store for user {user_id}: {e}")
     
-    return user_instances[user_id]
+    # Initialize user profile (user-specific)
+    try:
+        instance['profile_manager'] = ProfileManager(
+            profile_file=user_data_dir / "user_profile.json"
+        )
+    except Exception as e:
+        print(f"⚠ Warning: Failed to initialize profile manager for user {user_id}: {e}")
+    
+    return instance
 
 
-def build_system_prompt(instance: Dict, include_rag: bool = True) -> str:
+def get_user_instance(user_id: str) -> Dict:
+    """Get or create user instance (usable as a FastAPI dependency)"""
+    instance = user_instances.get(user_id)
+    if instance is None:
+        # Build outside the cache lock so new users don't serialize on each other
+        instance = user_instances.add(user_id, _build_instance(user_id))
+    return instance
+
+
+# Character config fields included in the system prompt, in order: (key, label)
+_CHARACTER_FIELDS = (
+    ("personality", "Personality"),
+    ("backstory", "Backstory"),
+    ("traits", "Traits"),
+    ("preferences", "Preferences"),
+    ("worldview_background", "Worldview Background"),
+    ("worldview_setting", "Worldview Setting"),
+)
+
+
+def _build_prompt_prefix(config_manager: ConfigManager) -> Tuple[List[str], bool]:
     """
-    Build system prompt (consistent with GUI version)
+    Build the static part of the system prompt (sections 1-2)
     
-    System Prompt Structure:
-    1. CRITICAL: Output Example & Performance (highest priority, placed first)
-    2. Character Personality
-    3. User Profile (from JSON)
-    4. Relevant Past Conversations (RAG)
-    5. Guidelines (if output_example doesn't exist, use default guidelines)
+    Returns:
+        (prompt parts, whether output example/notes guidance exists)
     """
     parts = []
-    character_config = instance['config_manager'].load_character_config()
+    character_config = config_manager.load_character_config()
     
     # ===== 1. CRITICAL: Output Example & Performance (highest priority, placed first) =====
     # This is the most important part: strictly follow user-set performance to generate messages
@@ -195,65 +406,144 @@ def build_system_prompt(instance: Dict, include_rag: bool = True) -> str:
             has_output_example = True
     
     # ===== 2. Character Personality (full mode, no truncation) =====
-    if character_config.get("personality"):
-        personality = character_config['personality']
-        parts.append(f"Personality: {personality}")
-    
-    # Other config items always added
-    if character_config.get("backstory"):
-        parts.append(f"Backstory: {character_config['backstory']}")
-    if character_config.get("traits"):
-        parts.append(f"Traits: {character_config['traits']}")
-    if character_config.get("preferences"):
-        parts.append(f"Preferences: {character_config['preferences']}")
-    if character_config.get("worldview_background"):
-        parts.append(f"Worldview Background: {character_config['worldview_background']}")
-    if character_config.get("worldview_setting"):
-        parts.append(f"Worldview Setting: {character_config['worldview_setting']}")
+    # Personality first, other config items always added when present
+    parts.extend(
+        f"{label}: {value}"
+        for key, label in _CHARACTER_FIELDS
+        if (value := character_config.get(key))
+    )
     
     # Fallback to simple personality if no detailed config
     if not any("Personality:" in p for p in parts):
-        personality = instance['config_manager'].load_personality()
+        personality = config_manager.load_personality()
         if personality:
             parts.append(f"Personality: {personality}")
         else:
             parts.append("You are a friendly and supportive AI companion.")
     
+    return parts, has_output_example
+
+
+def _file_mtime(path: Optional[Path]) -> Optional[int]:
+    """Get file modification time (None if missing)"""
+    if path is None:
+        return None
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_prompt_prefix(instance: Dict) -> Tuple[List[str], bool]:
+    """Get the cached static prompt prefix, rebuilt when personality.json changes"""
+    config_manager = instance['config_manager']
+    fallback_file = config_manager.fallback_dir / "personality.json" if config_manager.fallback_dir else None
+    cache_key = (_file_mtime(config_manager.personality_file), _file_mtime(fallback_file))
+    
+    cached = instance['_prompt_prefix_cache']
+    if cached is None or cached[0] != cache_key:
+        cached = (cache_key, *_build_prompt_prefix(config_manager))
+        instance['_prompt_prefix_cache'] = cached
+    return cached[1], cached[2]
+
+
+def _build_profile_summary(profile) -> str:
+    """Build the compact one-line user profile for the system prompt"""
+    profile_summary = []
+    
+    if profile.name:
+        profile_summary.append(f"User: {profile.name}")
+    
+    if profile.personality_traits:
+        # Only take first 3 traits
+        traits = ", ".join(profile.personality_traits[:3])
+        profile_summary.append(f"Traits: {traits}")
+    
+    if profile.goals:
+        # Show first 3 goals
+        goals = ", ".join(profile.goals[:3])
+        profile_summary.append(f"Goals: {goals}")
+    
+    # Add important facts - this is key user information
+    if profile.facts:
+        facts = ", ".join(profile.facts[:5])  # Show first 5 facts
+        profile_summary.append(f"Important facts: {facts}")
+    
+    return " | ".join(profile_summary)
+
+
+def _get_profile_summary(instance: Dict) -> str:
+    """Get the cached profile summary, rebuilt when the profile changes"""
+    profile = instance['profile_manager'].get_profile()
+    cached = instance['_profile_summary_cache']
+    if cached is None or cached[0] is not profile or cached[1] != profile.version:
+        cached = (profile, profile.version, _build_profile_summary(profile))
+        instance['_profile_summary_cache'] = cached
+    return cached[2]
+
+
+# Default guidelines, one per response length tier (roughly 50 tokens = 1 sentence)
+_GUIDELINES_TEMPLATE = """Guidelines:
+- Use the user profile information naturally in conversation
+- Reference relevant past conversations when appropriate
+- Stay consistent with your personality
+- Be proactive and caring
+- IMPORTANT: Keep responses concise ({target_sentences} sentences, {target_words} words). Express your complete thought in these few sentences - be brief but complete. Do not start a long response that gets cut off."""
+_GUIDELINES_SHORT = _GUIDELINES_TEMPLATE.format(target_sentences="1-2", target_words="30-50")    # max_tokens <= 100
+_GUIDELINES_MED = _GUIDELINES_TEMPLATE.format(target_sentences="2-3", target_words="50-80")      # max_tokens <= 200
+_GUIDELINES_LONG = _GUIDELINES_TEMPLATE.format(target_sentences="2-4", target_words="80-120")    # larger
+
+
+# Messages up to this size can be small talk that skips the memory search
+TRIVIAL_MAX_CHARS = 16
+TRIVIAL_MAX_WORDS = 2
+
+
+def _is_trivial(message: str) -> bool:
+    """
+    Whether a message is small talk not worth a memory search ("hi", "ok thanks", "你好")
+    
+    CJK text has no spaces to count words by, so non-ASCII text only counts as a greeting.
+    """
+    if len(message) > TRIVIAL_MAX_CHARS or '?' in message or '？' in message:
+        return False
+    message_lower = message.lower()
+    if any(word in message_lower for word in GREETING_WORDS):
+        return True
+    return message.isascii() and len(message.split()) <= TRIVIAL_MAX_WORDS
+
+
+def build_system_prompt(instance: Dict, include_rag: bool = True) -> str:
+    """
+    Build system prompt (consistent with GUI version)
+    
+    System Prompt Structure:
+    1. CRITICAL: Output Example & Performance (highest priority, placed first)
+    2. Character Personality
+    3. User Profile (from JSON)
+    5. Guidelines (if output_example doesn't exist, use default guidelines)
+    4. Relevant Past Conversations (RAG)
+    
+    The RAG memory changes per message, so it goes last, after the static
+    sections (see SystemPrompt), and they stay a stable cacheable prefix.
+    """
+    # Sections 1-2 only change when the character config changes
+    prefix_parts, has_output_example = _get_prompt_prefix(instance)
+    parts = list(prefix_parts)
+    
     # ===== 3. User Profile =====
     if instance['profile_manager']:
-        profile = instance['profile_manager'].get_profile()
-        profile_summary = []
-        
-        if profile.name:
-            profile_summary.append(f"User: {profile.name}")
-        
-        if profile.personality_traits:
-            # Only take first 3 traits
-            traits = ", ".join(profile.personality_traits[:3])
-            profile_summary.append(f"Traits: {traits}")
-        
-        if profile.goals:
-            # Show first 3 goals
-            goals = ", ".join(profile.goals[:3])
-            profile_summary.append(f"Goals: {goals}")
-        
-        # Add important facts - this is key user information
-        if profile.facts:
-            facts = ", ".join(profile.facts[:5])  # Show first 5 facts
-            profile_summary.append(f"Important facts: {facts}")
-        
+        profile_summary = _get_profile_summary(instance)
         if profile_summary:
-            parts.append(" | ".join(profile_summary))
+            parts.append(profile_summary)
     
     # ===== 4. Relevant Past Conversations (RAG) - Load on demand, only include high relevance memories =====
+    memory_text = ""
     if include_rag and instance['vector_store'] and instance['conversation_history']:
-        last_user_msg = ""
-        for msg in reversed(instance['conversation_history']):
-            if msg.get("role") == "user":
-                last_user_msg = msg.get("content", "")
-                break
+        last_user_msg = instance['conversation_history'].last_user_message
         
-        if last_user_msg:
+        # Greetings and acknowledgements skip the embedding + ANN search
+        if last_user_msg and not _is_trivial(last_user_msg):
             try:
                 relevant_convs = instance['vector_store'].search_relevant_conversations(
                     query=last_user_msg,
@@ -273,7 +563,6 @@ def build_system_prompt(instance: Dict, include_rag: bool = True) -> str:
                     user_msg = conv.get('user_message', '')[:100]
                     ai_resp = conv.get('ai_response', '')[:100]
                     memory_text += f"U: {user_msg}...\nA: {ai_resp}..."
-                    parts.append(memory_text)
             except Exception as e:
                 print(f"⚠ Warning: Failed to search memories: {e}")
     
@@ -282,44 +571,67 @@ def build_system_prompt(instance: Dict, include_rag: bool = True) -> str:
         # Get max_tokens to adjust response length instruction
         max_tokens = instance['config_manager'].get_max_tokens()
         
-        # Calculate target sentence count based on max_tokens
-        # Roughly: 50 tokens = 1 sentence, so adjust accordingly
         if max_tokens <= 100:
-            target_sentences = "1-2"
-            target_words = "30-50"
+            parts.append(_GUIDELINES_SHORT)
         elif max_tokens <= 200:
-            target_sentences = "2-3"
-            target_words = "50-80"
+            parts.append(_GUIDELINES_MED)
         else:
-            target_sentences = "2-4"
-            target_words = "80-120"
-        
-        parts.append(f"""Guidelines:
-- Use the user profile information naturally in conversation
-- Reference relevant past conversations when appropriate
-- Stay consistent with your personality
-- Be proactive and caring
-- IMPORTANT: Keep responses concise ({target_sentences} sentences, {target_words} words). Express your complete thought in these few sentences - be brief but complete. Do not start a long response that gets cut off.""")
+            parts.append(_GUIDELINES_LONG)
     
-    return "\n\n".join(parts)
+    return SystemPrompt("\n\n".join(parts), memory_text)
 
 
-def get_relevant_history(history: List[Dict], current_message: str) -> list:
-    """Intelligently select relevant history based on current message"""
-    message_lower = current_message.lower()
-    word_count = len(current_message.split())
+def get_relevant_history(history: ConversationHistory) -> list:
+    """Intelligently select relevant history based on current (last) message"""
+    if not history:
+        return []
     
-    is_greeting = any(word in message_lower 
-                     for word in ['hello', 'hi', '你好', '嗨', 'hey'])
+    # Metadata was computed when the current message was appended
+    word_count, is_question, is_greeting = history.meta[-1]
     is_simple = word_count < 10
-    is_question = '?' in current_message or '？' in current_message
     
     if is_greeting or (is_simple and not is_question):
-        return history[-3:] if len(history) > 3 else history
+        return history.tail(3)
     elif word_count < 30:
-        return history[-8:] if len(history) > 8 else history
+        return history.tail(8)
     else:
-        return history[-15:] if len(history) > 15 else history
+        return history.tail(15)
+
+
+def _save_to_vector_store(vector_store, conversations: List[Tuple[str, str]]):
+    """Save a batch of conversation turns to the vector store"""
+    try:
+        vector_store.add_conversations(conversations)
+    except Exception as e:
+        print(f"⚠ Warning: Failed to save to vector store: {e}")
+
+
+async def _queue_vector_write(vector_store, user_msg: str, response: str):
+    """
+    Queue a conversation turn for the vector store (runs as a background task)
+    
+    The first write for a store opens a short window; writes for the same store
+    arriving within it are flushed together with one add call (one embedding batch).
+    """
+    pending = _pending_vector_writes.get(vector_store)
+    if pending is not None:
+        pending.append((user_msg, response))
+        return
+    
+    _pending_vector_writes[vector_store] = [(user_msg, response)]
+    await asyncio.sleep(VECTOR_WRITE_BATCH_WINDOW)
+    conversations = _pending_vector_writes.pop(vector_store)
+    await run_in_threadpool(_save_to_vector_store, vector_store, conversations)
+
+
+def _update_profile_sync(instance: Dict, recent_messages: List[Dict]):
+    """Extract user info and update profile (runs as a background task)"""
+    try:
+        if instance['profile_extractor']:
+            extracted_data = instance['profile_extractor'].extract_user_info(recent_messages)
+            instance['profile_manager'].update_profile_from_ai(extracted_data)
+    except Exception as e:
+        print(f"⚠ Warning: Failed to update profile: {e}")
 
 
 # ==================== API Endpoints ====================
@@ -343,7 +655,7 @@ async def health_check():
 
 
 @app.post("/api/v1/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     """
     Process user message (supports multi-user isolation)
     
@@ -353,18 +665,15 @@ async def chat(request: ChatRequest):
     3. Build system prompt
     4. Get relevant history
     5. Call AI to generate response
-    6. Save to vector database (user-specific)
-    7. Update user profile (user-specific)
+    6. Save to vector database (user-specific, background task)
+    7. Update user profile (user-specific, background task)
     """
     try:
         print(f"📨 Received message from user {request.user_id}: {request.message[:50]}...")
         instance = get_user_instance(request.user_id)
         
         # Add to conversation history
-        instance['conversation_history'].append({
-            "role": "user",
-            "content": request.message
-        })
+        instance['conversation_history'].append("user", request.message)
         
         print(f"🤖 Using AI Provider: {type(instance['ai_provider']).__name__}")
         
@@ -372,12 +681,12 @@ async def chat(request: ChatRequest):
         system_prompt = build_system_prompt(instance, include_rag=True)
         
         # Get relevant history
-        relevant_history = get_relevant_history(instance['conversation_history'], request.message)
+        relevant_history = get_relevant_history(instance['conversation_history'])
         
         # Call AI to generate response
         max_tokens = instance['config_manager'].get_max_tokens()
         print(f"💭 Generating response (max_tokens={max_tokens})...")
-        response = instance['ai_provider'].generate_response(
+        response = await instance['ai_provider'].agenerate_response(
             messages=relevant_history,
             system_prompt=system_prompt,
             max_tokens=max_tokens
@@ -385,34 +694,20 @@ async def chat(request: ChatRequest):
         print(f"✅ Response generated: {response[:50]}...")
         
         # Add to conversation history
-        instance['conversation_history'].append({
-            "role": "assistant",
-            "content": response
-        })
+        instance['conversation_history'].append("assistant", response)
         
-        # Save to vector database (user-specific)
+        # Save to vector database (user-specific), after the response is sent
         if instance['vector_store'] and len(instance['conversation_history']) >= 2:
-            user_msg = instance['conversation_history'][-2]['content']
-            try:
-                instance['vector_store'].add_conversation(user_msg, response)
-            except Exception as e:
-                print(f"⚠ Warning: Failed to save to vector store: {e}")
+            user_msg = instance['conversation_history'].last_user_message
+            background_tasks.add_task(_queue_vector_write, instance['vector_store'], user_msg, response)
         
-        # Update user profile (user-specific)
+        # Update user profile (user-specific), after the response is sent
         if instance['profile_manager']:
             instance['profile_manager'].increment_conversation_count()
             if instance['profile_manager'].should_update_profile():
-                try:
-                    recent_messages = instance['conversation_history'][-10:]
-                    if instance['profile_extractor']:
-                        extracted_data = instance['profile_extractor'].extract_user_info(recent_messages)
-                        instance['profile_manager'].update_profile_from_ai(extracted_data)
-                except Exception as e:
-                    print(f"⚠ Warning: Failed to update profile: {e}")
-        
-        # Limit history length
-        if len(instance['conversation_history']) > 20:
-            instance['conversation_history'] = instance['conversation_history'][-20:]
+                # Snapshot messages so later requests can't mutate them mid-extraction
+                recent_messages = instance['conversation_history'].tail(10)
+                background_tasks.add_task(_update_profile_sync, instance, recent_messages)
         
         return ChatResponse(
             response=response,
@@ -424,36 +719,31 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@app.get("/api/v1/conversation/{user_id}")
-async def get_conversation(user_id: str):
+@app.get("/api/v1/conversation/{user_id}", response_model=ConversationResponse)
+async def get_conversation(user_id: str, instance: Dict = Depends(get_user_instance)):
     """Get conversation history (user-specific)"""
-    instance = get_user_instance(user_id)
-    return {
-        "user_id": user_id,
-        "history": instance['conversation_history']
-    }
+    return ConversationResponse(
+        user_id=user_id,
+        history=instance['conversation_history'].to_list()
+    )
 
 
-@app.get("/api/v1/profile/{user_id}")
-async def get_profile(user_id: str):
+@app.get("/api/v1/profile/{user_id}", response_model=ProfileResponse)
+async def get_profile(user_id: str, instance: Dict = Depends(get_user_instance)):
     """Get user profile (user-specific)"""
-    instance = get_user_instance(user_id)
     if not instance['profile_manager']:
-        return {
-            "user_id": user_id,
-            "profile": None
-        }
+        return ProfileResponse(user_id=user_id)
     
     profile = instance['profile_manager'].get_profile()
-    return {
-        "user_id": user_id,
-        "profile": {
-            "name": profile.name,
-            "traits": profile.personality_traits,
-            "goals": profile.goals,
-            "conversation_count": profile.conversation_count
-        }
-    }
+    return ProfileResponse(
+        user_id=user_id,
+        profile=ProfileBody(
+            name=profile.name,
+            traits=profile.personality_traits,
+            goals=profile.goals,
+            conversation_count=profile.conversation_count
+        )
+    )
 
 
 # ==================== Start Server ====================
@@ -461,16 +751,20 @@ async def get_profile(user_id: str):
 if __name__ == "__main__":
     port = int(os.getenv('PORT', 8080))
     host = os.getenv('HOST', '0.0.0.0')
+    workers = int(os.getenv('WORKERS', 1))
     
     print(f"🚀 Starting API server on {host}:{port}")
     print(f"📝 API docs available at http://{host}:{port}/docs")
     
     # Check if Mock mode is explicitly enabled
-    use_mock_env = os.getenv('USE_MOCK_AI', 'false').lower() == 'true'
-    if use_mock_env:
+    if USE_MOCK_AI:
         print("⚠ Mock mode enabled via USE_MOCK_AI environment variable")
     else:
         print("✓ Mock mode disabled - will use real AI providers if API keys are configured")
     
-    uvicorn.run(app, host=host, port=port)
+    # uvloop + httptools ship with uvicorn[standard]; uvloop is not available on Windows
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    
+    # Pass the app as an import string so that WORKERS > 1 can spawn worker processes
+    uvicorn.run("backend.app.main:app", host=host, port=port, loop=loop, http="httptools", workers=workers)
 
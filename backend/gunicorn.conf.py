@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration
+Multi-worker deployment: gunicorn -c backend/gunicorn.conf.py backend.app.main:app
+
+WORKERS defaults to 1. WORKERS > 1 is unsafe: every worker opens the same
+ChromaDB persist directory, and Chroma's PersistentClient is not multi-process
+safe (each worker also caches its own collection state). Conversation history
+is kept in memory per worker as well, so a user's short-term history would only
+be shared by requests that land on the same worker.
+"""
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8080)}"
+workers = int(os.getenv('WORKERS', 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app (and heavy modules: chromadb, AI SDKs) once in the master,
+# workers then share those pages copy-on-write
+preload_app = True
+
+# Long LLM calls should not be killed as hung workers
+timeout = 120
+
+
+def post_fork(server, worker):
+    """
+    Load the embedding model in each worker, so its first request doesn't pay for it
+    
+    Not done in the master: ONNX Runtime sessions are not fork-safe, so every
+    worker loads its own copy of the model.
+    """
+    try:
+        from src.infrastructure.memory.vector_store import get_embedding_function
+        embedding_function = get_embedding_function()
+        if embedding_function is not None:
+            embedding_function(["warm up"])
+    except Exception as e:
+        print(f"⚠ Warning: Failed to preload embedding model: {e}")
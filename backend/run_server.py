@@ -12,12 +12,12 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(project_root / "src"))
 
-from app.main import app
 import uvicorn
 
 if __name__ == "__main__":
     port = int(os.getenv('PORT', 8080))
     host = os.getenv('HOST', '0.0.0.0')
+    workers = int(os.getenv('WORKERS', 1))
     
     print(f"🚀 Starting API server on {host}:{port}")
     print(f"📝 API docs available at http://{host}:{port}/docs")
@@ -25,5 +25,9 @@ if __name__ == "__main__":
     if os.getenv('USE_MOCK_AI', 'false').lower() == 'true':
         print("✓ Using Mock AI Provider (no API tokens consumed)")
     
-    uvicorn.run(app, host=host, port=port)
+    # uvloop + httptools ship with uvicorn[standard]; uvloop is not available on Windows
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    
+    # Pass the app as an import string so that WORKERS > 1 can spawn worker processes
+    uvicorn.run("app.main:app", host=host, port=port, loop=loop, http="httptools", workers=workers)
 
@@ -11,7 +11,6 @@ import sys
 # Check running mode
 if os.getenv('API_MODE') == 'true' or '--api' in sys.argv:
     # API mode: Start FastAPI server (backend)
-    from backend.app.main import app
     import uvicorn
     
     port = int(os.getenv('PORT', 8080))
@@ -27,7 +26,12 @@ if os.getenv('API_MODE') == 'true' or '--api' in sys.argv:
     else:
         print("✓ Mock mode disabled - will use real AI providers if API keys are configured")
     
-    uvicorn.run(app, host=host, port=port)
+    # uvloop + httptools ship with uvicorn[standard]; uvloop is not available on Windows
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    
+    # Single worker here: this script's top level is re-run by spawned workers,
+    # use backend/run_server.py with WORKERS > 1 for multi-process deployments
+    uvicorn.run("backend.app.main:app", host=host, port=port, loop=loop, http="httptools")
 else:
     # GUI mode: Start desktop application (client)
     # Add client/src and subdirectories to path (support absolute imports)
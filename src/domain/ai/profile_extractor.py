@@ -3,8 +3,89 @@ Profile Extractor
 Use AI to extract user information from conversations
 """
 from typing import Dict, List, Optional
-import json
 import re
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+from ..profile.profile_manager import coerce_text, coerce_text_dict, coerce_text_list
+
+# Lenient fallback: everything from the first "{" to the last "}"
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """
+    Find the first balanced {...} object in text
+    
+    Linear scan that tracks brace depth (ignoring braces inside strings),
+    no regex backtracking.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+class ExtractedProfile(BaseModel):
+    """Schema of the user information returned by the extraction prompt"""
+    
+    model_config = ConfigDict(str_strip_whitespace=True)
+    
+    name: Optional[str] = None
+    personality_traits: List[str] = []
+    preferences: Dict[str, str] = {}
+    goals: List[str] = []
+    important_dates: Dict[str, str] = {}
+    facts: List[str] = []
+    
+    # LLM JSON is often slightly off-type: coerce per item (keep strings, str() scalars,
+    # join list values) rather than losing a whole field to one bad item
+    
+    @field_validator("name", mode="before")
+    @classmethod
+    def _lenient_name(cls, value):
+        """Name as text (None if empty)"""
+        return coerce_text(value) or None
+    
+    @field_validator("personality_traits", "goals", "facts", mode="before")
+    @classmethod
+    def _lenient_list(cls, value):
+        """Lists of text, non-string items coerced and empty ones dropped"""
+        return coerce_text_list(value)
+    
+    @field_validator("preferences", "important_dates", mode="before")
+    @classmethod
+    def _lenient_dict(cls, value):
+        """Dicts of text, non-string values coerced and empty ones dropped"""
+        return coerce_text_dict(value)
+    
+    @field_validator("*", mode="wrap")
+    @classmethod
+    def _default_on_error(cls, value, handler, info):
+        """Replace an invalid field with its default instead of rejecting the whole extraction"""
+        try:
+            return handler(value)
+        except ValidationError:
+            return cls.model_fields[info.field_name].get_default(call_default_factory=True)
 
 
 class ProfileExtractor:
@@ -112,27 +193,21 @@ Return ONLY the JSON object. Do not include any explanations, markdown formattin
         
         response = response.strip()
         
-        # Try direct parsing
+        # Try direct parsing (pydantic parses and validates the JSON in one pass)
         try:
-            extracted_data = json.loads(response)
-            return self._validate_extraction(extracted_data)
-        except json.JSONDecodeError:
-            # If direct parsing fails, try to extract JSON portion
-            # Use more precise regex to match complete JSON object
-            json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response, re.DOTALL)
-            if json_match:
+            return ExtractedProfile.model_validate_json(response).model_dump()
+        except ValidationError:
+            # If direct parsing fails, try to extract JSON portion:
+            # first balanced object, then the lenient first-"{"-to-last-"}" span
+            json_match = _JSON_OBJECT_RE.search(response)
+            candidates = (_find_json_object(response), json_match.group() if json_match else None)
+            for candidate in candidates:
+                if candidate is None:
+                    continue
                 try:
-                    extracted_data = json.loads(json_match.group())
-                    return self._validate_extraction(extracted_data)
-                except json.JSONDecodeError as e:
-                    # Try more lenient matching
-                    json_match2 = re.search(r'\{.*\}', response, re.DOTALL)
-                    if json_match2:
-                        try:
-                            extracted_data = json.loads(json_match2.group())
-                            return self._validate_extraction(extracted_data)
-                        except json.JSONDecodeError:
-                            pass
+                    return ExtractedProfile.model_validate_json(candidate).model_dump()
+                except ValidationError:
+                    continue
         
         # If all parsing fails, print debug info (only first 200 chars to avoid long logs)
         debug_response = response[:200] + "..." if len(response) > 200 else response
@@ -140,49 +215,9 @@ Return ONLY the JSON object. Do not include any explanations, markdown formattin
         print(f"   Response preview: {debug_response}")
         return self._get_empty_extraction()
     
-    def _validate_extraction(self, data: Dict) -> Dict:
-        """Validate and normalize extracted data"""
-        # Ensure all fields exist
-        validated = {
-            "name": data.get("name"),
-            "personality_traits": data.get("personality_traits", []),
-            "preferences": data.get("preferences", {}),
-            "goals": data.get("goals", []),
-            "important_dates": data.get("important_dates", {}),
-            "facts": data.get("facts", [])
-        }
-        
-        # Ensure types are correct
-        if validated["name"] and not isinstance(validated["name"], str):
-            validated["name"] = None
-        
-        if not isinstance(validated["personality_traits"], list):
-            validated["personality_traits"] = []
-        
-        if not isinstance(validated["preferences"], dict):
-            validated["preferences"] = {}
-        
-        if not isinstance(validated["goals"], list):
-            validated["goals"] = []
-        
-        if not isinstance(validated["important_dates"], dict):
-            validated["important_dates"] = {}
-        
-        if not isinstance(validated["facts"], list):
-            validated["facts"] = []
-        
-        return validated
-    
     def _get_empty_extraction(self) -> Dict:
         """Return empty extraction result"""
-        return {
-            "name": None,
-            "personality_traits": [],
-            "preferences": {},
-            "goals": [],
-            "important_dates": {},
-            "facts": []
-        }
+        return ExtractedProfile().model_dump()
     
     def _format_messages(self, messages: List[Dict]) -> str:
         """Format messages as text"""
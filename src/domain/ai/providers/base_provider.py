@@ -1,8 +1,74 @@
 """
 Base AI Provider Interface
 """
+import asyncio
+import functools
+import hashlib
+import json
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Iterator, List, Dict, Optional, Tuple
+
+
+# Retry settings for transient API errors (rate limits, timeouts, 5xx)
+RETRY_ATTEMPTS = 4       # Retries after the first failed call (5 tries in total)
+RETRY_BASE_DELAY = 0.5   # Seconds before the first retry, doubled for each further retry
+RETRY_JITTER = 0.25      # Max random seconds added to each delay
+
+# SDK exceptions worth retrying (anthropic/openai, google.api_core)
+_TRANSIENT_ERRORS = frozenset({
+    "RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests",
+})
+
+
+def _is_transient(error: BaseException) -> bool:
+    """
+    Whether an API error is worth retrying
+    
+    Rate limits (429), timeouts, connection errors and 5xx are transient; other
+    4xx errors (bad request, auth) are not. The API clients wrap SDK errors, so
+    the original exception is looked up through __cause__.
+    """
+    while error is not None:
+        if type(error).__name__ in _TRANSIENT_ERRORS:
+            return True
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if isinstance(status, int) and (status == 429 or 500 <= status < 600):
+            return True
+        error = error.__cause__
+    return False
+
+
+def _backoff_delay(attempt: int, base: float) -> float:
+    """Exponential backoff with jitter for the given retry (0-based)"""
+    return base * (2 ** attempt) + random.random() * RETRY_JITTER
+
+
+def _with_backoff(fn: Callable[..., str], *args, retries: int = RETRY_ATTEMPTS, base: float = RETRY_BASE_DELAY, **kwargs) -> str:
+    """Call fn(*args, **kwargs), retrying transient API errors with exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not _is_transient(e):
+                raise
+            time.sleep(_backoff_delay(attempt, base))
+
+
+async def _awith_backoff(fn: Callable[..., Awaitable[str]], *args, retries: int = RETRY_ATTEMPTS, base: float = RETRY_BASE_DELAY, **kwargs) -> str:
+    """Async version of _with_backoff (waits with asyncio.sleep)"""
+    for attempt in range(retries + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not _is_transient(e):
+                raise
+            await asyncio.sleep(_backoff_delay(attempt, base))
 
 
 class AIProvider(ABC):
@@ -27,4 +93,232 @@ class AIProvider(ABC):
             Generated text response
         """
         pass
+    
+    async def agenerate_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        **kwargs
+    ) -> str:
+        """
+        Generate AI response asynchronously
+        
+        Default implementation runs generate_response in the event loop's thread pool;
+        providers with an async SDK client override this.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(self.generate_response, messages, system_prompt, **kwargs)
+        )
+    
+    def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        Generate AI response as a stream of text chunks
+        
+        Lets the UI start rendering at first-token latency. Default implementation
+        yields the whole generate_response result as one chunk; providers whose
+        API supports streaming override this.
+        """
+        yield self.generate_response(messages, system_prompt, **kwargs)
+    
+    def batch_generate(
+        self,
+        prompt_groups: List[Tuple[str, List[Dict[str, str]]]],
+        **kwargs
+    ) -> List[str]:
+        """
+        Generate responses for several independent prompts
+        
+        Default implementation calls generate_response once per prompt; providers
+        that can answer several prompts in one request override this.
+        
+        Args:
+            prompt_groups: List of (system_prompt, messages) pairs
+            **kwargs: Additional provider-specific parameters (applied to every prompt)
+            
+        Returns:
+            One response per prompt group, in order
+        """
+        return [
+            self.generate_response(messages, system_prompt, **kwargs)
+            for system_prompt, messages in prompt_groups
+        ]
+
 
+class CachedAIProvider(AIProvider):
+    """
+    Base class for providers that cache responses to identical prompts
+    
+    Responses are kept in a bounded LRU keyed by a hash of the provider, model,
+    system prompt, messages and generation parameters, so a repeated prompt
+    (UI retry, duplicate request) returns without another API call.
+    Concurrent calls with the same prompt are deduplicated (single-flight):
+    only the first one calls the API, the others wait for its result.
+    Subclasses call super().__init__() and route generate_response through
+    _cached_generate.
+    """
+    
+    cache_size = 1024     # Max cached responses per provider instance
+    cache_ttl = 3600.0    # Seconds before a cached response goes stale
+    
+    def __init__(self):
+        self._response_cache: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[bytes, Future] = {}  # Prompts currently being generated
+        self._cache_lock = threading.Lock()  # Guards _response_cache and _inflight
+    
+    def _cache_key(self, messages: List[Dict[str, str]], system_prompt: str, params: Dict) -> bytes:
+        """Hash the prompt and parameters (namespaced by provider and model)"""
+        payload = json.dumps(
+            {
+                "ns": f"{type(self).__name__}:{getattr(self, 'model', '')}",
+                "sys": system_prompt,
+                "msgs": messages,
+                "params": params,
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+    
+    def _lookup(self, key: bytes) -> Optional[str]:
+        """Get a fresh cached response, dropping a stale one (caller holds _cache_lock)"""
+        entry = self._response_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.cache_ttl:
+            del self._response_cache[key]
+            return None
+        self._response_cache.move_to_end(key)
+        return entry[1]
+    
+    def _store(self, key: bytes, response: str):
+        """Cache a response, evicting the least recently used (caller holds _cache_lock)"""
+        # Don't cache empty responses, they are usually failures
+        if response:
+            self._response_cache[key] = (time.monotonic(), response)
+            self._response_cache.move_to_end(key)
+            while len(self._response_cache) > self.cache_size:
+                self._response_cache.popitem(last=False)
+    
+    def _claim(self, key: bytes) -> Tuple[Optional[str], Optional[Future], bool]:
+        """
+        Look up a prompt in the cache and the in-flight calls
+        
+        Returns:
+            (cached response or None, future of the call to wait on or complete,
+             whether the caller owns the call and must generate the response)
+        """
+        with self._cache_lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached, None, False
+            
+            # Same prompt already being generated: wait for that call instead
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return None, inflight, False
+            
+            future = Future()
+            self._inflight[key] = future
+            return None, future, True
+    
+    def _complete(self, key: bytes, future: Future, response: str):
+        """Cache an owned call's response and hand it to waiting callers"""
+        with self._cache_lock:
+            self._inflight.pop(key, None)
+            self._store(key, response)
+        future.set_result(response)
+    
+    def _fail(self, key: bytes, future: Future, error: BaseException):
+        """Hand an owned call's error to waiting callers"""
+        with self._cache_lock:
+            self._inflight.pop(key, None)
+        future.set_exception(error)
+    
+    def _cached_generate(
+        self,
+        generate: Callable[..., str],
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        **kwargs
+    ) -> str:
+        """
+        Return the cached response for this prompt, or call generate and cache its result
+        
+        Args:
+            generate: Uncached generate function, called as generate(messages, system_prompt, **kwargs)
+            messages: List of message dicts with "role" and "content"
+            system_prompt: System prompt/instructions
+            **kwargs: Generation parameters (part of the cache key)
+        """
+        key = self._cache_key(messages, system_prompt, kwargs)
+        cached, future, owner = self._claim(key)
+        if cached is not None:
+            return cached
+        if not owner:
+            return future.result()
+        
+        try:
+            response = generate(messages, system_prompt, **kwargs)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._complete(key, future, response)
+        return response
+    
+    def _cached_stream(
+        self,
+        stream: Callable[..., Iterator[str]],
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        Stream chunks from stream, caching the full response once it completes
+        
+        A cached response is yielded as a single chunk. Streams are not deduplicated
+        against in-flight calls, and an abandoned stream caches nothing.
+        """
+        key = self._cache_key(messages, system_prompt, kwargs)
+        with self._cache_lock:
+            cached = self._lookup(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        for chunk in stream(messages, system_prompt, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        
+        with self._cache_lock:
+            self._store(key, "".join(chunks))
+    
+    async def _acached_generate(
+        self,
+        agenerate: Callable[..., Awaitable[str]],
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        **kwargs
+    ) -> str:
+        """Async version of _cached_generate (shares the cache and in-flight calls with it)"""
+        key = self._cache_key(messages, system_prompt, kwargs)
+        cached, future, owner = self._claim(key)
+        if cached is not None:
+            return cached
+        if not owner:
+            return await asyncio.wrap_future(future)
+        
+        try:
+            response = await agenerate(messages, system_prompt, **kwargs)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._complete(key, future, response)
+        return response
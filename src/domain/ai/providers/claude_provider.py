@@ -1,23 +1,26 @@
 """
 Claude Provider Implementation
 """
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional
 from ....infrastructure.api_clients.claude_client import ClaudeClient
-from .base_provider import AIProvider
+from ....infrastructure.api_clients.llm_cache import LLMCache
+from .base_provider import CachedAIProvider, _awith_backoff, _with_backoff
 
 
-class ClaudeProvider(AIProvider):
+class ClaudeProvider(CachedAIProvider):
     """Claude provider implementation"""
     
-    def __init__(self, api_key: str, model: str = "claude-3-5-sonnet-20241022"):
+    def __init__(self, api_key: str, model: str = "claude-3-5-sonnet-20241022", llm_cache: Optional[LLMCache] = None):
         """
         Initialize Claude provider
         
         Args:
             api_key: Claude API key
             model: Model name
+            llm_cache: Persistent response cache shared with the API client (optional)
         """
-        self.client = ClaudeClient(api_key=api_key)
+        super().__init__()
+        self.client = ClaudeClient(api_key=api_key, cache=llm_cache)
         self.model = model
     
     def generate_response(
@@ -29,7 +32,7 @@ class ClaudeProvider(AIProvider):
         **kwargs
     ) -> str:
         """
-        Generate response using Claude
+        Generate response using Claude (cached for identical prompts)
         
         Args:
             messages: List of message dicts
@@ -41,20 +44,106 @@ class ClaudeProvider(AIProvider):
         Returns:
             Generated response
         """
-        # Add system prompt if provided
-        formatted_messages = []
-        if system_prompt:
-            formatted_messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-        formatted_messages.extend(messages)
-        
-        return self.client.create_message(
-            messages=formatted_messages,
+        return self._cached_generate(
+            self._generate,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    async def agenerate_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        **kwargs
+    ) -> str:
+        """Generate response using Claude asynchronously (shares the cache with generate_response)"""
+        return await self._acached_generate(
+            self._agenerate,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        **kwargs
+    ) -> Iterator[str]:
+        """Generate response using Claude, yielding text chunks as they arrive (cached like generate_response)"""
+        return self._cached_stream(
+            self._stream,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Call the Claude API (uncached)"""
+        # Claude takes the system prompt as a separate parameter
+        return _with_backoff(
+            self.client.create_message,
+            messages=messages,
             model=self.model,
+            system=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def _stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Iterator[str]:
+        """Call the Claude streaming API (uncached)"""
+        # Claude takes the system prompt as a separate parameter
+        return self.client.stream_message(
+            messages=messages,
+            model=self.model,
+            system=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    async def _agenerate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Call the Claude API asynchronously (uncached)"""
+        # Claude takes the system prompt as a separate parameter
+        return await _awith_backoff(
+            self.client.acreate_message,
+            messages=messages,
+            model=self.model,
+            system=system_prompt,
             temperature=temperature,
             max_tokens=max_tokens,
             **kwargs
         )
-
@@ -1,23 +1,26 @@
 """
 Gemini Provider Implementation
 """
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional
 from ....infrastructure.api_clients.gemini_client import GeminiClient
-from .base_provider import AIProvider
+from ....infrastructure.api_clients.llm_cache import LLMCache
+from .base_provider import CachedAIProvider, _awith_backoff, _with_backoff
 
 
-class GeminiProvider(AIProvider):
+class GeminiProvider(CachedAIProvider):
     """Gemini provider implementation"""
     
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", llm_cache: Optional[LLMCache] = None):
         """
         Initialize Gemini provider
         
         Args:
             api_key: Gemini API key
             model: Model name
+            llm_cache: Persistent response cache shared with the API client (optional)
         """
-        self.client = GeminiClient(api_key=api_key, model=model)
+        super().__init__()
+        self.client = GeminiClient(api_key=api_key, model=model, cache=llm_cache)
         self.model = model
     
     def generate_response(
@@ -29,7 +32,7 @@ class GeminiProvider(AIProvider):
         **kwargs
     ) -> str:
         """
-        Generate response using Gemini
+        Generate response using Gemini (cached for identical prompts)
         
         Args:
             messages: List of message dicts
@@ -41,19 +44,103 @@ class GeminiProvider(AIProvider):
         Returns:
             Generated response
         """
-        # Add system prompt if provided
-        formatted_messages = []
-        if system_prompt:
-            formatted_messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-        formatted_messages.extend(messages)
-        
-        return self.client.generate_content(
-            messages=formatted_messages,
+        return self._cached_generate(
+            self._generate,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    async def agenerate_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> str:
+        """Generate response using Gemini asynchronously (shares the cache with generate_response)"""
+        return await self._acached_generate(
+            self._agenerate,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> Iterator[str]:
+        """Generate response using Gemini, yielding text chunks as they arrive (cached like generate_response)"""
+        return self._cached_stream(
+            self._stream,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Call the Gemini API (uncached)"""
+        # Gemini takes the system prompt as a separate system instruction
+        return _with_backoff(
+            self.client.generate_content,
+            messages=messages,
             model=self.model,
+            system_instruction=system_prompt or None,
+            temperature=temperature,
+            **kwargs
+        )
+    
+    def _stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Iterator[str]:
+        """Call the Gemini streaming API (uncached)"""
+        # Gemini takes the system prompt as a separate system instruction
+        return self.client.stream_content(
+            messages=messages,
+            model=self.model,
+            system_instruction=system_prompt or None,
+            temperature=temperature,
+            **kwargs
+        )
+    
+    async def _agenerate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Call the Gemini API asynchronously (uncached)"""
+        # Gemini takes the system prompt as a separate system instruction
+        return await _awith_backoff(
+            self.client.agenerate_content,
+            messages=messages,
+            model=self.model,
+            system_instruction=system_prompt or None,
             temperature=temperature,
             **kwargs
         )
-
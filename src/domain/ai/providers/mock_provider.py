@@ -2,15 +2,47 @@
 Mock AI Provider - For load testing, doesn't consume API tokens
 Simulates real AI call latency and CPU consumption
 """
+import asyncio
+import hashlib
 import time
 import random
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from .base_provider import AIProvider
 
 
 class MockAIProvider(AIProvider):
     """Mock provider that simulates AI calls without using real API"""
     
+    # Predefined response templates (simulate real responses)
+    _RESPONSE_TEMPLATES: Tuple[str, ...] = (
+        "That's an interesting question! Let me think about that...",
+        "I understand what you're asking. Here's my perspective:",
+        "Thanks for sharing that with me. I'd like to respond by saying:",
+        "That's a thoughtful point. From my experience:",
+        "I appreciate you asking. My thoughts on this are:",
+        "That's something I've been thinking about too. Here's what I think:",
+        "I see what you mean. Let me offer this perspective:",
+        "That's a great question! I believe:",
+    )
+    
+    # Response fragments appended to a template
+    _RESPONSE_PARTS: Tuple[str, ...] = (
+        "I think we should consider different perspectives.",
+        "There are many ways to approach this.",
+        "It's important to remember that everyone has their own view.",
+        "I find this topic fascinating.",
+        "Let's explore this together.",
+        "I'm here to help you think through this.",
+        "This reminds me of something important.",
+        "I'd love to discuss this more with you.",
+    )
+    
+    # Longest possible "{template} {part}" response
+    _MAX_RESPONSE_LEN = max(len(t) for t in _RESPONSE_TEMPLATES) + 1 + max(len(p) for p in _RESPONSE_PARTS)
+    
+    # PBKDF2-SHA256 iterations per second of simulated processing (roughly, on one core)
+    _PBKDF2_ITERATIONS_PER_SECOND = 1_000_000
+    
     def __init__(self, api_key: str = None, model: str = "mock-model", 
                  response_delay: float = 1.0, cpu_intensive: bool = True):
         """
@@ -25,30 +57,6 @@ class MockAIProvider(AIProvider):
         self.model = model
         self.response_delay = response_delay
         self.cpu_intensive = cpu_intensive
-        
-        # Predefined response templates (simulate real responses)
-        self.response_templates = [
-            "That's an interesting question! Let me think about that...",
-            "I understand what you're asking. Here's my perspective:",
-            "Thanks for sharing that with me. I'd like to respond by saying:",
-            "That's a thoughtful point. From my experience:",
-            "I appreciate you asking. My thoughts on this are:",
-            "That's something I've been thinking about too. Here's what I think:",
-            "I see what you mean. Let me offer this perspective:",
-            "That's a great question! I believe:",
-        ]
-        
-        # Generate some random response fragments
-        self.response_parts = [
-            "I think we should consider different perspectives.",
-            "There are many ways to approach this.",
-            "It's important to remember that everyone has their own view.",
-            "I find this topic fascinating.",
-            "Let's explore this together.",
-            "I'm here to help you think through this.",
-            "This reminds me of something important.",
-            "I'd love to discuss this more with you.",
-        ]
     
     def generate_response(
         self,
@@ -63,7 +71,7 @@ class MockAIProvider(AIProvider):
         
         This simulates:
         1. Network latency (random 0.5-2.0 seconds)
-        2. Processing time (CPU-intensive work if enabled)
+        2. Processing time (CPU-intensive work if enabled, otherwise a plain sleep)
         3. Realistic response length
         
         Args:
@@ -80,37 +88,68 @@ class MockAIProvider(AIProvider):
         network_delay = random.uniform(0.5, 2.0)
         time.sleep(network_delay)
         
-        # 2. Simulate CPU-intensive processing (if enabled)
+        # 2. Simulate processing (CPU-intensive if enabled)
+        processing_time = random.uniform(0.3, 1.5)
+        if self.cpu_intensive:
+            self._simulate_processing(processing_time)
+        else:
+            time.sleep(processing_time)
+        
+        # 3. Generate mock response
+        return self._build_response(messages, max_tokens)
+    
+    async def agenerate_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 100,
+        **kwargs
+    ) -> str:
+        """
+        Generate mock response asynchronously
+        
+        Same simulation as generate_response, but the network latency is an
+        asyncio.sleep and the CPU work runs in a thread, so the event loop stays free.
+        """
+        # 1. Simulate network latency
+        await asyncio.sleep(random.uniform(0.5, 2.0))
+        
+        # 2. Simulate processing (CPU-intensive if enabled)
+        processing_time = random.uniform(0.3, 1.5)
         if self.cpu_intensive:
-            # Simulate AI processing time (consume CPU)
-            processing_time = random.uniform(0.3, 1.5)
-            start_time = time.time()
-            # Do some CPU-intensive calculations
-            while time.time() - start_time < processing_time:
-                # Simple calculations to consume CPU
-                _ = sum(i * i for i in range(1000))
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._simulate_processing, processing_time)
+        else:
+            await asyncio.sleep(processing_time)
         
         # 3. Generate mock response
-        template = random.choice(self.response_templates)
-        part = random.choice(self.response_parts)
+        return self._build_response(messages, max_tokens)
+    
+    @classmethod
+    def _simulate_processing(cls, processing_time: float):
+        """
+        Simulate AI processing time (consume CPU)
         
-        # Generate contextually relevant response based on user message
-        user_message = ""
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                user_message = msg.get("content", "")
-                break
+        One native PBKDF2 call burns CPU in proportion to processing_time without
+        running Python bytecode, and releases the GIL so concurrent calls run in parallel.
+        """
+        iterations = max(1, int(processing_time * cls._PBKDF2_ITERATIONS_PER_SECOND))
+        hashlib.pbkdf2_hmac('sha256', b'mock', b'salt', iterations)
+    
+    def _build_response(self, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        """Build a mock response from the templates"""
+        template = random.choice(self._RESPONSE_TEMPLATES)
+        part = random.choice(self._RESPONSE_PARTS)
         
         # Generate response (limit within max_tokens range, about 2 sentences)
-        if user_message:
-            # Generate simple response based on user message
-            response = f"{template} {part}"
-        else:
-            response = f"{template} {part}"
+        response = f"{template} {part}"
         
         # Ensure response length is reasonable (about 50-100 words, 2 sentences)
-        if len(response) > max_tokens * 2:  # Rough estimate
-            response = response[:max_tokens * 2] + "..."
+        # Only possible when max_tokens is small, any response fits otherwise
+        max_chars = max_tokens * 2  # Rough estimate
+        if max_chars < self._MAX_RESPONSE_LEN and len(response) > max_chars:
+            response = response[:max_chars] + "..."
         
         return response
 
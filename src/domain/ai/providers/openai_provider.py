@@ -1,23 +1,36 @@
 """
 OpenAI Provider Implementation
 """
-from typing import List, Dict
+import json
+from typing import Iterator, List, Dict, Tuple, Optional
 from ....infrastructure.api_clients.openai_client import OpenAIClient
-from .base_provider import AIProvider
+from ....infrastructure.api_clients.llm_cache import LLMCache
+from .base_provider import CachedAIProvider, _awith_backoff, _with_backoff
 
 
-class OpenAIProvider(AIProvider):
+# Instructions for answering several tagged tasks in one request
+_BATCH_SYSTEM_PROMPT = (
+    "You will receive several independent tasks, each between <<TASK n>> and <<END n>>. "
+    "Each task has its own instructions and conversation; answer each one as if it were "
+    "the only task, following its instructions exactly. "
+    'Reply with only a JSON object mapping each task number to its answer, e.g. {"1": "...", "2": "..."}.'
+)
+
+
+class OpenAIProvider(CachedAIProvider):
     """OpenAI provider implementation"""
     
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", llm_cache: Optional[LLMCache] = None):
         """
         Initialize OpenAI provider
         
         Args:
             api_key: OpenAI API key
             model: Model name
+            llm_cache: Persistent response cache shared with the API client (optional)
         """
-        self.client = OpenAIClient(api_key=api_key)
+        super().__init__()
+        self.client = OpenAIClient(api_key=api_key, cache=llm_cache)
         self.model = model
     
     def generate_response(
@@ -29,7 +42,7 @@ class OpenAIProvider(AIProvider):
         **kwargs
     ) -> str:
         """
-        Generate response using OpenAI
+        Generate response using OpenAI (cached for identical prompts)
         
         Args:
             messages: List of message dicts
@@ -41,20 +54,161 @@ class OpenAIProvider(AIProvider):
         Returns:
             Generated response
         """
+        return self._cached_generate(
+            self._generate,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    async def agenerate_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> str:
+        """Generate response using OpenAI asynchronously (shares the cache with generate_response)"""
+        return await self._acached_generate(
+            self._agenerate,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> Iterator[str]:
+        """Generate response using OpenAI, yielding text chunks as they arrive (cached like generate_response)"""
+        return self._cached_stream(
+            self._stream,
+            messages,
+            system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def batch_generate(
+        self,
+        prompt_groups: List[Tuple[str, List[Dict[str, str]]]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> List[str]:
+        """
+        Answer several independent prompts with one OpenAI request
+        
+        The prompts are tagged <<TASK n>> ... <<END n>> in a single message and answered
+        as a JSON object keyed by task number: one round trip and one prefill instead
+        of one per prompt. Falls back to separate requests if the reply can't be parsed.
+        
+        Args:
+            prompt_groups: List of (system_prompt, messages) pairs
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens per prompt
+            **kwargs: Additional parameters
+            
+        Returns:
+            One response per prompt group, in order
+        """
+        if len(prompt_groups) <= 1:
+            return super().batch_generate(prompt_groups, temperature=temperature, max_tokens=max_tokens, **kwargs)
+        
+        task_blocks = []
+        for i, (system_prompt, messages) in enumerate(prompt_groups, 1):
+            conversation = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+            task_blocks.append(
+                f"<<TASK {i}>>\nInstructions:\n{system_prompt}\n\nConversation:\n{conversation}\n<<END {i}>>"
+            )
+        
+        try:
+            raw = _with_backoff(
+                self.client.chat_completion,
+                messages=[
+                    {"role": "system", "content": _BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": "\n\n".join(task_blocks)},
+                ],
+                model=self.model,
+                temperature=temperature,
+                max_tokens=max_tokens * len(prompt_groups),
+                response_format={"type": "json_object"},
+                **kwargs
+            )
+            answers = json.loads(raw)
+            return [str(answers[str(i)]) for i in range(1, len(prompt_groups) + 1)]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠ Warning: Could not parse batched response, sending prompts separately: {e}")
+            return super().batch_generate(prompt_groups, temperature=temperature, max_tokens=max_tokens, **kwargs)
+    
+    def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Call the OpenAI API (uncached)"""
         # Add system prompt if provided
-        formatted_messages = []
-        if system_prompt:
-            formatted_messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-        formatted_messages.extend(messages)
-        
-        return self.client.chat_completion(
+        formatted_messages = [{"role": "system", "content": system_prompt}, *messages] if system_prompt else messages
+        
+        return _with_backoff(
+            self.client.chat_completion,
+            messages=formatted_messages,
+            model=self.model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def _stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Iterator[str]:
+        """Call the OpenAI streaming API (uncached)"""
+        # Add system prompt if provided
+        formatted_messages = [{"role": "system", "content": system_prompt}, *messages] if system_prompt else messages
+        
+        return self.client.stream_chat_completion(
+            messages=formatted_messages,
+            model=self.model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    async def _agenerate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Call the OpenAI API asynchronously (uncached)"""
+        # Add system prompt if provided
+        formatted_messages = [{"role": "system", "content": system_prompt}, *messages] if system_prompt else messages
+        
+        return await _awith_backoff(
+            self.client.achat_completion,
             messages=formatted_messages,
             model=self.model,
             temperature=temperature,
             max_tokens=max_tokens,
             **kwargs
         )
-
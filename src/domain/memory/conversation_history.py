@@ -0,0 +1,62 @@
+"""
+Conversation History
+Short-term memory: recent messages stored as parallel deques (structure of arrays)
+"""
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Words that mark a message as a simple greeting
+GREETING_WORDS = ('hello', 'hi', '你好', '嗨', 'hey')
+
+
+class ConversationHistory:
+    """
+    Short-term conversation history
+    
+    Roles, contents and per-message metadata are kept in parallel deques
+    bounded by max_messages, so the oldest message is evicted in O(1).
+    Metadata (word_count, is_question, is_greeting) is computed once when a
+    message is appended, so selecting a history window never re-parses text.
+    """
+    
+    def __init__(self, max_messages: Optional[int] = None):
+        """
+        Initialize conversation history
+        
+        Args:
+            max_messages: Maximum number of messages to keep (None for unlimited)
+        """
+        self.max_messages = max_messages
+        self.roles: Deque[str] = deque(maxlen=max_messages)
+        self.contents: Deque[str] = deque(maxlen=max_messages)
+        self.meta: Deque[Tuple[int, bool, bool]] = deque(maxlen=max_messages)
+        self.last_user_message: str = ""
+    
+    def append(self, role: str, content: str):
+        """Append a message, dropping the oldest one if over max_messages"""
+        message_lower = content.lower()
+        word_count = len(content.split())
+        is_question = '?' in content or '？' in content
+        is_greeting = any(word in message_lower for word in GREETING_WORDS)
+        
+        self.roles.append(role)
+        self.contents.append(content)
+        self.meta.append((word_count, is_question, is_greeting))
+        if role == "user":
+            self.last_user_message = content
+    
+    def tail(self, n: int) -> List[Dict]:
+        """Get the last n messages as [{"role": ..., "content": ...}, ...]"""
+        start = max(0, len(self.roles) - n)
+        return [
+            {"role": role, "content": content}
+            for role, content in zip(islice(self.roles, start, None), islice(self.contents, start, None))
+        ]
+    
+    def to_list(self) -> List[Dict]:
+        """Get all messages as [{"role": ..., "content": ...}, ...]"""
+        return self.tail(len(self.roles))
+    
+    def __len__(self) -> int:
+        return len(self.roles)
@@ -2,67 +2,178 @@
 User Profile Manager
 Automatically extract and manage user personal information profiles
 """
-from typing import Dict, List, Optional
-import json
+import atexit
+import logging
+import os
+import shutil
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
 
+log = logging.getLogger(__name__)
 
-class UserProfile:
-    """User profile data class - stores user's persistent information"""
+# Minimum seconds between profile saves triggered by AI updates (pending changes are
+# written by the next update after the interval, or at exit)
+PROFILE_SAVE_INTERVAL = 30.0
+
+# Profile update schedule: (up to this conversation count, update every N conversations)
+PROFILE_UPDATE_SCHEDULE = (
+    (20, 5),              # Early stage: quickly build profile
+    (50, 10),             # Mid stage: medium frequency
+    (float('inf'), 15),   # Later stage: reduce frequency
+)
+
+# Live managers, flushed at interpreter exit (weak so evicted managers can be collected)
+_live_managers: "weakref.WeakSet[ProfileManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_profiles():
+    """Write any unsaved profile changes at exit"""
+    for manager in list(_live_managers):
+        manager.flush()
+
+
+def coerce_text(value: Any) -> str:
+    """
+    Loosely typed profile value (older profile files, LLM output) as text
     
-    def __init__(self, data: Optional[Dict] = None):
-        """
-        Initialize user profile
-        
-        Information dimensions included:
-        - name: User's name
-        - personality_traits: Personality traits (e.g., optimistic, introverted, humorous)
-        - preferences: Preferences (e.g., music taste, dietary habits)
-        - goals: Goals and aspirations
-        - important_dates: Important dates (birthday, anniversaries, etc.)
-        - facts: Other important facts
-        """
-        # Basic information
-        self.name: Optional[str] = None
-        
-        # Personality traits
-        self.personality_traits: List[str] = []
-        
-        # Preferences (dictionary format, supports multiple dimensions)
-        self.preferences: Dict[str, str] = {}
-        
-        # Goals list
-        self.goals: List[str] = []
-        
-        # Important dates (dictionary format: event -> date)
-        self.important_dates: Dict[str, str] = {}
-        
-        # Other facts
-        self.facts: List[str] = []
-        
-        # Metadata
-        self.conversation_count: int = 0
-        self.last_updated: str = datetime.now().isoformat()
-        self.created_at: str = datetime.now().isoformat()
-        
-        # If data is provided, update fields
-        if data:
-            self.__dict__.update(data)
+    Strings are stripped, lists are joined with ", ", dicts become "key: value"
+    pairs, None is "" and other scalars go through str().
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return ", ".join(text for text in map(coerce_text, value) if text)
+    if isinstance(value, dict):
+        return ", ".join(f"{key}: {text}" for key, item in value.items() if (text := coerce_text(item)))
+    return str(value)
+
+
+def coerce_text_list(value: Any) -> List[str]:
+    """Loosely typed list as a list of non-empty strings (a single value becomes a one-item list)"""
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return [text for text in map(coerce_text, value) if text]
+
+
+def coerce_text_dict(value: Any) -> Dict[str, str]:
+    """Loosely typed dict as str -> str, dropping empty values (anything but a dict becomes {})"""
+    if not isinstance(value, dict):
+        return {}
+    return {str(key): text for key, item in value.items() if (text := coerce_text(item))}
+
+
+class UserProfile(BaseModel):
+    """
+    User profile data class - stores user's persistent information
+    
+    Information dimensions included:
+    - name: User's name
+    - personality_traits: Personality traits (e.g., optimistic, introverted, humorous)
+    - preferences: Preferences (e.g., music taste, dietary habits)
+    - goals: Goals and aspirations
+    - important_dates: Important dates (birthday, anniversaries, etc.)
+    - facts: Other important facts
+    
+    A pydantic model, so the profile file is parsed and written by pydantic's
+    native JSON encoder/decoder instead of going through intermediate dicts.
+    Loading is lenient: loosely typed values (e.g. a list of preferences written
+    by an older version) are coerced to text rather than rejected.
+    """
+    
+    # Basic information
+    name: Optional[str] = None
+    
+    # Personality traits
+    personality_traits: List[str] = Field(default_factory=list)
+    
+    # Preferences (dictionary format, supports multiple dimensions)
+    preferences: Dict[str, str] = Field(default_factory=dict)
+    
+    # Goals list
+    goals: List[str] = Field(default_factory=list)
+    
+    # Important dates (dictionary format: event -> date)
+    important_dates: Dict[str, str] = Field(default_factory=dict)
+    
+    # Other facts
+    facts: List[str] = Field(default_factory=list)
+    
+    # Metadata (timestamps default to the creation time, see _default_timestamps)
+    conversation_count: int = 0
+    last_updated: str = ""
+    created_at: str = ""
+    
+    # Change tracking (not serialized): bumped by mark_changed, clears cached prompt text
+    _version: int = PrivateAttr(default=0)
+    _prompt_text_cache: Optional[str] = PrivateAttr(default=None)
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _default_timestamps(cls, data):
+        """Stamp missing timestamps with a single creation time"""
+        if isinstance(data, dict) and not (data.get("last_updated") and data.get("created_at")):
+            now = datetime.now().isoformat()
+            data = dict(data)
+            data["last_updated"] = data.get("last_updated") or now
+            data["created_at"] = data.get("created_at") or now
+        return data
+    
+    @field_validator("name", mode="before")
+    @classmethod
+    def _lenient_name(cls, value):
+        """Name as text (None if empty)"""
+        return coerce_text(value) or None
+    
+    @field_validator("personality_traits", "goals", "facts", mode="before")
+    @classmethod
+    def _lenient_list(cls, value):
+        """Lists of text, non-string items coerced and empty ones dropped"""
+        return coerce_text_list(value)
+    
+    @field_validator("preferences", "important_dates", mode="before")
+    @classmethod
+    def _lenient_dict(cls, value):
+        """Dicts of text, non-string values coerced and empty ones dropped"""
+        return coerce_text_dict(value)
+    
+    @field_validator("conversation_count", mode="before")
+    @classmethod
+    def _lenient_count(cls, value):
+        """Conversation count as int (0 if unreadable)"""
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+    
+    @field_validator("last_updated", "created_at", mode="before")
+    @classmethod
+    def _lenient_timestamp(cls, value):
+        """Timestamps as text"""
+        return coerce_text(value)
+    
+    @property
+    def version(self) -> int:
+        """Change counter, bumped by mark_changed"""
+        return self._version
+    
+    def mark_changed(self):
+        """Record that profile fields changed (invalidates cached prompt text)"""
+        self._version += 1
+        self._prompt_text_cache = None
     
     def to_dict(self) -> Dict:
-        """Convert to dictionary format (for JSON serialization)"""
-        return {
-            "name": self.name,
-            "personality_traits": self.personality_traits,
-            "preferences": self.preferences,
-            "goals": self.goals,
-            "important_dates": self.important_dates,
-            "facts": self.facts,
-            "conversation_count": self.conversation_count,
-            "last_updated": self.last_updated,
-            "created_at": self.created_at
-        }
+        """Convert to dictionary format"""
+        return self.model_dump()
     
     def to_prompt_text(self) -> str:
         """
@@ -70,44 +181,56 @@ class UserProfile:
         
         This text will be added to the System Prompt,
         allowing AI to understand the user's background information
+        (cached until mark_changed is called)
         """
-        parts = []
+        if self._prompt_text_cache is None:
+            self._prompt_text_cache = self._build_prompt_text()
+        return self._prompt_text_cache
+    
+    def _build_prompt_text(self) -> str:
+        """Build the prompt text from profile fields (one buffer, joined once)"""
+        buf = []
+        add = buf.append
         
         # Name
         if self.name:
-            parts.append(f"User's name: {self.name}")
+            add(f"User's name: {self.name}\n\n")
         
         # Personality traits
         if self.personality_traits:
-            traits = ", ".join(self.personality_traits)
-            parts.append(f"User's personality traits: {traits}")
+            add("User's personality traits: ")
+            add(", ".join(self.personality_traits))
+            add("\n\n")
         
         # Preferences
         if self.preferences:
-            prefs = []
-            for category, value in self.preferences.items():
-                prefs.append(f"{category}: {value}")
-            parts.append(f"User's preferences:\n  - " + "\n  - ".join(prefs))
+            add("User's preferences:\n  - ")
+            add("\n  - ".join(f"{category}: {value}" for category, value in self.preferences.items()))
+            add("\n\n")
         
         # Goals
         if self.goals:
-            parts.append(f"User's goals:\n  - " + "\n  - ".join(self.goals))
+            add("User's goals:\n  - ")
+            add("\n  - ".join(self.goals))
+            add("\n\n")
         
         # Important dates
         if self.important_dates:
-            dates = []
-            for event, date in self.important_dates.items():
-                dates.append(f"{event}: {date}")
-            parts.append(f"Important dates:\n  - " + "\n  - ".join(dates))
+            add("Important dates:\n  - ")
+            add("\n  - ".join(f"{event}: {date}" for event, date in self.important_dates.items()))
+            add("\n\n")
         
         # Other facts
         if self.facts:
-            parts.append(f"Other important facts:\n  - " + "\n  - ".join(self.facts))
+            add("Other important facts:\n  - ")
+            add("\n  - ".join(self.facts))
+            add("\n\n")
         
-        if not parts:
-            return ""
+        # Drop the separator after the last section
+        if buf:
+            buf[-1] = buf[-1][:-2]
         
-        return "\n\n".join(parts)
+        return "".join(buf)
     
     def is_empty(self) -> bool:
         """Check if profile is empty"""
@@ -137,8 +260,15 @@ class ProfileManager:
             profile_file = project_root / "data" / "user_profile.json"
         
         self.profile_file = profile_file
+        self._read_only = False  # Set when an unreadable profile file couldn't be backed up
         self.profile = self._load_profile()
         
+        # Batched saving: updates mark the profile dirty, _maybe_flush writes it
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._save_lock = threading.Lock()
+        _live_managers.add(self)
+        
         print(f"✓ Profile Manager initialized")
         if not self.profile.is_empty():
             print(f"  - User: {self.profile.name or 'Unknown'}")
@@ -149,38 +279,69 @@ class ProfileManager:
         """Load user profile from file"""
         if self.profile_file.exists():
             try:
-                with open(self.profile_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(self.profile_file, 'rb') as f:
+                    profile = UserProfile.model_validate_json(f.read())
                     print(f"✓ Loaded existing user profile from {self.profile_file}")
-                    return UserProfile(data)
+                    return profile
             except Exception as e:
                 print(f"✗ Failed to load profile: {e}")
+                self._back_up_unreadable_profile()
                 print("  Creating new profile...")
         
         return UserProfile()
     
+    def _back_up_unreadable_profile(self):
+        """
+        Copy an unreadable profile file to <name>.bak before it can be overwritten
+        
+        If the copy fails, the manager becomes read-only, so the original file is
+        never replaced by the new empty profile.
+        """
+        backup_file = self.profile_file.with_suffix(self.profile_file.suffix + '.bak')
+        try:
+            shutil.copy2(self.profile_file, backup_file)
+            print(f"  Backed up the unreadable profile to {backup_file}")
+        except OSError as e:
+            self._read_only = True
+            print(f"⚠ Warning: Failed to back up profile ({e}), profile changes will not be saved")
+    
     def save_profile(self) -> bool:
         """
         Save user profile to file
         
+        Writes a temporary file and atomically replaces the profile with it,
+        so a crash mid-save never leaves a truncated profile behind.
+        
         Returns:
             Whether save was successful
         """
+        if self._read_only:
+            print(f"⚠ Warning: Not saving profile, {self.profile_file} could not be loaded or backed up")
+            return False
+        
         try:
-            # Ensure directory exists
-            self.profile_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Update timestamp
-            self.profile.last_updated = datetime.now().isoformat()
-            
-            # Save to JSON file
-            with open(self.profile_file, 'w', encoding='utf-8') as f:
-                json.dump(
-                    self.profile.to_dict(), 
-                    f, 
-                    indent=2, 
-                    ensure_ascii=False
-                )
+            with self._save_lock:
+                # Ensure directory exists
+                self.profile_file.parent.mkdir(parents=True, exist_ok=True)
+                
+                # Update timestamp
+                self.profile.last_updated = datetime.now().isoformat()
+                
+                # Save to JSON file (sibling temp file, so the replace stays on one filesystem)
+                tmp_file = self.profile_file.with_suffix(self.profile_file.suffix + '.tmp')
+                try:
+                    with open(tmp_file, 'wb') as f:
+                        f.write(self.profile.model_dump_json(indent=2).encode('utf-8'))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_file, self.profile_file)
+                except BaseException:
+                    # Don't leave a partial temp file behind
+                    tmp_file.unlink(missing_ok=True)
+                    raise
+                
+                self._dirty = False
+                self._last_save = time.monotonic()
             
             print(f"✓ Saved user profile to {self.profile_file}")
             return True
@@ -189,6 +350,16 @@ class ProfileManager:
             print(f"✗ Failed to save profile: {e}")
             return False
     
+    def flush(self):
+        """Save the profile if it has unsaved changes"""
+        if self._dirty:
+            self.save_profile()
+    
+    def _maybe_flush(self):
+        """Save unsaved changes if the last save was more than PROFILE_SAVE_INTERVAL ago"""
+        if self._dirty and time.monotonic() - self._last_save > PROFILE_SAVE_INTERVAL:
+            self.save_profile()
+    
     def get_profile(self) -> UserProfile:
         """Get current user profile"""
         return self.profile
@@ -200,7 +371,7 @@ class ProfileManager:
         How it works:
         1. AI analyzes conversation and returns structured data
         2. Incrementally update profile (deduplicate, merge)
-        3. Save to file
+        3. Save to file (batched, at most every PROFILE_SAVE_INTERVAL seconds)
         
         Args:
             ai_extracted_data: User information returned by AI analysis
@@ -213,68 +384,77 @@ class ProfileManager:
                 "facts": ["has a cat"]
             }
         """
-        updated = False
+        updated = 0  # Number of changed entries
+        
+        # Values are coerced to text the way the profile file is loaded, so a loosely
+        # typed extraction can't put values into the profile that wouldn't load back
         
         # Update name (only if currently empty)
-        if "name" in ai_extracted_data and ai_extracted_data["name"]:
+        name = coerce_text(ai_extracted_data.get("name"))
+        if name:
             if not self.profile.name:
-                self.profile.name = ai_extracted_data["name"]
-                updated = True
-                print(f"  ✓ Updated name: {self.profile.name}")
+                self.profile.name = name
+                updated += 1
+                log.debug("Updated name: %s", self.profile.name)
         
         # Update personality traits (deduplicate and add)
         if "personality_traits" in ai_extracted_data:
-            new_traits = ai_extracted_data["personality_traits"]
-            for trait in new_traits:
-                if trait and trait not in self.profile.personality_traits:
-                    self.profile.personality_traits.append(trait)
-                    updated = True
-                    print(f"  ✓ Added personality trait: {trait}")
+            updated += self._add_unique(self.profile.personality_traits, coerce_text_list(ai_extracted_data["personality_traits"]), "personality trait")
         
         # Update preferences (merge dictionary)
         if "preferences" in ai_extracted_data:
-            new_prefs = ai_extracted_data["preferences"]
+            new_prefs = coerce_text_dict(ai_extracted_data["preferences"])
             for key, value in new_prefs.items():
                 if key and value:
                     if key not in self.profile.preferences or self.profile.preferences[key] != value:
                         self.profile.preferences[key] = value
-                        updated = True
-                        print(f"  ✓ Updated preference: {key} = {value}")
+                        updated += 1
+                        log.debug("Updated preference: %s = %s", key, value)
         
         # Update goals (deduplicate and add)
         if "goals" in ai_extracted_data:
-            new_goals = ai_extracted_data["goals"]
-            for goal in new_goals:
-                if goal and goal not in self.profile.goals:
-                    self.profile.goals.append(goal)
-                    updated = True
-                    print(f"  ✓ Added goal: {goal}")
+            updated += self._add_unique(self.profile.goals, coerce_text_list(ai_extracted_data["goals"]), "goal")
         
         # Update important dates (merge dictionary)
         if "important_dates" in ai_extracted_data:
-            new_dates = ai_extracted_data["important_dates"]
+            new_dates = coerce_text_dict(ai_extracted_data["important_dates"])
             for event, date in new_dates.items():
                 if event and date:
                     if event not in self.profile.important_dates or self.profile.important_dates[event] != date:
                         self.profile.important_dates[event] = date
-                        updated = True
-                        print(f"  ✓ Added important date: {event} = {date}")
+                        updated += 1
+                        log.debug("Added important date: %s = %s", event, date)
         
         # Update facts (deduplicate and add)
         if "facts" in ai_extracted_data:
-            new_facts = ai_extracted_data["facts"]
-            for fact in new_facts:
-                if fact and fact not in self.profile.facts:
-                    self.profile.facts.append(fact)
-                    updated = True
-                    print(f"  ✓ Added fact: {fact}")
-        
-        # If there are updates, save to file
+            updated += self._add_unique(self.profile.facts, coerce_text_list(ai_extracted_data["facts"]), "fact")
+        
+        # If there are updates, mark for saving (written now if the last save is old enough)
         if updated:
-            self.save_profile()
-            print(f"✓ User profile updated successfully")
+            self.profile.mark_changed()
+            self._dirty = True
+            self._maybe_flush()
+            log.info("User profile updated (%d new entries)", updated)
         else:
-            print(f"  No new information extracted")
+            log.debug("No new information extracted")
+    
+    @staticmethod
+    def _add_unique(target: List[str], new_items: List[str], label: str) -> int:
+        """
+        Append items not already in target (keeps order, O(1) membership checks)
+        
+        Returns:
+            Number of items added
+        """
+        seen = set(target)
+        added = 0
+        for item in new_items:
+            if item and item not in seen:
+                target.append(item)
+                seen.add(item)
+                added += 1
+                log.debug("Added %s: %s", label, item)
+        return added
     
     def increment_conversation_count(self):
         """Increment conversation count"""
@@ -294,18 +474,13 @@ class ProfileManager:
             Whether profile update should be triggered
         """
         count = self.profile.conversation_count
-        
         if count <= 0:
             return False
-        elif count <= 20:
-            # Early stage: quickly build profile
-            return count % 5 == 0
-        elif count <= 50:
-            # Mid stage: medium frequency
-            return count % 10 == 0
-        else:
-            # Later stage: reduce frequency
-            return count % 15 == 0
+        
+        for max_count, interval in PROFILE_UPDATE_SCHEDULE:
+            if count <= max_count:
+                return count % interval == 0
+        return False
     
     def get_profile_summary(self) -> str:
         """Get profile summary (for debugging and display)"""
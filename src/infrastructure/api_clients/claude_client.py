@@ -3,19 +3,63 @@ Claude API Client
 Handles communication with Anthropic Claude API
 """
 import os
-from typing import List, Dict, Optional
-from anthropic import Anthropic
+import threading
+from typing import Iterator, List, Dict, Optional, Tuple
+import httpx
+from anthropic import Anthropic, AsyncAnthropic
+from .llm_cache import LLMCache, cache_request
+from .system_prompt import SystemPrompt
+
+
+# Request settings for the shared SDK clients
+_TIMEOUT = 30.0  # seconds
+_MAX_RETRIES = 0  # Retried with backoff by the provider (see base_provider._with_backoff)
+
+# Idle connections are kept for a minute (httpx default: 5s), so a chat turn after a
+# pause doesn't pay a new TCP+TLS handshake. HTTP/2 needs the optional h2 package.
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+# Process-wide SDK clients by (provider, api_key), so HTTP connection pools and
+# TLS sessions are reused when providers are recreated (e.g. switching models)
+_client_cache: Dict[Tuple[str, str], Tuple[Anthropic, AsyncAnthropic]] = {}
+_client_cache_lock = threading.Lock()
+
+
+def _get_sdk_clients(api_key: str) -> Tuple[Anthropic, AsyncAnthropic]:
+    """Get the shared (sync, async) Anthropic SDK clients for an API key"""
+    key = ("claude", api_key)
+    with _client_cache_lock:
+        clients = _client_cache.get(key)
+        if clients is None:
+            clients = (
+                Anthropic(
+                    api_key=api_key, max_retries=_MAX_RETRIES, timeout=_TIMEOUT,
+                    http_client=httpx.Client(http2=_HTTP2, limits=_LIMITS, timeout=_TIMEOUT, follow_redirects=True),
+                ),
+                AsyncAnthropic(
+                    api_key=api_key, max_retries=_MAX_RETRIES, timeout=_TIMEOUT,
+                    http_client=httpx.AsyncClient(http2=_HTTP2, limits=_LIMITS, timeout=_TIMEOUT, follow_redirects=True),
+                ),
+            )
+            _client_cache[key] = clients
+        return clients
 
 
 class ClaudeClient:
     """Claude API client"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[LLMCache] = None):
         """
         Initialize Claude client
         
         Args:
             api_key: Claude API key. If None, will try to get from environment variable
+            cache: Persistent response cache (optional)
         """
         if api_key is None:
             api_key = os.getenv("CLAUDE_API_KEY")
@@ -23,8 +67,67 @@ class ClaudeClient:
         if not api_key:
             raise ValueError("Claude API key is required. Set it in settings or CLAUDE_API_KEY environment variable.")
         
-        self.client = Anthropic(api_key=api_key)
+        self.client, self.async_client = _get_sdk_clients(api_key)
         self.api_key = api_key
+        self.cache = cache
+    
+    @staticmethod
+    def _split_system(messages: List[Dict[str, str]], system: Optional[str] = None):
+        """
+        Convert messages format for Claude API
+        
+        Claude expects system message separately and messages without system role.
+        If system is given, messages are assumed to hold no system message and are
+        passed through as-is.
+        
+        Returns:
+            (system message or "", user/assistant messages)
+        """
+        if system is not None:
+            return system, messages
+        
+        system_message = None
+        claude_messages = []
+        
+        for msg in messages:
+            if msg["role"] == "system":
+                system_message = msg["content"]
+            else:
+                # Claude uses "user" and "assistant" roles
+                claude_messages.append({
+                    "role": msg["role"],
+                    "content": msg["content"]
+                })
+        
+        return system_message if system_message else "", claude_messages
+    
+    @staticmethod
+    def _system_blocks(system: str):
+        """
+        System parameter with a prompt-cache breakpoint after the static system prompt
+        
+        For a SystemPrompt, the static part (identical across turns) is sent as a
+        cache_control block, so later requests read it from the cache, and the
+        per-request part (RAG memory) follows as a separate, unmarked block.
+        The message history is not marked: its window moves every turn, so a
+        breakpoint there would pay for cache writes that are never read.
+        Plain strings are sent as they are. Prompts shorter than the model's
+        minimum cacheable length are simply not cached.
+        """
+        if not isinstance(system, SystemPrompt) or not system.static:
+            return system
+        
+        blocks = [{"type": "text", "text": system.static, "cache_control": {"type": "ephemeral"}}]
+        if system.dynamic:
+            blocks.append({"type": "text", "text": system.dynamic})
+        return blocks
+    
+    @staticmethod
+    def _extract_text(response) -> str:
+        """Extract text from response"""
+        if response.content and len(response.content) > 0:
+            return response.content[0].text
+        return ""
     
     def create_message(
         self,
@@ -32,6 +135,8 @@ class ClaudeClient:
         model: str = "claude-3-5-sonnet-20241022",
         temperature: float = 0.7,
         max_tokens: int = 1024,
+        system: Optional[str] = None,
+        cache: Optional[bool] = None,
         **kwargs
     ) -> str:
         """
@@ -42,40 +147,99 @@ class ClaudeClient:
             model: Model name (default: claude-3-5-sonnet-20241022)
             temperature: Sampling temperature (0-1)
             max_tokens: Maximum tokens to generate
+            system: System prompt (if None, taken from a "system" role message)
+            cache: Use the persistent response cache (default: only when temperature is 0)
             **kwargs: Additional parameters
             
         Returns:
             Generated text response
         """
+        request = cache_request(self.cache, cache, model, messages, temperature, max_tokens, system=system, **kwargs)
+        if request:
+            cached = self.cache.lookup(request)
+            if cached is not None:
+                return cached
+        
         try:
-            # Convert messages format for Claude API
-            # Claude expects system message separately and messages without system role
-            system_message = None
-            claude_messages = []
-            
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_message = msg["content"]
-                else:
-                    # Claude uses "user" and "assistant" roles
-                    claude_messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
+            system_message, claude_messages = self._split_system(messages, system)
             
             response = self.client.messages.create(
                 model=model,
                 max_tokens=max_tokens,
                 temperature=temperature,
-                system=system_message if system_message else "",
+                system=self._system_blocks(system_message),
+                messages=claude_messages,
+                **kwargs
+            )
+            
+            text = self._extract_text(response)
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}") from e
+        
+        if request:
+            self.cache.store(request, text)
+        return text
+    
+    def stream_message(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "claude-3-5-sonnet-20241022",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        system: Optional[str] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """Create message, yielding text chunks as they arrive (same arguments as create_message)"""
+        try:
+            system_message, claude_messages = self._split_system(messages, system)
+            
+            with self.client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=self._system_blocks(system_message),
+                messages=claude_messages,
+                **kwargs
+            ) as stream:
+                for text in stream.text_stream:
+                    yield text
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}") from e
+    
+    async def acreate_message(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "claude-3-5-sonnet-20241022",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        system: Optional[str] = None,
+        cache: Optional[bool] = None,
+        **kwargs
+    ) -> str:
+        """Create message asynchronously (same arguments as create_message)"""
+        request = cache_request(self.cache, cache, model, messages, temperature, max_tokens, system=system, **kwargs)
+        if request:
+            cached = self.cache.lookup(request)
+            if cached is not None:
+                return cached
+        
+        try:
+            system_message, claude_messages = self._split_system(messages, system)
+            
+            response = await self.async_client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=self._system_blocks(system_message),
                 messages=claude_messages,
                 **kwargs
             )
             
-            # Extract text from response
-            if response.content and len(response.content) > 0:
-                return response.content[0].text
-            return ""
+            text = self._extract_text(response)
         except Exception as e:
-            raise Exception(f"Claude API error: {str(e)}")
+            raise Exception(f"Claude API error: {str(e)}") from e
+        
+        if request:
+            self.cache.store(request, text)
+        return text
 
@@ -2,21 +2,62 @@
 Google Gemini API Client
 Handles communication with Google Gemini API
 """
+import hashlib
+import json
 import os
-from typing import List, Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, Dict, Optional, Tuple
 import google.generativeai as genai
+from .llm_cache import LLMCache, cache_request
+
+
+# Models available to an API key, persisted across runs (list_models is a network call)
+_MODELS_CACHE_FILE = Path(__file__).parent.parent.parent.parent / "data" / "gemini_models_cache.json"
+_MODELS_CACHE_TTL = 24 * 3600  # seconds
+
+# Models tried, in order, when the configured model is not found
+_FALLBACK_MODELS: Tuple[str, ...] = (
+    "gemini-2.5-flash",         # Current cheapest model
+    "gemini-2.0-flash-exp",     # Experimental
+    "gemini-2.0-flash",         # Stable 2.0
+    "gemini-flash-latest",      # Latest flash alias
+    "gemini-1.5-flash-latest",  # Legacy latest
+)
+
+# Chat roles -> Gemini history roles (system messages become the system instruction)
+_ROLE_MAP = {"user": "user", "assistant": "model"}
+
+# genai.configure() replaces the SDK's process-wide clients (and their channels),
+# so only call it when the API key actually changes
+_configured_api_key: Optional[str] = None
+_configure_lock = threading.Lock()
+
+
+def _configure(api_key: str):
+    """Configure the Gemini SDK for an API key, reusing the existing clients if unchanged"""
+    global _configured_api_key
+    with _configure_lock:
+        if _configured_api_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_api_key = api_key
 
 
 class GeminiClient:
     """Google Gemini API client"""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.5-flash"):
+    model_cache_size = 32  # Max GenerativeModel instances kept for reuse
+    
+    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.5-flash", cache: Optional[LLMCache] = None):
         """
         Initialize Gemini client
         
         Args:
             api_key: Gemini API key. If None, will try to get from environment variable
             model: Model name (default: gemini-1.5-flash-latest)
+            cache: Persistent response cache (optional)
         """
         if api_key is None:
             api_key = os.getenv("GEMINI_API_KEY")
@@ -26,38 +67,204 @@ class GeminiClient:
         
         # Configure API - latest SDK versions (>=0.8.0) default to v1 API
         # If you see v1beta errors, upgrade: pip install --upgrade google-generativeai
-        genai.configure(api_key=api_key)
+        _configure(api_key)
         self.api_key = api_key
         self.model_name = model
         self.chat_session = None  # Store chat session for multi-turn conversations
-        self._available_models_cache = None  # Cache for available models
+        self._available_models_cache = None  # Cache for available models (API order)
+        self._available_models_set: frozenset = frozenset()  # Same models, for membership tests
+        # GenerativeModel instances by (model name, system instruction, generation config), LRU
+        self._model_cache: "OrderedDict[Tuple[str, str, str], genai.GenerativeModel]" = OrderedDict()
+        self._model_cache_lock = threading.Lock()
+        self.cache = cache
     
     def _get_available_models(self):
-        """Get list of available models from API"""
+        """Get list of available models from API (cached in memory and on disk)"""
         if self._available_models_cache is not None:
             return self._available_models_cache
         
+        # Stored per key (hashed), since accounts can have access to different models
+        key_hash = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16]
+        try:
+            stored = json.loads(_MODELS_CACHE_FILE.read_text(encoding="utf-8"))
+            if stored.get("key") == key_hash and time.time() - stored.get("ts", 0) < _MODELS_CACHE_TTL:
+                self._set_available_models(stored["models"])
+                return self._available_models_cache
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        
         try:
-            models = list(genai.list_models())
-            available = []
-            for m in models:
-                if 'generateContent' in m.supported_generation_methods:
-                    model_name = m.name
-                    # Remove 'models/' prefix if present
-                    if model_name.startswith('models/'):
-                        model_name = model_name[7:]
-                    available.append(model_name)
-            self._available_models_cache = available
+            # Remove 'models/' prefix if present
+            available = [
+                m.name.removeprefix('models/')
+                for m in genai.list_models()
+                if 'generateContent' in m.supported_generation_methods
+            ]
+            self._set_available_models(available)
+            self._save_available_models(key_hash, available)
             return available
         except Exception as e:
             print(f"Warning: Could not list available models: {e}")
             return []
     
+    def _set_available_models(self, available: List[str]):
+        """Cache the available models list and its set"""
+        self._available_models_cache = available
+        self._available_models_set = frozenset(available)
+    
+    @staticmethod
+    def _save_available_models(key_hash: str, available: List[str]):
+        """Persist the available models list (temp file + replace, so readers never see a partial file)"""
+        try:
+            _MODELS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = _MODELS_CACHE_FILE.with_suffix(_MODELS_CACHE_FILE.suffix + ".tmp")
+            tmp_file.write_text(
+                json.dumps({"key": key_hash, "ts": time.time(), "models": available}),
+                encoding="utf-8"
+            )
+            os.replace(tmp_file, _MODELS_CACHE_FILE)
+        except OSError as e:
+            print(f"Warning: Could not save available models cache: {e}")
+    
+    def _prepare_request(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: float,
+        system_instruction: Optional[str] = None,
+        **kwargs
+    ):
+        """
+        Build the model instance and chat history for a request
+        
+        Returns:
+            (GenerativeModel instance, chat history in Gemini format)
+        """
+        if model is None:
+            model = self.model_name
+        
+        # Extract system message (the last one overrides a given instruction) and conversation history
+        system_messages = [msg.get("content", "") for msg in messages if msg.get("role") == "system"]
+        if system_messages:
+            system_instruction = system_messages[-1]
+        chat_history = [
+            {"role": role, "parts": [msg.get("content", "")]}
+            for msg in messages
+            if (role := _ROLE_MAP.get(msg.get("role", "user")))
+        ]
+        
+        config_kwargs = {k: v for k, v in kwargs.items() if k not in ['system']}
+        
+        # Normalize model name - remove 'models/' prefix if present
+        model_name = model.removeprefix("models/")
+        
+        # Reuse the model instance of an identical earlier request
+        cache_key = (model_name, system_instruction or "", repr(sorted({"temperature": temperature, **config_kwargs}.items())))
+        with self._model_cache_lock:
+            model_instance = self._model_cache.get(cache_key)
+            if model_instance is not None:
+                self._model_cache.move_to_end(cache_key)
+                return model_instance, chat_history
+        
+        # Initialize generation config
+        generation_config = genai.types.GenerationConfig(
+            temperature=temperature,
+            **config_kwargs
+        )
+        
+        def build(name: str):
+            return genai.GenerativeModel(
+                model_name=name,
+                generation_config=generation_config,
+                system_instruction=system_instruction or None
+            )
+        
+        # Try to create model instance with error handling
+        try:
+            model_instance = build(model_name)
+        except Exception as model_error:
+            # If model not found, try to find available models and use a fallback
+            # Try to get list of actually available models
+            available_models_list = self._get_available_models()
+            
+            if available_models_list:
+                # Pick a candidate the API lists, so only that one model is constructed:
+                # prefer a listed model matching the requested name, then the fallback list
+                available_set = self._available_models_set
+                suffix = model_name.split('-')[-1]
+                candidate = (model_name if model_name in available_set else None) or next(
+                    (m for m in available_models_list if m.endswith(suffix)),
+                    None
+                ) or next((m for m in _FALLBACK_MODELS if m in available_set), None)
+                candidates = [candidate] if candidate else []
+            else:
+                # Model list unavailable: try the fallback list in order
+                candidates = _FALLBACK_MODELS
+            
+            model_instance = None
+            for candidate in candidates:
+                try:
+                    model_instance = build(candidate)
+                    print(f"Warning: Model '{model_name}' not found, using fallback '{candidate}'")
+                    break
+                except Exception:
+                    continue
+            
+            if model_instance is None:
+                # Provide helpful error message with available models
+                available_str = ", ".join(available_models_list[:5]) if available_models_list else "none found"
+                raise Exception(
+                    f"Model '{model_name}' not found. "
+                    f"Available models: {available_str}. "
+                    f"Try updating 'gemini_model' in config.json to one of: {', '.join(_FALLBACK_MODELS[:3])}. "
+                    f"Original error: {str(model_error)}"
+                )
+        
+        with self._model_cache_lock:
+            self._model_cache[cache_key] = model_instance
+            while len(self._model_cache) > self.model_cache_size:
+                self._model_cache.popitem(last=False)
+        
+        return model_instance, chat_history
+    
+    def _evict_model(self, model_instance):
+        """Drop a model instance whose request failed, so the next request builds a fresh one"""
+        if model_instance is None:
+            return
+        with self._model_cache_lock:
+            for key, cached in list(self._model_cache.items()):
+                if cached is model_instance:
+                    del self._model_cache[key]
+    
+    @staticmethod
+    def _send(model_instance, chat_history: List[Dict], **send_kwargs):
+        """Send the request: chat mode for multi-turn history, single prompt otherwise"""
+        # Handle conversation with history
+        if len(chat_history) > 1:
+            # Use chat mode for multi-turn conversation
+            # Build history for start_chat (format: list of dicts with "role" and "parts")
+            history = chat_history[:-1]  # All but the last message
+            last_message = chat_history[-1]["parts"][0]  # The last user message
+            
+            # Start chat with history (no system_instruction parameter here)
+            chat = model_instance.start_chat(history=history)
+            # Send the last message
+            return chat.send_message(last_message, **send_kwargs)
+        elif len(chat_history) == 1:
+            # Single prompt mode (only one message)
+            prompt = chat_history[0]["parts"][0]
+            return model_instance.generate_content(prompt, **send_kwargs)
+        else:
+            # No messages
+            raise ValueError("No messages provided")
+    
     def generate_content(
         self,
         messages: List[Dict[str, str]],
         model: str = None,
         temperature: float = 0.7,
+        system_instruction: Optional[str] = None,
+        cache: Optional[bool] = None,
         **kwargs
     ) -> str:
         """
@@ -67,116 +274,85 @@ class GeminiClient:
             messages: List of message dicts with "role" and "content"
             model: Model name (default: uses self.model_name)
             temperature: Sampling temperature (0-1)
+            system_instruction: System prompt (if None, taken from a "system" role message)
+            cache: Use the persistent response cache (default: only when temperature is 0)
             **kwargs: Additional parameters
             
         Returns:
             Generated text response
         """
+        request = cache_request(
+            self.cache, cache, model or self.model_name, messages, temperature, None,
+            system_instruction=system_instruction, **kwargs
+        )
+        if request:
+            cached = self.cache.lookup(request)
+            if cached is not None:
+                return cached
+        
+        model_instance = None
         try:
-            if model is None:
-                model = self.model_name
-            
-            # Extract system message and conversation history
-            system_instruction = None
-            chat_history = []
-            
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                if role == "system":
-                    system_instruction = content
-                elif role == "user":
-                    chat_history.append({"role": "user", "parts": [content]})
-                elif role == "assistant":
-                    chat_history.append({"role": "model", "parts": [content]})
-            
-            # Initialize generation config
-            generation_config = genai.types.GenerationConfig(
-                temperature=temperature,
-                **{k: v for k, v in kwargs.items() if k not in ['system']}
+            model_instance, chat_history = self._prepare_request(
+                messages, model, temperature, system_instruction, **kwargs
             )
             
-            # Normalize model name - remove 'models/' prefix if present
-            model_name = model.replace("models/", "") if model.startswith("models/") else model
+            response = self._send(model_instance, chat_history)
+            text = response.text
+        except Exception as e:
+            self._evict_model(model_instance)
+            raise Exception(f"Gemini API error: {str(e)}") from e
+        
+        if request:
+            self.cache.store(request, text)
+        return text
+    
+    def stream_content(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = 0.7,
+        system_instruction: Optional[str] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """Generate content, yielding text chunks as they arrive (same arguments as generate_content)"""
+        model_instance = None
+        try:
+            model_instance, chat_history = self._prepare_request(
+                messages, model, temperature, system_instruction, **kwargs
+            )
             
-            # Try to create model instance with error handling
-            try:
-                if system_instruction:
-                    model_instance = genai.GenerativeModel(
-                        model_name=model_name,
-                        generation_config=generation_config,
-                        system_instruction=system_instruction
-                    )
-                else:
-                    model_instance = genai.GenerativeModel(
-                        model_name=model_name,
-                        generation_config=generation_config
-                    )
-            except Exception as model_error:
-                # If model not found, try to find available models and use a fallback
-                fallback_models = [
-                    "gemini-2.5-flash",         # Current cheapest model
-                    "gemini-2.0-flash-exp",     # Experimental
-                    "gemini-2.0-flash",         # Stable 2.0
-                    "gemini-flash-latest",      # Latest flash alias
-                    "gemini-1.5-flash-latest", # Legacy latest
-                ]
-                
-                # Try to get list of actually available models
-                available_models_list = self._get_available_models()
-                if available_models_list:
-                    # Prefer models from the actual API list
-                    for api_model in available_models_list:
-                        # Try exact match first
-                        if api_model == model_name or api_model.endswith(model_name.split('-')[-1]):
-                            try:
-                                if system_instruction:
-                                    model_instance = genai.GenerativeModel(
-                                        model_name=api_model,
-                                        generation_config=generation_config,
-                                        system_instruction=system_instruction
-                                    )
-                                else:
-                                    model_instance = genai.GenerativeModel(
-                                        model_name=api_model,
-                                        generation_config=generation_config
-                                    )
-                                print(f"Warning: Model '{model_name}' not found, using '{api_model}' from API")
-                                break
-                            except:
-                                continue
-                
-                # If still not found, try fallback list
-                fallback_used = False
-                for fallback in fallback_models:
-                    try:
-                        if system_instruction:
-                            model_instance = genai.GenerativeModel(
-                                model_name=fallback,
-                                generation_config=generation_config,
-                                system_instruction=system_instruction
-                            )
-                        else:
-                            model_instance = genai.GenerativeModel(
-                                model_name=fallback,
-                                generation_config=generation_config
-                            )
-                        fallback_used = True
-                        print(f"Warning: Model '{model_name}' not found, using fallback '{fallback}'")
-                        break
-                    except:
-                        continue
-                
-                if not fallback_used:
-                    # Provide helpful error message with available models
-                    available_str = ", ".join(available_models_list[:5]) if available_models_list else "none found"
-                    raise Exception(
-                        f"Model '{model_name}' not found. "
-                        f"Available models: {available_str}. "
-                        f"Try updating 'gemini_model' in config.json to one of: {', '.join(fallback_models[:3])}. "
-                        f"Original error: {str(model_error)}"
-                    )
+            for chunk in self._send(model_instance, chat_history, stream=True):
+                # Chunks without parts (e.g. final safety metadata) have no text
+                if chunk.parts:
+                    yield chunk.text
+        except Exception as e:
+            self._evict_model(model_instance)
+            raise Exception(f"Gemini API error: {str(e)}") from e
+    
+    async def agenerate_content(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = 0.7,
+        system_instruction: Optional[str] = None,
+        cache: Optional[bool] = None,
+        **kwargs
+    ) -> str:
+        """Generate content asynchronously (same arguments as generate_content)"""
+        request = cache_request(
+            self.cache, cache, model or self.model_name, messages, temperature, None,
+            system_instruction=system_instruction, **kwargs
+        )
+        if request:
+            cached = self.cache.lookup(request)
+            if cached is not None:
+                return cached
+        
+        model_instance = None
+        try:
+            model_instance, chat_history = self._prepare_request(
+                messages, model, temperature, system_instruction, **kwargs
+            )
             
             # Handle conversation with history
             if len(chat_history) > 1:
@@ -188,16 +364,21 @@ class GeminiClient:
                 # Start chat with history (no system_instruction parameter here)
                 chat = model_instance.start_chat(history=history)
                 # Send the last message
-                response = chat.send_message(last_message)
+                response = await chat.send_message_async(last_message)
             elif len(chat_history) == 1:
                 # Single prompt mode (only one message)
                 prompt = chat_history[0]["parts"][0]
-                response = model_instance.generate_content(prompt)
+                response = await model_instance.generate_content_async(prompt)
             else:
                 # No messages
                 raise ValueError("No messages provided")
             
-            return response.text
+            text = response.text
         except Exception as e:
-            raise Exception(f"Gemini API error: {str(e)}")
+            self._evict_model(model_instance)
+            raise Exception(f"Gemini API error: {str(e)}") from e
+        
+        if request:
+            self.cache.store(request, text)
+        return text
 
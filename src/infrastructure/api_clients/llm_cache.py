@@ -0,0 +1,345 @@
+"""
+Persistent LLM Response Cache
+Stores API responses on disk so repeated deterministic prompts skip the network
+"""
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+
+# Live caches, whose unsaved semantic entries are written at interpreter exit
+# (weak, so caches dropped with their provider can be collected)
+_live_caches: "weakref.WeakSet[LLMCache]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_semantic():
+    """Write unsaved semantic index entries of every live cache at exit"""
+    for cache in list(_live_caches):
+        cache.flush_semantic()
+
+
+class CacheRequest(NamedTuple):
+    """A client request that uses the cache"""
+    key: str      # Exact-match key of the whole request
+    context: str  # Key of the request without its last user message (semantic matches must share it)
+    query: str    # Last user message (embedded for semantic matches)
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM responses, keyed by a hash of the request
+    
+    Only deterministic requests (temperature 0) are cached by default, since a
+    sampled response is not "the" answer to a prompt; callers can force caching
+    with cache=True. Unlike the in-memory provider cache, entries survive restarts.
+    
+    With an embed function, exact misses fall back to a semantic lookup: the last
+    user message is embedded and compared (cosine similarity) with cached requests
+    that have the same model, settings and preceding conversation, so a rephrased
+    message ("hi" / "hello") reuses the cached response.
+    
+    The semantic index keeps at most semantic_max_entries (oldest dropped first)
+    and is written to disk every semantic_flush_every new entries (and at exit),
+    not on every store.
+    """
+    
+    semantic_threshold = 0.92     # Min cosine similarity for a semantic hit
+    semantic_max_entries = 4096   # Max semantic index entries (the oldest quarter is dropped when full)
+    semantic_flush_every = 16     # New semantic entries between index writes
+    
+    def __init__(self, db_path: Path, embed: Optional[Callable[[str], List[float]]] = None):
+        """
+        Initialize LLM cache
+        
+        Args:
+            db_path: SQLite database file (created if missing)
+            embed: Text embedding function enabling semantic lookups (optional)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # One connection shared by all threads, guarded by a lock. Autocommit: each
+        # statement is its own transaction, and with WAL, synchronous=NORMAL skips the
+        # fsync per write (a crash can lose the last writes, never corrupt the file)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        
+        # Semantic layer: float32 matrix of normalized query embeddings (first _sem_size
+        # rows used, the rest is spare capacity), parallel lists of request contexts and
+        # response texts, and the row indices of each context (loaded lazily)
+        self.embed = embed
+        self._sem_matrix_file = self.db_path.with_name("llm_semcache.npy")
+        self._sem_meta_file = self.db_path.with_name("llm_semcache.json")
+        self._sem_matrix: Optional[np.ndarray] = None
+        self._sem_size = 0
+        self._sem_contexts: List[str] = []
+        self._sem_texts: List[str] = []
+        self._sem_rows: Dict[str, List[int]] = {}
+        self._sem_loaded = False
+        self._sem_unsaved = 0  # Entries added since the index was last written
+        self._sem_write_lock = threading.Lock()  # Serializes index writes (done outside _lock)
+        self._sem_pending: Dict[str, np.ndarray] = {}  # Query embeddings of lookups awaiting store
+        _live_caches.add(self)
+        
+        # Diagnostics
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+    
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        **params
+    ) -> str:
+        """Hash a request (model, messages, sampling settings and other parameters)"""
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "params": params,
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def is_cacheable(temperature: float, cache: Optional[bool] = None) -> bool:
+        """
+        Whether a request should use the cache
+        
+        Args:
+            temperature: Sampling temperature of the request
+            cache: True/False to force caching on/off, None to cache only deterministic requests
+        """
+        if cache is not None:
+            return cache
+        return not temperature
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+    
+    def set(self, key: str, text: str):
+        """Cache a response (empty responses are not cached, they are usually failures)"""
+        if not text:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, ts) VALUES (?, ?, ?)",
+                (key, text, time.time())
+            )
+    
+    def lookup(self, request: CacheRequest) -> Optional[str]:
+        """Get the cached response for a request: exact match first, then semantic"""
+        text = self.get(request.key)
+        if text is not None or self.embed is None or not request.query:
+            return text
+        
+        query = self._embed(request.query)
+        if query is None:
+            return None
+        
+        text = self._semantic_match(request.context, query)
+        if text is not None:
+            self.semantic_hits += 1
+            return text
+        
+        # Keep the embedding for store(), so a miss is embedded only once
+        # (bounded, since failed calls never store)
+        with self._lock:
+            if len(self._sem_pending) >= 256:
+                self._sem_pending.clear()
+            self._sem_pending[request.key] = query
+        return None
+    
+    def store(self, request: CacheRequest, text: str):
+        """Cache the response to a request (exact and, if enabled, semantic)"""
+        self.set(request.key, text)
+        if not text or self.embed is None or not request.query:
+            return
+        
+        with self._lock:
+            query = self._sem_pending.pop(request.key, None)
+        if query is None:
+            query = self._embed(request.query)
+            if query is None:
+                return
+        self._semantic_add(request.context, query, text)
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed and L2-normalize a text (None if the embedding call fails)"""
+        try:
+            vector = np.asarray(self.embed(text), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠ Warning: Semantic cache embedding failed: {e}")
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+    
+    def _load_semantic(self):
+        """Load the semantic index from disk (caller holds _lock)"""
+        if self._sem_loaded:
+            return
+        self._sem_loaded = True
+        if not (self._sem_matrix_file.exists() and self._sem_meta_file.exists()):
+            return
+        try:
+            meta = json.loads(self._sem_meta_file.read_text(encoding="utf-8"))
+            # Memory-mapped: rows are paged in by the similarity product, not read up front
+            # (copied into a growable buffer on the first add)
+            matrix = np.load(self._sem_matrix_file, mmap_mode="r")
+            if matrix.ndim == 2 and len(matrix) == len(meta["contexts"]) == len(meta["texts"]):
+                self._sem_matrix = matrix
+                self._sem_size = len(matrix)
+                self._sem_contexts = meta["contexts"]
+                self._sem_texts = meta["texts"]
+                self._index_contexts()
+        except Exception as e:
+            print(f"⚠ Warning: Failed to load semantic cache: {e}")
+    
+    def _index_contexts(self):
+        """Rebuild the context -> row indices map (caller holds _lock)"""
+        self._sem_rows = {}
+        for row, context in enumerate(self._sem_contexts):
+            self._sem_rows.setdefault(context, []).append(row)
+    
+    def _semantic_match(self, context: str, query: np.ndarray) -> Optional[str]:
+        """Most similar cached response in the same context, if similar enough"""
+        with self._lock:
+            self._load_semantic()
+            if self._sem_matrix is None or self._sem_matrix.shape[1] != query.shape[0]:
+                return None
+            rows = self._sem_rows.get(context)
+            if not rows:
+                return None
+            sims = self._sem_matrix[rows] @ query
+            best = int(sims.argmax())
+            if sims[best] >= self.semantic_threshold:
+                return self._sem_texts[rows[best]]
+            return None
+    
+    def _semantic_add(self, context: str, query: np.ndarray, text: str):
+        """Append an entry to the semantic index (written to disk every semantic_flush_every entries)"""
+        with self._lock:
+            self._load_semantic()
+            dim = query.shape[0]
+            if self._sem_matrix is None or self._sem_matrix.shape[1] != dim:
+                # First entry (or the embedding model changed): start a new index
+                self._sem_matrix = np.empty((16, dim), dtype=np.float32)
+                self._sem_size = 0
+                self._sem_contexts = []
+                self._sem_texts = []
+                self._sem_rows = {}
+            elif self._sem_size == len(self._sem_matrix):
+                # Full (or still the read-only memory map): double the capacity
+                grown = np.empty((max(16, 2 * self._sem_size), dim), dtype=np.float32)
+                grown[:self._sem_size] = self._sem_matrix[:self._sem_size]
+                self._sem_matrix = grown
+            
+            row = self._sem_size
+            self._sem_matrix[row] = query
+            self._sem_contexts.append(context)
+            self._sem_texts.append(text)
+            self._sem_rows.setdefault(context, []).append(row)
+            self._sem_size += 1
+            if self._sem_size > self.semantic_max_entries:
+                self._evict_semantic()
+            
+            self._sem_unsaved += 1
+            flush = self._sem_unsaved >= self.semantic_flush_every
+        if flush:
+            self.flush_semantic()
+    
+    def _evict_semantic(self):
+        """Drop the oldest quarter of the semantic index (caller holds _lock)"""
+        keep = self.semantic_max_entries * 3 // 4
+        start = self._sem_size - keep
+        self._sem_matrix[:keep] = self._sem_matrix[start:self._sem_size]
+        self._sem_contexts = self._sem_contexts[start:]
+        self._sem_texts = self._sem_texts[start:]
+        self._sem_size = keep
+        self._index_contexts()
+    
+    def flush_semantic(self):
+        """Write the semantic index to disk if it has unsaved entries"""
+        with self._sem_write_lock:
+            # Snapshot under _lock, write outside it so lookups aren't blocked by disk I/O
+            with self._lock:
+                if not self._sem_unsaved or self._sem_matrix is None:
+                    return
+                matrix = self._sem_matrix[:self._sem_size].copy()
+                meta = {"contexts": list(self._sem_contexts), "texts": list(self._sem_texts)}
+                self._sem_unsaved = 0
+            
+            try:
+                # Write temp files and replace, so a crash never leaves a mismatched index
+                tmp_matrix = self._sem_matrix_file.with_suffix(".tmp.npy")
+                tmp_meta = self._sem_meta_file.with_suffix(".json.tmp")
+                np.save(tmp_matrix, matrix)
+                tmp_meta.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp_matrix, self._sem_matrix_file)
+                os.replace(tmp_meta, self._sem_meta_file)
+            except OSError as e:
+                print(f"⚠ Warning: Failed to save semantic cache: {e}")
+                with self._lock:
+                    self._sem_unsaved += 1  # Retried by the next flush
+    
+    def close(self):
+        """Write unsaved semantic entries and close the database connection"""
+        self.flush_semantic()
+        with self._lock:
+            self._conn.close()
+
+
+def cache_request(
+    cache: Optional[LLMCache],
+    use_cache: Optional[bool],
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: Optional[int],
+    **params
+) -> Optional[CacheRequest]:
+    """Cache request for a client call, or None when there is no cache or the call isn't cached"""
+    if cache is None or not LLMCache.is_cacheable(temperature, use_cache):
+        return None
+    
+    # Split off the last user message: semantic matches vary it, everything else must be equal
+    if messages and messages[-1].get("role") == "user":
+        context_messages, query = messages[:-1], messages[-1].get("content", "")
+    else:
+        context_messages, query = messages, ""
+    
+    return CacheRequest(
+        key=LLMCache.make_key(model, messages, temperature, max_tokens, **params),
+        context=LLMCache.make_key(model, context_messages, temperature, max_tokens, **params),
+        query=query,
+    )
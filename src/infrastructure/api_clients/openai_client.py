@@ -2,20 +2,65 @@
 OpenAI API Client
 Handles communication with OpenAI API
 """
+import asyncio
 import os
-from typing import List, Dict, Optional
-from openai import OpenAI
+import threading
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from .llm_cache import LLMCache, cache_request
+
+
+# Request settings for the shared SDK clients
+_TIMEOUT = 30.0  # seconds
+_MAX_RETRIES = 0  # Retried with backoff by the provider (see base_provider._with_backoff)
+
+# Idle connections are kept for a minute (httpx default: 5s), so a chat turn after a
+# pause doesn't pay a new TCP+TLS handshake. HTTP/2 needs the optional h2 package.
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+# Process-wide SDK clients by (provider, api_key), so HTTP connection pools and
+# TLS sessions are reused when providers are recreated (e.g. switching models)
+_client_cache: Dict[Tuple[str, str], Tuple[OpenAI, AsyncOpenAI]] = {}
+_client_cache_lock = threading.Lock()
+
+
+def _get_sdk_clients(api_key: str) -> Tuple[OpenAI, AsyncOpenAI]:
+    """Get the shared (sync, async) OpenAI SDK clients for an API key"""
+    key = ("openai", api_key)
+    with _client_cache_lock:
+        clients = _client_cache.get(key)
+        if clients is None:
+            clients = (
+                OpenAI(
+                    api_key=api_key, max_retries=_MAX_RETRIES, timeout=_TIMEOUT,
+                    http_client=httpx.Client(http2=_HTTP2, limits=_LIMITS, timeout=_TIMEOUT, follow_redirects=True),
+                ),
+                AsyncOpenAI(
+                    api_key=api_key, max_retries=_MAX_RETRIES, timeout=_TIMEOUT,
+                    http_client=httpx.AsyncClient(http2=_HTTP2, limits=_LIMITS, timeout=_TIMEOUT, follow_redirects=True),
+                ),
+            )
+            _client_cache[key] = clients
+        return clients
 
 
 class OpenAIClient:
     """OpenAI API client"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[LLMCache] = None):
         """
         Initialize OpenAI client
         
         Args:
             api_key: OpenAI API key. If None, will try to get from environment variable
+            cache: Persistent response cache (optional)
         """
         if api_key is None:
             api_key = os.getenv("OPENAI_API_KEY")
@@ -23,8 +68,9 @@ class OpenAIClient:
         if not api_key:
             raise ValueError("OpenAI API key is required. Set it in settings or OPENAI_API_KEY environment variable.")
         
-        self.client = OpenAI(api_key=api_key)
+        self.client, self.async_client = _get_sdk_clients(api_key)
         self.api_key = api_key
+        self.cache = cache
     
     def chat_completion(
         self,
@@ -32,6 +78,7 @@ class OpenAIClient:
         model: str = "gpt-4o-mini",
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        cache: Optional[bool] = None,
         **kwargs
     ) -> str:
         """
@@ -42,11 +89,18 @@ class OpenAIClient:
             model: Model name (default: gpt-4o-mini)
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens to generate
+            cache: Use the persistent response cache (default: only when temperature is 0)
             **kwargs: Additional parameters
             
         Returns:
             Generated text response
         """
+        request = cache_request(self.cache, cache, model, messages, temperature, max_tokens, **kwargs)
+        if request:
+            cached = self.cache.lookup(request)
+            if cached is not None:
+                return cached
+        
         try:
             response = self.client.chat.completions.create(
                 model=model,
@@ -55,9 +109,69 @@ class OpenAIClient:
                 max_tokens=max_tokens,
                 **kwargs
             )
-            return response.choices[0].message.content
+            text = response.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}") from e
+        
+        if request:
+            self.cache.store(request, text)
+        return text
+    
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """Generate chat completion, yielding text chunks as they arrive (same arguments as chat_completion)"""
+        try:
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **kwargs
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}") from e
+    
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        cache: Optional[bool] = None,
+        **kwargs
+    ) -> str:
+        """Generate chat completion asynchronously (same arguments as chat_completion)"""
+        request = cache_request(self.cache, cache, model, messages, temperature, max_tokens, **kwargs)
+        if request:
+            cached = self.cache.lookup(request)
+            if cached is not None:
+                return cached
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+            text = response.choices[0].message.content
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
+            raise Exception(f"OpenAI API error: {str(e)}") from e
+        
+        if request:
+            self.cache.store(request, text)
+        return text
     
     def create_embedding(
         self,
@@ -81,5 +195,43 @@ class OpenAIClient:
             )
             return response.data[0].embedding
         except Exception as e:
-            raise Exception(f"OpenAI embedding error: {str(e)}")
+            raise Exception(f"OpenAI embedding error: {str(e)}") from e
+    
+    async def create_embeddings_batch(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-3-small",
+        batch_size: int = 2048,
+        concurrency: int = 8
+    ) -> List[List[float]]:
+        """
+        Create embeddings for many texts asynchronously
+        
+        Texts are sent in batches of up to batch_size inputs per request (the API
+        embeds a list in one call), with at most concurrency requests in flight.
+        
+        Args:
+            texts: Texts to embed
+            model: Embedding model name
+            batch_size: Max inputs per request (the API allows up to 2048)
+            concurrency: Max concurrent requests
+            
+        Returns:
+            One embedding vector per text, in order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                response = await self.async_client.embeddings.create(model=model, input=batch)
+            # Results carry their input index; sort in case they arrive out of order
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        
+        iterator = iter(texts)
+        batches = list(iter(lambda: list(islice(iterator, batch_size)), []))
+        try:
+            results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        except Exception as e:
+            raise Exception(f"OpenAI embedding error: {str(e)}") from e
+        return [embedding for batch in results for embedding in batch]
 
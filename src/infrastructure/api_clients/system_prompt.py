@@ -0,0 +1,28 @@
+"""
+System prompt text with a known static prefix
+"""
+
+
+class SystemPrompt(str):
+    """
+    System prompt made of a static part and a per-request part
+    
+    Behaves as a plain string (both parts, separated by a blank line) for every
+    provider, but remembers where the static part ends, so clients with
+    prefix-based prompt caching (Claude) can mark only that part as cacheable.
+    """
+    
+    def __new__(cls, static: str, dynamic: str = ""):
+        prompt = super().__new__(cls, f"{static}\n\n{dynamic}" if dynamic else static)
+        prompt.static_length = len(static)
+        return prompt
+    
+    @property
+    def static(self) -> str:
+        """The static part"""
+        return self[:self.static_length]
+    
+    @property
+    def dynamic(self) -> str:
+        """The per-request part ("" if there is none)"""
+        return self[self.static_length:].lstrip("\n")
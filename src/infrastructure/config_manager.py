@@ -2,15 +2,94 @@
 Configuration management module
 Handles read/write operations for application configuration and personality settings
 """
-import json
+import atexit
+import copy
 import os
+import threading
+import weakref
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Use orjson (faster, works on bytes) when installed, stdlib json otherwise
+try:
+    import orjson
+    
+    _loads = orjson.loads
+    
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    
+    def _dumps_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+except ImportError:
+    import json
+    
+    _loads = json.loads
+    
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    
+    def _dumps_line(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8') + b"\n"
+
+# Seconds without further window moves/resizes before the geometry is saved
+# (drags report every pixel, so writes are coalesced into one)
+WINDOW_SAVE_DELAY = 0.3
+
+# Conversation history: messages kept, and lines the append-only file may grow to before compaction
+HISTORY_MAX_MESSAGES = 20
+HISTORY_COMPACT_LINES = 200
+HISTORY_TAIL_BLOCK = 8192  # Bytes read per step when reading the history file backwards
+
+# Live managers, whose pending window geometry is written at interpreter exit
+# (weak, so managers dropped by their owners can be collected)
+_live_managers: "weakref.WeakSet[ConfigManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_pending():
+    """Write pending window geometry of every live manager at exit"""
+    for manager in list(_live_managers):
+        manager._flush_pending()
+
+
+def _read_tail_lines(f, count: int) -> Tuple[list, Optional[int]]:
+    """
+    Read the last count lines of a binary file, seeking backwards from the end
+    
+    Returns:
+        (lines without their newlines, total lines in the file if the whole file was read, else None)
+    """
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    data = b""
+    while pos > 0 and data.count(b"\n") <= count:
+        step = min(HISTORY_TAIL_BLOCK, pos)
+        pos -= step
+        f.seek(pos)
+        data = f.read(step) + data
+    
+    lines = data.split(b"\n")
+    if pos > 0:
+        lines = lines[1:]  # Starts mid-line
+    lines = [line for line in lines if line.strip()]
+    return lines[-count:], len(lines) if pos == 0 else None
+
+
+def _assign_dotted(config: Dict, key: str, value):
+    """Set config[key], where a dotted key ("window.x") addresses nested dicts"""
+    *parents, last = key.split(".")
+    for part in parents:
+        config = config.setdefault(part, {})
+    config[last] = value
 
 
 class ConfigManager:
     """Configuration manager, encapsulates JSON file read/write operations"""
     
+    # Data directories already ensured by an instance (managers are created often)
+    _created_dirs: set = set()
+    
     def __init__(self, base_dir: Optional[str] = None, fallback_dir: Optional[str] = None):
         """
         Initialize configuration manager
@@ -27,14 +106,68 @@ class ConfigManager:
             self.data_dir = Path(base_dir)
         
         # Ensure data directory exists
-        self.data_dir.mkdir(exist_ok=True)
+        if self.data_dir not in ConfigManager._created_dirs:
+            self.data_dir.mkdir(exist_ok=True)
+            ConfigManager._created_dirs.add(self.data_dir)
         
         # Set fallback directory (for reading only, not writing)
         self.fallback_dir = Path(fallback_dir) if fallback_dir else None
         
         self.config_file = self.data_dir / "config.json"
         self.personality_file = self.data_dir / "personality.json"
-        self.conversation_history_file = self.data_dir / "conversation_history.json"
+        # One JSON message per line, appended per message (older versions rewrote a JSON array)
+        self.conversation_history_file = self.data_dir / "conversation_history.jsonl"
+        self._legacy_history_file = self.data_dir / "conversation_history.json"
+        self._history_lines: Optional[int] = None  # Lines in the history file, counted lazily
+        self._history_ends_line = False  # History file known to end with a newline (checked on first append)
+        
+        # Parsed JSON files: path -> ((mtime_ns, size), data), re-read only when the file changes
+        self._cache: Dict[Path, Tuple[Tuple[int, int], Optional[Dict]]] = {}
+        # Bumped whenever a cached file is re-read, removed or saved; keys the views below
+        self._config_version = 0
+        self._views: Dict[str, Tuple[int, Any]] = {}  # View name -> (version, value)
+        # Set by the owner while it watches the config files for changes and calls
+        # invalidate_cache on each one: views are then reused without stat-checking the files
+        self.files_watched = False
+        self._first_run: Optional[bool] = None  # check_first_run result, until a save or invalidate_cache
+        
+        # Debounced window geometry saves: pending "window" values, written by _flush_pending
+        self._pending_window: Dict[str, int] = {}
+        self._save_timer: Optional[threading.Timer] = None
+        self._pending_lock = threading.Lock()
+        _live_managers.add(self)
+    
+    def _parse_json(self, file_path: Path) -> Optional[Dict]:
+        """
+        Parsed contents of a JSON file, None if it doesn't exist or is invalid
+        
+        The parsed data is cached until the file's mtime or size changes, so repeated
+        config lookups don't re-read the file. Returns the cached object itself:
+        callers must not modify it.
+        """
+        try:
+            st = file_path.stat()
+        except OSError:
+            if self._cache.pop(file_path, None) is not None:
+                self._config_version += 1
+            return None
+        
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(file_path)
+        if cached is None or cached[0] != stamp:
+            try:
+                data = _loads(file_path.read_bytes())
+            except (ValueError, IOError):  # JSONDecodeError is a ValueError (json and orjson)
+                data = None
+            cached = (stamp, data)
+            self._cache[file_path] = cached
+            self._config_version += 1
+        
+        return cached[1]
+    
+    def _read_json(self, file_path: Path) -> Optional[Dict]:
+        """Read and parse a JSON file (cached, see _parse_json), returning a copy callers may modify"""
+        return copy.deepcopy(self._parse_json(file_path))
     
     def _load_json(self, file_path: Path, default: Dict, fallback_path: Optional[Path] = None) -> Dict:
         """
@@ -42,45 +175,55 @@ class ConfigManager:
         If file doesn't exist and fallback_path is provided, try loading from fallback_path
         """
         # Try primary path first
-        primary_data = None
-        if file_path.exists():
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    primary_data = json.load(f)
-                    # If primary file has valid data, use it
-                    if primary_data:
-                        return primary_data
-            except (json.JSONDecodeError, IOError):
-                pass
+        primary_data = self._read_json(file_path)
+        # If primary file has valid data, use it
+        if primary_data:
+            return primary_data
         
         # Try fallback path if provided (when primary doesn't exist or is empty/invalid)
-        if fallback_path and fallback_path.exists():
-            try:
-                with open(fallback_path, 'r', encoding='utf-8') as f:
-                    fallback_data = json.load(f)
-                    # Merge fallback data with primary data if primary exists but is empty
-                    if primary_data is None or not primary_data:
-                        return fallback_data
-                    # If primary exists but missing important keys, merge with fallback
-                    elif isinstance(primary_data, dict) and isinstance(fallback_data, dict):
-                        merged = fallback_data.copy()
-                        merged.update(primary_data)  # Primary overrides fallback
-                        return merged
+        if fallback_path:
+            fallback_data = self._read_json(fallback_path)
+            if fallback_data is not None:
+                # Merge fallback data with primary data if primary exists but is empty
+                if primary_data is None or not primary_data:
                     return fallback_data
-            except (json.JSONDecodeError, IOError):
-                pass
+                # If primary exists but missing important keys, merge with fallback
+                elif isinstance(primary_data, dict) and isinstance(fallback_data, dict):
+                    merged = fallback_data.copy()
+                    merged.update(primary_data)  # Primary overrides fallback
+                    return merged
+                return fallback_data
         
         # Return primary data if it exists, otherwise default
         return primary_data if primary_data is not None else default
     
     def _save_json(self, file_path: Path, data: Dict) -> bool:
-        """Save data to JSON file"""
+        """
+        Save data to JSON file
+        
+        Writes a temporary file and atomically replaces the target with it,
+        so a crash mid-save never leaves a truncated file behind.
+        """
+        tmp_path = file_path.with_suffix(file_path.suffix + '.tmp')
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            with open(tmp_path, 'wb') as f:
+                f.write(_dumps(data))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
             return True
-        except IOError:
+        except (IOError, TypeError):
+            # Don't leave a partial temp file behind (TypeError: data not serializable)
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
             return False
+        finally:
+            # Re-read on next load (the file changed, possibly within the mtime resolution)
+            self._cache.pop(file_path, None)
+            self._config_version += 1
+            self._first_run = None
     
     def load_config(self) -> Dict:
         """Load application configuration"""
@@ -102,41 +245,83 @@ class ConfigManager:
             "openai_model": "gpt-4o-mini",
             "claude_model": "claude-3-5-sonnet-20241022",
             "gemini_model": "gemini-2.5-flash",
-            "max_tokens": 250  # Maximum tokens for AI response (controls response length)
+            "max_tokens": 250,  # Maximum tokens for AI response (controls response length)
+            "llm_cache_enabled": False,  # Persist deterministic API responses in data/llm_cache.sqlite3
+            "llm_semantic_cache_enabled": False  # Also reuse responses to rephrased messages (needs an OpenAI key for embeddings)
         }
-        fallback_path = None
+        # Each file is parsed (or taken from the cache) once and copied once, after merging
+        config = self._parse_json(self.config_file)
+        fallback_config = None
         if self.fallback_dir:
-            fallback_path = self.fallback_dir / "config.json"
+            fallback_config = self._parse_json(self.fallback_dir / "config.json")
         
-        config = self._load_json(self.config_file, default_config, fallback_path)
+        if config and fallback_config:
+            # Merge: fallback provides defaults, primary overrides
+            merged = fallback_config | config
+            # But if primary has null API keys and fallback has real ones, use fallback's
+            for key in ['openai_api_key', 'claude_api_key', 'gemini_api_key']:
+                if not config.get(key) and fallback_config.get(key):
+                    merged[key] = fallback_config[key]
+        else:
+            merged = config or fallback_config
+            if not merged:
+                return default_config
         
-        # If primary config exists but has no API keys, merge with fallback
-        if self.fallback_dir and fallback_path and fallback_path.exists():
-            fallback_config = None
-            try:
-                with open(fallback_path, 'r', encoding='utf-8') as f:
-                    fallback_config = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
-            
-            if fallback_config:
-                # Merge: fallback provides defaults, primary overrides
-                merged = fallback_config.copy()
-                merged.update(config)  # Primary overrides fallback
-                # But if primary has null API keys and fallback has real ones, use fallback's
-                for key in ['openai_api_key', 'claude_api_key', 'gemini_api_key']:
-                    if (not config.get(key) or config.get(key) is None) and fallback_config.get(key):
-                        merged[key] = fallback_config[key]
-                return merged
+        return copy.deepcopy(merged)
+    
+    def _view(self, name: str, file_name: str, build: Callable[[], Any]) -> Any:
+        """
+        Value built from a data file (and its fallback), rebuilt only when a file changed
+        
+        The files are stat-checked (re-parsed if changed, which moves _config_version);
+        build runs only when the version moved since the last call, so repeated
+        lookups cost a stat per file instead of a parse, merge and copy.
+        """
+        view = self._views.get(name)
+        if self.files_watched and view is not None and view[0] == self._config_version:
+            return view[1]
+        
+        self._parse_json(self.data_dir / file_name)
+        if self.fallback_dir:
+            self._parse_json(self.fallback_dir / file_name)
         
-        return config
+        view = self._views.get(name)
+        if view is None or view[0] != self._config_version:
+            version = self._config_version
+            view = (version, build())
+            self._views[name] = view
+        return view[1]
+    
+    def invalidate_cache(self):
+        """Make the next lookups check the files again (call when a config file changed on disk)"""
+        self._config_version += 1
+        self._first_run = None
+    
+    def _config_view(self) -> Dict:
+        """Merged configuration for read-only lookups (must not be modified)"""
+        return self._view("config", "config.json", self.load_config)
     
     def save_config(self, config: Dict) -> bool:
         """Save application configuration"""
         return self._save_json(self.config_file, config)
     
+    def update_config(self, **fields) -> bool:
+        """
+        Update several configuration values with one load and one save
+        
+        Keys may be dotted to reach nested values, e.g. update_config(**{"window.x": 10})
+        """
+        config = self.load_config()
+        for key, value in fields.items():
+            _assign_dotted(config, key, value)
+        return self.save_config(config)
+    
     def load_personality(self) -> Optional[str]:
         """Load personality settings, return None if it doesn't exist"""
+        return self._view("personality", "personality.json", self._build_personality)
+    
+    def _build_personality(self) -> Optional[str]:
+        """Read the personality from its file (see load_personality)"""
         default = {"personality": None}
         fallback_path = None
         if self.fallback_dir:
@@ -150,7 +335,12 @@ class ConfigManager:
         return self._save_json(self.personality_file, data)
     
     def load_character_config(self) -> Dict:
-        """Load detailed character configuration"""
+        """Load detailed character configuration (cached until personality.json changes)"""
+        # The values are strings, so a shallow copy keeps the cached one intact
+        return dict(self._view("character", "personality.json", self._build_character_config))
+    
+    def _build_character_config(self) -> Dict:
+        """Read the character configuration from its file (see load_character_config)"""
         default = {
             "personality": "",
             "backstory": "",
@@ -181,22 +371,40 @@ class ConfigManager:
         return self._save_json(self.personality_file, config)
     
     def check_first_run(self) -> bool:
-        """Check if this is the first run (personality file doesn't exist)"""
-        return not self.personality_file.exists()
+        """Check if this is the first run (personality file doesn't exist); remembered until a file changes"""
+        if self._first_run is None:
+            self._first_run = not self.personality_file.exists()
+        return self._first_run
     
     def update_window_position(self, x: int, y: int):
-        """Update window position"""
-        config = self.load_config()
-        config["window"]["x"] = x
-        config["window"]["y"] = y
-        self.save_config(config)
+        """Update window position (saved after WINDOW_SAVE_DELAY without further updates)"""
+        self._schedule_window_save(x=x, y=y)
     
     def update_window_size(self, width: int, height: int):
-        """Update window size"""
-        config = self.load_config()
-        config["window"]["width"] = width
-        config["window"]["height"] = height
-        self.save_config(config)
+        """Update window size (saved after WINDOW_SAVE_DELAY without further updates)"""
+        self._schedule_window_save(width=width, height=height)
+    
+    def _schedule_window_save(self, **window):
+        """Record window geometry and (re)start the save timer"""
+        with self._pending_lock:
+            self._pending_window.update(window)
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(WINDOW_SAVE_DELAY, self._flush_pending)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def _flush_pending(self):
+        """Write pending window geometry into the current config"""
+        with self._pending_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            window, self._pending_window = self._pending_window, {}
+            if not window:
+                return
+            # Applied to a fresh load, so config saved meanwhile is kept
+            self.update_config(**{f"window.{key}": value for key, value in window.items()})
     
     def get_api_key(self, provider: str) -> Optional[str]:
         """
@@ -208,7 +416,7 @@ class ConfigManager:
         Returns:
             API key string or None
         """
-        config = self.load_config()
+        config = self._config_view()
         key_name = f"{provider}_api_key"
         # First try config file
         api_key = config.get(key_name)
@@ -229,25 +437,20 @@ class ConfigManager:
             provider: "openai" or "claude"
             api_key: API key string
         """
-        config = self.load_config()
-        key_name = f"{provider}_api_key"
-        config[key_name] = api_key
-        return self.save_config(config)
+        return self.update_config(**{f"{provider}_api_key": api_key})
     
     def get_ai_provider(self) -> str:
         """Get current AI provider"""
-        config = self.load_config()
+        config = self._config_view()
         return config.get("ai_provider", "openai")
     
     def set_ai_provider(self, provider: str) -> bool:
         """Set AI provider"""
-        config = self.load_config()
-        config["ai_provider"] = provider
-        return self.save_config(config)
+        return self.update_config(ai_provider=provider)
     
     def get_model(self, provider: str) -> str:
         """Get model name for provider"""
-        config = self.load_config()
+        config = self._config_view()
         model_key = f"{provider}_model"
         default_models = {
             "openai": "gpt-4o-mini",
@@ -258,49 +461,115 @@ class ConfigManager:
     
     def set_model(self, provider: str, model: str) -> bool:
         """Set model name for provider"""
-        config = self.load_config()
-        model_key = f"{provider}_model"
-        config[model_key] = model
-        return self.save_config(config)
+        return self.update_config(**{f"{provider}_model": model})
     
     def get_max_tokens(self) -> int:
         """Get max tokens setting for AI responses"""
-        config = self.load_config()
+        config = self._config_view()
         return config.get("max_tokens", 250)
     
     def set_max_tokens(self, max_tokens: int) -> bool:
         """Set max tokens for AI responses"""
-        config = self.load_config()
-        config["max_tokens"] = max_tokens
-        return self.save_config(config)
+        return self.update_config(max_tokens=max_tokens)
     
     def load_conversation_history(self) -> list:
         """
-        Load conversation history from JSON file
+        Load conversation history from JSONL file (last 20 messages)
         Returns list of messages in format: [{"role": "user|assistant", "content": "..."}, ...]
         """
-        default = {"history": []}
-        data = self._load_json(self.conversation_history_file, default)
-        history = data.get("history", [])
+        if not self.conversation_history_file.exists():
+            # Migrate a history saved by older versions as a JSON array
+            if self._legacy_history_file.exists():
+                history = self._load_json(self._legacy_history_file, {"history": []}).get("history", [])
+                if self.save_conversation_history(history):
+                    self._legacy_history_file.unlink(missing_ok=True)
+                return history[-HISTORY_MAX_MESSAGES:]
+            return []
         
-        # Ensure we only keep last 20 messages
-        if len(history) > 20:
-            history = history[-20:]
+        # Only the last lines are read, however long the file has grown
+        try:
+            with open(self.conversation_history_file, 'rb') as f:
+                lines, total = _read_tail_lines(f, HISTORY_MAX_MESSAGES)
+        except IOError:
+            return []
+        
+        history = []
+        for line in lines:
+            try:
+                history.append(_loads(line))
+            except ValueError:
+                pass  # Skip a line cut short by a crash mid-append
         
+        # Line count is only known when the whole file was read; otherwise the
+        # file is longer than the window, so compact on the next append
+        self._history_lines = HISTORY_COMPACT_LINES if total is None else total
         return history
     
+    def append_conversation_message(self, message: Dict) -> bool:
+        """
+        Append one message to the conversation history file
+        
+        Appending is O(1) regardless of history length; once the file reaches
+        HISTORY_COMPACT_LINES lines it is rewritten with only the last 20 messages.
+        
+        Args:
+            message: Message dict {"role": "user|assistant", "content": "..."}
+        """
+        return self.append_conversation_messages([message])
+    
+    def append_conversation_messages(self, messages: list) -> bool:
+        """Append several messages to the conversation history file with one write"""
+        if not messages:
+            return True
+        if self._history_lines is None:
+            self.load_conversation_history()  # Migrates a legacy file and counts lines
+        
+        data = b"".join(_dumps_line(message) for message in messages)
+        try:
+            with open(self.conversation_history_file, 'a+b') as f:
+                if not self._history_ends_line:
+                    # A crash mid-append can leave a partial last line: end it first, so
+                    # the new messages aren't glued onto it and dropped with it on load
+                    if f.seek(0, os.SEEK_END) > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            data = b"\n" + data
+                f.write(data)
+        except IOError:
+            return False
+        
+        self._history_ends_line = True
+        self._history_lines = (self._history_lines or 0) + len(messages)
+        if self._history_lines > HISTORY_COMPACT_LINES:
+            self.save_conversation_history(self.load_conversation_history())
+        return True
+    
     def save_conversation_history(self, history: list) -> bool:
         """
-        Save conversation history to JSON file
+        Save (rewrite) the whole conversation history file
         Keeps only last 20 messages to avoid context overflow
         
         Args:
             history: List of messages in format: [{"role": "user|assistant", "content": "..."}, ...]
         """
         # Ensure we only keep last 20 messages
-        if len(history) > 20:
-            history = history[-20:]
+        history = history[-HISTORY_MAX_MESSAGES:]
+        
+        tmp_path = self.conversation_history_file.with_suffix(self.conversation_history_file.suffix + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(b"".join(_dumps_line(message) for message in history))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.conversation_history_file)
+        except (IOError, TypeError):
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return False
         
-        data = {"history": history}
-        return self._save_json(self.conversation_history_file, data)
+        self._history_lines = len(history)
+        self._history_ends_line = True
+        return True
 
@@ -5,64 +5,350 @@ Long-term memory vector storage manager
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
+import atexit
+import base64
+import functools
+import hashlib
+import itertools
 import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
+import numpy as np
 
-class VectorMemoryStore:
-    """ChromaDB vector storage manager"""
+
+# Process-wide embedding function, created lazily on first use.
+# Every VectorMemoryStore in the process shares it (and the model weights, loaded on
+# its first call). ONNX Runtime sessions are not fork-safe, so a pre-forking server
+# loads the model in each worker (see backend/gunicorn.conf.py post_fork).
+_embedding_function = None
+_embedding_function_loaded = False
+_embedding_function_lock = threading.Lock()
+
+# Loaded ONNX (session, tokenizer) pairs by model file (False if loading failed): every
+# QuantizedONNXMiniLM instance in the process runs on the same session (sessions are thread-safe)
+_onnx_models: Dict[str, tuple] = {}
+_onnx_models_lock = threading.Lock()
+
+# HNSW index settings for new collections: higher search_ef than Chroma's default (10)
+# gives near-exact recall for small result counts on chat-sized histories, while
+# construction_ef=200 keeps inserts cheap. For very large histories (>10k
+# conversations), hnsw:M=32 improves recall further at some memory cost.
+HNSW_SETTINGS = {
+    "hnsw:space": "cosine",  # Use cosine similarity
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 50,
+    "hnsw:num_threads": max(2, (os.cpu_count() or 2) // 2),
+}
+
+# Process-wide ChromaDB clients by persist directory, created lazily on first use
+# (not at import, since clients must not be shared across forked workers)
+_shared_clients: Dict[str, "chromadb.api.ClientAPI"] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def _encode_embedding(vector: np.ndarray) -> str:
+    """Compact text form of an embedding for metadata (float16, base64)"""
+    return base64.b64encode(vector.astype(np.float16).tobytes()).decode("ascii")
+
+
+def _decode_embedding(text: str) -> np.ndarray:
+    """Embedding stored by _encode_embedding, as float32"""
+    return np.frombuffer(base64.b64decode(text), dtype=np.float16).astype(np.float32)
+
+
+class QuantizedONNXMiniLM(embedding_functions.ONNXMiniLM_L6_V2):
+    """
+    ChromaDB's ONNX all-MiniLM-L6-v2 with int8 weights
+    
+    The downloaded model is dynamically quantized once (stored next to it as
+    model_int8.onnx), which runs about 2-4x faster on CPU with ~4x smaller weights.
+    Batches are padded to their longest text instead of always to 256 tokens.
+    Subclassing keeps Chroma's embedding function name, so existing collections
+    open unchanged; int8 vectors stay close enough (cosine ~0.99) to the fp32
+    ones already stored.
+    
+    The model is loaded on the first call, so a session that never uses memory
+    never pays for it. If the int8 model can't be built, calls fall back to
+    Chroma's fp32 model.
+    """
+    
+    QUANTIZED_MODEL = "model_int8.onnx"
+    MAX_TOKENS = 256
+    BATCH_SIZE = 32
+    TOKEN_CACHE_SIZE = 1024  # Recently tokenized texts (greetings and commands recur)
     
-    def __init__(self, persist_directory: str = "./data/chromadb", openai_api_key: Optional[str] = None):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded = None  # (session, encode) once loaded, False if the int8 model is unavailable
+    
+    def _model(self):
+        """The shared (session, encode) of the int8 model, loading it on first use"""
+        if self._loaded is None:
+            model_dir = Path(self.DOWNLOAD_PATH) / self.EXTRACTED_FOLDER_NAME
+            quantized = model_dir / self.QUANTIZED_MODEL
+            with _onnx_models_lock:
+                loaded = _onnx_models.get(str(quantized))
+                if loaded is None:
+                    try:
+                        loaded = self._load(model_dir, quantized)
+                        print("✓ Loaded int8 ONNX MiniLM embeddings")
+                    except Exception as e:
+                        print(f"⚠ Warning: Failed to load int8 ONNX embeddings, using fp32: {e}")
+                        loaded = False
+                    _onnx_models[str(quantized)] = loaded
+            self._loaded = loaded
+        return self._loaded
+    
+    def _load(self, model_dir: Path, quantized: Path) -> tuple:
         """
-        Initialize ChromaDB client
+        Quantize the model if needed, and load it
         
-        Args:
-            persist_directory: Data persistence directory
-            openai_api_key: OpenAI API key (deprecated, now using free local model)
+        Returns:
+            (session, encode), where encode(text) returns the text's token IDs (LRU cached)
         """
-        # Ensure directory exists
-        Path(persist_directory).mkdir(parents=True, exist_ok=True)
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=persist_directory,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
+        if not (model_dir / "model.onnx").exists():
+            super().__call__(["warm up"])  # Downloads the fp32 model on first run
+        
+        if not quantized.exists():
+            # Needs the onnx package; an ImportError here falls back to the fp32 model
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            tmp_path = quantized.with_suffix(".tmp")
+            quantize_dynamic(str(model_dir / "model.onnx"), str(tmp_path), weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized)
+        
+        tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.MAX_TOKENS)
+        
+        @functools.lru_cache(maxsize=self.TOKEN_CACHE_SIZE)
+        def encode(text: str) -> Tuple[int, ...]:
+            return tuple(tokenizer.encode(text).ids)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count() or 1
+        session = ort.InferenceSession(
+            str(quantized), sess_options=options, providers=["CPUExecutionProvider"]
         )
+        return session, encode
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        loaded = self._model()
+        if not loaded:
+            return super().__call__(input)
+        session, encode = loaded
         
-        # Use free local SentenceTransformer model
+        embeddings = []
+        for start in range(0, len(input), self.BATCH_SIZE):
+            # The tokenizer is uncased and splits on whitespace, so texts differing only
+            # in case or spacing share a cache entry
+            rows = [encode(" ".join(text.lower().split())) for text in input[start:start + self.BATCH_SIZE]]
+            
+            # Pad to the longest text in the batch
+            input_ids = np.zeros((len(rows), max(map(len, rows))), dtype=np.int64)
+            attention_mask = np.zeros_like(input_ids)
+            for i, ids in enumerate(rows):
+                input_ids[i, :len(ids)] = ids
+                attention_mask[i, :len(ids)] = 1
+            hidden = session.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids),
+            })[0]
+            
+            # Mean pooling over real tokens, then L2 normalization
+            mask = attention_mask[..., np.newaxis].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings.extend(pooled.astype(np.float32).tolist())
+        return embeddings
+
+
+def get_embedding_function():
+    """Get the shared embedding function, loading the model on first call"""
+    global _embedding_function, _embedding_function_loaded
+    if _embedding_function_loaded:
+        return _embedding_function
+    
+    with _embedding_function_lock:
+        if _embedding_function_loaded:
+            return _embedding_function
+        
+        # Use free local all-MiniLM-L6-v2 model
         # Advantages: completely free, no account needed, data local, good privacy
+        # Prefer ChromaDB's ONNX build: same weights (stored embeddings stay compatible),
+        # but runs on onnxruntime, so torch is never imported (faster startup, less memory).
+        # Its int8-quantized version is faster still (first use quantizes it once).
+        # Models load on first use, not here
         try:
-            self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name="all-MiniLM-L6-v2"  # Free high-quality local model
-            )
-            print("✓ Using SentenceTransformer embeddings (all-MiniLM-L6-v2) - 100% free and local")
-            print("  First run will download the model (~80MB), then works offline")
+            _embedding_function = QuantizedONNXMiniLM()
+            print("✓ Using ONNX MiniLM embeddings (all-MiniLM-L6-v2, int8) - 100% free and local")
         except Exception as e:
-            print(f"⚠ Warning: Failed to initialize SentenceTransformer embeddings: {e}")
-            print("  Falling back to default embedding function")
+            print(f"⚠ Warning: Failed to initialize int8 ONNX embeddings: {e}")
+            _embedding_function = None
+        
+        if _embedding_function is None:
             try:
-                self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
-            except Exception:
-                # If default function is also unavailable, use None (ChromaDB will use default)
-                self.embedding_function = None
+                _embedding_function = embedding_functions.ONNXMiniLM_L6_V2()
+                print("✓ Using ONNX MiniLM embeddings (all-MiniLM-L6-v2) - 100% free and local")
+                print("  First run will download the model (~80MB), then works offline")
+            except Exception as e:
+                print(f"⚠ Warning: Failed to initialize ONNX embeddings: {e}")
+                print("  Falling back to SentenceTransformer embeddings")
+                try:
+                    _embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                        model_name="all-MiniLM-L6-v2"  # Free high-quality local model
+                    )
+                    print("✓ Using SentenceTransformer embeddings (all-MiniLM-L6-v2) - 100% free and local")
+                except Exception as e:
+                    print(f"⚠ Warning: Failed to initialize SentenceTransformer embeddings: {e}")
+                    # If no local model is available, use None (ChromaDB will use default)
+                    _embedding_function = None
+        
+        _embedding_function_loaded = True
+    return _embedding_function
+
+
+def _open_client(persist_directory: str):
+    """Create a ChromaDB client for a directory, with its SQLite database in WAL mode"""
+    Path(persist_directory).mkdir(parents=True, exist_ok=True)
+    
+    # WAL is a property of the database file, so setting it before Chroma opens the
+    # file applies to all of Chroma's connections: a commit appends to the log
+    # (one fsync) instead of rewriting pages through a rollback journal
+    try:
+        conn = sqlite3.connect(str(Path(persist_directory) / "chroma.sqlite3"))
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠ Warning: Could not enable WAL for ChromaDB: {e}")
+    
+    return chromadb.PersistentClient(
+        path=persist_directory,
+        settings=Settings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
+    )
+
+
+def get_shared_client(persist_directory: str):
+    """Get the shared ChromaDB client for a directory, creating it on first call"""
+    with _shared_clients_lock:
+        client = _shared_clients.get(persist_directory)
+        if client is None:
+            client = _open_client(persist_directory)
+            _shared_clients[persist_directory] = client
+        return client
+
+
+class VectorMemoryStore:
+    """ChromaDB vector storage manager"""
+    
+    query_cache_size = 256         # Recent searches kept for semantic reuse
+    query_cache_threshold = 0.97   # Min cosine similarity for a query to reuse a cached search
+    document_user_chars = 512      # Characters of the user message embedded per conversation
+    document_response_chars = 256  # Characters of the AI response embedded per conversation
+    
+    def __init__(
+        self,
+        persist_directory: str = "./data/chromadb",
+        openai_api_key: Optional[str] = None,
+        client=None,
+        collection_name: str = "conversation_memory",
+        write_batch_size: int = 1,
+        write_flush_delay: float = 2.0,
+        hnsw_settings: Optional[Dict] = None
+    ):
+        """
+        Initialize ChromaDB client
+        
+        Args:
+            persist_directory: Data persistence directory (ignored if client is given)
+            openai_api_key: OpenAI API key (deprecated, now using free local model)
+            client: Existing ChromaDB client to share (e.g. from get_shared_client)
+            collection_name: Collection holding this store's conversations
+            write_batch_size: Conversations buffered by add_conversation before they are
+                embedded and added together (1 = add immediately)
+            write_flush_delay: Seconds after which a partial buffer is added anyway
+            hnsw_settings: Overrides for HNSW_SETTINGS (applied when the collection is created)
+        """
+        self.collection_name = collection_name
+        self.collection_metadata = {**HNSW_SETTINGS, **(hnsw_settings or {})}
+        
+        if client is not None:
+            self.client = client
+        else:
+            # Initialize ChromaDB client (creates the directory)
+            self.client = _open_client(persist_directory)
+        
+        # Shared, process-wide embedding function (model weights loaded only once)
+        self.embedding_function = get_embedding_function()
+        
+        # Semantic search cache: normalized query embeddings (rows) and their
+        # (n_results, results); cleared whenever conversations are added
+        self._qcache_vecs: Optional[np.ndarray] = None
+        self._qcache_results: List[Tuple[int, List[Dict]]] = []
+        self._qcache_lock = threading.Lock()
+        
+        # Buffered add_conversation writes: (document, metadata, id), added by flush()
+        self.write_batch_size = write_batch_size
+        self.write_flush_delay = write_flush_delay
+        self._pending_writes: List[Tuple[str, Dict, str]] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        self._pending_lock = threading.Lock()
+        if write_batch_size > 1:
+            atexit.register(self.flush)
+        
+        # Monotonic ID prefix (milliseconds at startup, +1 per conversation), unique within the process
+        self._id_counter = itertools.count(int(time.time() * 1000))
+        
+        # Worker for the *_async methods; one thread keeps writes and searches in call order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vecstore")
         
         # Create or get collection
         try:
             self.collection = self.client.get_or_create_collection(
-                name="conversation_memory",
+                name=self.collection_name,
                 embedding_function=self.embedding_function,
-                metadata={"hnsw:space": "cosine"}  # Use cosine similarity
+                metadata=self.collection_metadata
             )
-            print(f"✓ ChromaDB collection initialized: {self.collection.count()} conversations stored")
+            # Stored conversations, counted locally so searches skip a COUNT query
+            self._count = self.collection.count()
+            print(f"✓ ChromaDB collection initialized: {self._count} conversations stored")
         except Exception as e:
             print(f"✗ Failed to initialize ChromaDB collection: {e}")
             raise
     
+    def _conversation_id(self, user_message: str, ai_response: str) -> str:
+        """Unique conversation ID: counter plus a content hash (hashed piecewise, no concatenation)"""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(user_message.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(ai_response.encode("utf-8"))
+        return f"conv_{next(self._id_counter)}_{digest.hexdigest()}"
+    
+    def _document(self, user_message: str, ai_response: str) -> str:
+        """
+        Text embedded for a conversation
+        
+        Mostly the user message (what later queries resemble) with the start of the
+        response; shorter than the full turn, so embedding is cheaper. The texts
+        returned by searches come from the metadata.
+        """
+        return f"{user_message[:self.document_user_chars]}\n{ai_response[:self.document_response_chars]}"
+    
     def add_conversation(
         self, 
         user_message: str, 
@@ -72,6 +358,9 @@ class VectorMemoryStore:
         """
         Save conversation to vector database
         
+        With write_batch_size > 1 the conversation is buffered and added with the
+        next flush (buffer full, write_flush_delay elapsed, search or close).
+        
         Args:
             user_message: User message
             ai_response: AI response
@@ -82,35 +371,204 @@ class VectorMemoryStore:
         """
         try:
             # Generate unique ID
-            conversation_id = f"conv_{datetime.now().timestamp()}_{hash(user_message + ai_response) % 10000}"
+            conversation_id = self._conversation_id(user_message, ai_response)
             
             # Combine user message and AI response as document
-            document = f"User: {user_message}\nAssistant: {ai_response}"
+            document = self._document(user_message, ai_response)
             
             # Prepare metadata
             meta = {
                 "timestamp": datetime.now().isoformat(),
+                "ts": time.time(),  # Numeric, for max_age search filters
                 "user_message": user_message[:500],  # Limit length
                 "ai_response": ai_response[:500],     # Limit length
                 **(metadata or {})
             }
             
+            if self.write_batch_size > 1:
+                self._buffer_write(document, meta, conversation_id)
+                return conversation_id
+            
             # Add to collection
-            self.collection.add(
-                documents=[document],
-                metadatas=[meta],
-                ids=[conversation_id]
-            )
+            self._add([document], [meta], [conversation_id])
             
             return conversation_id
         except Exception as e:
             print(f"✗ Failed to add conversation to vector store: {e}")
             return ""
     
+    def _buffer_write(self, document: str, meta: Dict, conversation_id: str):
+        """Queue a write, flushing when the buffer is full or (via timer) after write_flush_delay"""
+        with self._pending_lock:
+            self._pending_writes.append((document, meta, conversation_id))
+            full = len(self._pending_writes) >= self.write_batch_size
+            if not full and self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.write_flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        if full:
+            self.flush()
+    
+    def flush(self):
+        """Add buffered conversations with one add call (one embedding batch)"""
+        with self._pending_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            pending, self._pending_writes = self._pending_writes, []
+        if not pending or self.collection is None:
+            return
+        
+        documents, metadatas, ids = (list(column) for column in zip(*pending))
+        try:
+            self._add(documents, metadatas, ids)
+        except Exception as e:
+            print(f"✗ Failed to add conversations to vector store: {e}")
+    
+    def add_conversations(self, conversations: List[Tuple[str, str]]) -> List[str]:
+        """
+        Save several conversations to vector database with a single add call
+        
+        Embedding and index insertion are batched, which is cheaper than
+        calling add_conversation once per conversation.
+        
+        Args:
+            conversations: List of (user_message, ai_response) pairs
+            
+        Returns:
+            List of conversation IDs (empty on failure)
+        """
+        if not conversations:
+            return []
+        
+        try:
+            timestamp = datetime.now().isoformat()
+            ts = time.time()
+            ids = []
+            documents = []
+            metadatas = []
+            for user_message, ai_response in conversations:
+                ids.append(self._conversation_id(user_message, ai_response))
+                documents.append(self._document(user_message, ai_response))
+                metadatas.append({
+                    "timestamp": timestamp,
+                    "ts": ts,
+                    "user_message": user_message[:500],  # Limit length
+                    "ai_response": ai_response[:500],     # Limit length
+                })
+            
+            self._add(documents, metadatas, ids)
+            
+            return ids
+        except Exception as e:
+            print(f"✗ Failed to add conversations to vector store: {e}")
+            return []
+    
+    def _embedding_model(self) -> str:
+        """Name of the embedding model, stored with each embedding"""
+        return type(self.embedding_function).__name__ if self.embedding_function is not None else ""
+    
+    def _add(self, documents: List[str], metadatas: List[Dict], ids: List[str]) -> Optional[np.ndarray]:
+        """
+        Embed and add conversations with one add call
+        
+        Each embedding is also stored in its metadata (float16) with the model name,
+        so rebuild_collection can re-index without embedding again.
+        
+        Returns:
+            (N, dim) normalized embeddings, None without an embedding function
+        """
+        embeddings = self._embed_texts(documents)
+        if embeddings is None:
+            self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
+        else:
+            model = self._embedding_model()
+            for meta, vector in zip(metadatas, embeddings):
+                meta["emb_model"] = model
+                meta["emb_fp16"] = _encode_embedding(vector)
+            self.collection.add(
+                documents=documents, metadatas=metadatas, ids=ids, embeddings=embeddings.tolist()
+            )
+        self._on_added(len(ids))
+        return embeddings
+    
+    def _embed_texts(self, texts: List[str]) -> Optional[np.ndarray]:
+        """L2-normalized (N, dim) embeddings of texts, None without an embedding function"""
+        if self.embedding_function is None:
+            return None
+        vectors = np.asarray(self.embedding_function(texts), dtype=np.float32)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    
+    def _embed_text(self, text: str) -> Optional[np.ndarray]:
+        """L2-normalized embedding of a text, None without an embedding function"""
+        vectors = self._embed_texts([text])
+        return vectors[0] if vectors is not None else None
+    
+    def _cached_search(self, query_embedding: np.ndarray, n_results: int) -> Optional[List[Dict]]:
+        """Results of a cached search for a near-identical query, or None"""
+        with self._qcache_lock:
+            if self._qcache_vecs is None or self._qcache_vecs.shape[1] != query_embedding.shape[0]:
+                return None
+            sims = self._qcache_vecs @ query_embedding
+            for i in np.argsort(-sims):
+                if sims[i] < self.query_cache_threshold:
+                    break
+                cached_n, results = self._qcache_results[i]
+                if cached_n == n_results:
+                    return [dict(result) for result in results]
+            return None
+    
+    def _cache_search(self, query_embedding: np.ndarray, n_results: int, results: List[Dict]):
+        """Remember a search's results, dropping the oldest beyond query_cache_size"""
+        with self._qcache_lock:
+            row = query_embedding[np.newaxis, :]
+            if self._qcache_vecs is None or self._qcache_vecs.shape[1] != row.shape[1]:
+                self._qcache_vecs = row
+                self._qcache_results = []
+            else:
+                self._qcache_vecs = np.concatenate((self._qcache_vecs, row))[-self.query_cache_size:]
+            self._qcache_results.append((n_results, [dict(result) for result in results]))
+            del self._qcache_results[:-self.query_cache_size]
+    
+    def _clear_query_cache(self, count: Optional[int] = None):
+        """
+        Forget cached searches (their results may be stale once the collection changes)
+        
+        Args:
+            count: New stored conversation count, if it changed
+        """
+        with self._qcache_lock:
+            self._qcache_vecs = None
+            self._qcache_results = []
+            if count is not None:
+                self._count = count
+    
+    def _on_added(self, added: int):
+        """Record conversations added to the collection"""
+        with self._qcache_lock:
+            self._qcache_vecs = None
+            self._qcache_results = []
+            self._count += added
+    
+    def resync_count(self):
+        """Re-read the stored conversation count (if the collection was changed elsewhere)"""
+        self._clear_query_cache(self.collection.count())
+    
+    @staticmethod
+    def _format_result(metadata: Dict, score: float) -> Dict:
+        """Search result for a stored conversation's metadata"""
+        return {
+            "user_message": metadata.get("user_message", ""),
+            "ai_response": metadata.get("ai_response", ""),
+            "timestamp": metadata.get("timestamp", ""),
+            "relevance_score": score
+        }
+    
     def search_relevant_conversations(
         self, 
         query: str, 
-        n_results: int = 3
+        n_results: int = 3,
+        max_age: Optional[float] = None
     ) -> List[Dict]:
         """
         Retrieve relevant historical conversations based on query
@@ -118,6 +576,8 @@ class VectorMemoryStore:
         Args:
             query: Query text (usually user's latest message)
             n_results: Number of results to return
+            max_age: Only search conversations from the last max_age seconds
+                (conversations stored before this option existed are excluded)
             
         Returns:
             List of relevant conversations, format: [{
@@ -128,50 +588,214 @@ class VectorMemoryStore:
             }]
         """
         try:
-            if self.collection.count() == 0:
-                return []
+            # Buffered conversations must be searchable
+            if self._pending_writes:
+                self.flush()
+            
+            if max_age is not None:
+                return self._search_recent(query, n_results, max_age)
             
+            # A near-identical recent query (same stored conversations) reuses its results;
+            # otherwise the query embedding computed for that check is passed to Chroma
+            query_embedding = self._embed_text(query)
+            if query_embedding is not None:
+                cached = self._cached_search(query_embedding, n_results)
+                if cached is not None:
+                    return cached
+                query_args = {"query_embeddings": [query_embedding.tolist()]}
+            else:
+                query_args = {"query_texts": [query]}
+            
+            # Only metadata and distances are used: skip fetching documents and embeddings.
+            # Chroma caps n_results at the stored count itself (self._count only tracks
+            # this process's adds, so it is stale when the collection is shared)
             results = self.collection.query(
-                query_texts=[query],
-                n_results=min(n_results, self.collection.count())
+                **query_args,
+                n_results=n_results,
+                include=["metadatas", "distances"]
             )
+            conversations = self._format_results(results)
             
-            # Format return results
-            conversations = []
-            if results.get('metadatas') and len(results['metadatas']) > 0:
-                metadatas = results['metadatas'][0]
-                distances = results.get('distances', [[]])[0] if results.get('distances') else [0.0] * len(metadatas)
-                
-                for i, metadata in enumerate(metadatas):
-                    distance = distances[i] if i < len(distances) else 0.0
-                    conversations.append({
-                        "user_message": metadata.get("user_message", ""),
-                        "ai_response": metadata.get("ai_response", ""),
-                        "timestamp": metadata.get("timestamp", ""),
-                        "relevance_score": max(0.0, 1.0 - distance)  # Convert cosine distance to similarity
-                    })
-            
+            if query_embedding is not None:
+                self._cache_search(query_embedding, n_results, conversations)
             return conversations
         except Exception as e:
             print(f"✗ Failed to search conversations: {e}")
             return []
     
+    def _search_recent(self, query: str, n_results: int, max_age: float) -> List[Dict]:
+        """
+        Search conversations from the last max_age seconds
+        
+        The filter is applied by Chroma, which also caps the results at the number of
+        matching conversations. Filtered searches skip the search caches.
+        """
+        query_embedding = self._embed_text(query)
+        if query_embedding is not None:
+            query_args = {"query_embeddings": [query_embedding.tolist()]}
+        else:
+            query_args = {"query_texts": [query]}
+        
+        results = self.collection.query(
+            **query_args,
+            where={"ts": {"$gt": time.time() - max_age}},
+            n_results=n_results,
+            include=["metadatas", "distances"]
+        )
+        return self._format_results(results)
+    
+    def _format_results(self, results: Dict) -> List[Dict]:
+        """Search results for a Chroma query result"""
+        metadatas = (results.get('metadatas') or [[]])[0]
+        distances = (results.get('distances') or [[]])[0]
+        # Convert cosine distances to similarities in one vectorized pass
+        scores = np.clip(1.0 - np.asarray(distances, dtype=np.float32), 0.0, 1.0).tolist()
+        return [self._format_result(metadata, score) for metadata, score in zip(metadatas, scores)]
+    
+    def add_conversation_async(
+        self,
+        user_message: str,
+        ai_response: str,
+        metadata: Optional[Dict] = None
+    ) -> Future:
+        """Run add_conversation on the store's worker thread (Future of the conversation ID)"""
+        return self._executor.submit(self.add_conversation, user_message, ai_response, metadata)
+    
+    def search_relevant_conversations_async(
+        self,
+        query: str,
+        n_results: int = 3,
+        max_age: Optional[float] = None
+    ) -> Future:
+        """Run search_relevant_conversations on the store's worker thread (Future of the results)"""
+        return self._executor.submit(self.search_relevant_conversations, query, n_results, max_age)
+    
     def get_conversation_count(self) -> int:
         """Get total number of stored conversations"""
         try:
-            return self.collection.count()
+            return self._count + len(self._pending_writes)
         except Exception:
             return 0
     
+    def close(self):
+        """Release the client and collection (the store is unusable afterwards)
+        
+        A shared client stays open for its other users; only the reference is dropped.
+        """
+        self._executor.shutdown(wait=True)  # Let queued async writes finish
+        self.flush()
+        self.collection = None
+        self.client = None
+    
+    def import_collection(self, persist_directory: str, collection_name: str = "conversation_memory") -> int:
+        """
+        Copy the conversations of a collection in another ChromaDB directory into this store
+        
+        Stored embeddings are copied as they are (nothing is embedded again), and
+        conversations are upserted by ID, so importing the same collection twice
+        doesn't duplicate them.
+        
+        Returns:
+            Number of conversations copied
+        """
+        self.flush()
+        source = _open_client(persist_directory).get_collection(
+            name=collection_name,
+            embedding_function=self.embedding_function
+        )
+        total = source.count()
+        for offset in range(0, total, 1000):
+            data = source.get(include=["documents", "metadatas", "embeddings"], limit=1000, offset=offset)
+            if len(data["ids"]) == 0:
+                break
+            self.collection.upsert(
+                ids=data["ids"],
+                documents=data["documents"],
+                metadatas=data["metadatas"],
+                embeddings=data["embeddings"]
+            )
+        self._clear_query_cache(self.collection.count())
+        return total
+    
+    def rebuild_collection(self) -> bool:
+        """
+        Recreate the collection, e.g. to apply changed hnsw_settings
+        
+        Conversations whose metadata holds an embedding from the current model are
+        re-added with it; others are embedded again. The new collection is filled
+        before the old one is deleted, so a failure leaves the old one in place.
+        """
+        self.flush()
+        temp_name = f"{self.collection_name}_rebuild"
+        replaced = False
+        try:
+            data = self.collection.get(include=["documents", "metadatas"])
+            ids, documents = data["ids"], data["documents"]
+            metadatas = [meta or {} for meta in data["metadatas"]]
+            
+            model = self._embedding_model()
+            embeddings = [
+                _decode_embedding(meta["emb_fp16"]) if model and meta.get("emb_model") == model else None
+                for meta in metadatas
+            ]
+            missing = [i for i, vector in enumerate(embeddings) if vector is None]
+            if missing and self.embedding_function is not None:
+                fresh = self._embed_texts([documents[i] for i in missing])
+                for i, vector in zip(missing, fresh):
+                    embeddings[i] = vector
+                    metadatas[i] = {**metadatas[i], "emb_model": model, "emb_fp16": _encode_embedding(vector)}
+            
+            try:
+                self.client.delete_collection(name=temp_name)  # Left over from a failed rebuild
+            except Exception:
+                pass
+            new_collection = self.client.get_or_create_collection(
+                name=temp_name,
+                embedding_function=self.embedding_function,
+                metadata=self.collection_metadata
+            )
+            for start in range(0, len(ids), 1000):
+                end = start + 1000
+                batch_embeddings = embeddings[start:end]
+                new_collection.add(
+                    ids=ids[start:end],
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end],
+                    **({"embeddings": [vector.tolist() for vector in batch_embeddings]}
+                       if all(vector is not None for vector in batch_embeddings) else {})
+                )
+            
+            self.client.delete_collection(name=self.collection_name)
+            replaced = True
+            new_collection.modify(name=self.collection_name)
+            self.collection = new_collection
+            self._clear_query_cache(len(ids))
+            print(f"✓ Rebuilt vector store collection: {len(ids)} conversations")
+            return True
+        except Exception as e:
+            print(f"✗ Failed to rebuild vector store collection: {e}")
+            if not replaced:
+                try:
+                    self.client.delete_collection(name=temp_name)
+                except Exception:
+                    pass
+            return False
+    
     def clear_all(self):
         """Clear all conversations (for testing)"""
+        with self._pending_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._pending_writes = []
         try:
-            self.client.delete_collection(name="conversation_memory")
+            self.client.delete_collection(name=self.collection_name)
             self.collection = self.client.get_or_create_collection(
-                name="conversation_memory",
+                name=self.collection_name,
                 embedding_function=self.embedding_function,
-                metadata={"hnsw:space": "cosine"}
+                metadata=self.collection_metadata
             )
+            self._clear_query_cache(0)
             print("✓ Cleared all conversations from vector store")
         except Exception as e:
             print(f"✗ Failed to clear conversations: {e}")
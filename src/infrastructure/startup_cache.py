@@ -0,0 +1,95 @@
+"""
+Startup cache module
+Persists the results of startup checks across launches, keyed by their inputs
+"""
+import functools
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# One pickle file per memoized function
+CACHE_DIR = Path(__file__).parent.parent.parent / "data" / "startup_cache"
+MAX_ENTRIES = 16  # Entries kept per function (oldest dropped first)
+
+
+def _load_entries(path: Path) -> Dict[Hashable, Any]:
+    """Load a function's cached entries (empty if the file is missing or unreadable)"""
+    try:
+        with open(path, 'rb') as f:
+            entries = pickle.load(f)
+        return entries if isinstance(entries, dict) else {}
+    except Exception:
+        return {}
+
+
+def _save_entries(path: Path, entries: Dict[Hashable, Any]):
+    """Write a function's cached entries (temp file and replace, so a crash never leaves half a file)"""
+    tmp_path = path.with_suffix(".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (OSError, pickle.PicklingError) as e:
+        print(f"⚠ Warning: Failed to save startup cache {path.name}: {e}")
+
+
+def persistent_memoize(
+    key_fn: Callable[..., Hashable],
+    cache_if: Optional[Callable[[Any], bool]] = None
+):
+    """
+    Memoize a function's results in a file that survives restarts
+    
+    Results are stored in CACHE_DIR/<function name>.pkl under key_fn(*args, **kwargs);
+    the file is loaded on the first call and rewritten after each stored miss. Entries
+    never expire, so the key must include everything the result depends on (package
+    versions, file modification times). Results must be picklable.
+    
+    Args:
+        key_fn: Cache key for a call's arguments (only computed while entries exist
+            or a result is stored)
+        cache_if: Which results to store (default: all)
+    """
+    def decorator(fn: Callable):
+        path = CACHE_DIR / f"{fn.__name__}.pkl"
+        entries = None
+        lock = threading.Lock()
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal entries
+            with lock:
+                if entries is None:
+                    entries = _load_entries(path)
+                cached = bool(entries)
+            key = key_fn(*args, **kwargs) if cached else None
+            if cached:
+                with lock:
+                    if key in entries:
+                        return entries[key]
+            
+            result = fn(*args, **kwargs)
+            if cache_if is not None and not cache_if(result):
+                return result
+            if not cached:
+                key = key_fn(*args, **kwargs)
+            with lock:
+                entries[key] = result
+                while len(entries) > MAX_ENTRIES:
+                    del entries[next(iter(entries))]
+                _save_entries(path, entries)
+            return result
+        
+        def cache_clear():
+            """Drop all cached results, in memory and on disk"""
+            nonlocal entries
+            with lock:
+                entries = {}
+                path.unlink(missing_ok=True)
+        
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
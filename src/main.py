@@ -2,15 +2,27 @@
 Main program entry point
 Handles first run check and window initialization
 """
+import functools
+import importlib
+import importlib.metadata
 import os
+import re
 import sys
 import signal
-from datetime import datetime, timedelta
+import site
+import socket
+import sysconfig
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QFileSystemWatcher, QObject, QRunnable, QSocketNotifier, QThreadPool, pyqtSignal
 
-from .infrastructure.config_manager import ConfigManager
-from .infrastructure.memory.vector_store import VectorMemoryStore
+from .infrastructure.config_manager import ConfigManager, HISTORY_MAX_MESSAGES
+from .infrastructure.api_clients.system_prompt import SystemPrompt
+from .infrastructure.startup_cache import persistent_memoize
 from .domain.profile.profile_manager import ProfileManager
 from .domain.ai.profile_extractor import ProfileExtractor
 from .presentation.floating_window import FloatingWindow
@@ -20,30 +32,357 @@ from .presentation.personality_setup_window import PersonalitySetupWindow
 from pathlib import Path
 
 
+# Milliseconds without new messages before pending history is written
+HISTORY_SAVE_DELAY_MS = 2000
+
+# Greeting words (whole words, any case) and question marks, for picking the history window
+_GREETING_RE = re.compile(r"\b(?:hello|hi|hey)\b|你好|嗨", re.IGNORECASE)
+_QUESTION_MARKS = frozenset("?？")
+# Greetings shorter than this skip the RAG memory search
+RAG_MIN_GREETING_CHARS = 20
+
+# Provider module, provider class and the SDK package it imports, per provider name
+_PROVIDER_SDKS = {
+    "openai": ("openai_provider", "OpenAIProvider", "openai"),
+    "claude": ("claude_provider", "ClaudeProvider", "anthropic"),
+    "gemini": ("gemini_provider", "GeminiProvider", "google-generativeai"),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _provider_class(provider_name: str):
+    """
+    Provider class for a provider name, or None for an unknown provider
+    
+    Imported on first use, so only the configured provider's SDK is loaded;
+    raises ImportError if its SDK is missing.
+    """
+    entry = _PROVIDER_SDKS.get(provider_name)
+    if entry is None:
+        return None
+    module_name, class_name, _ = entry
+    module = importlib.import_module(f".domain.ai.providers.{module_name}", __package__)
+    return getattr(module, class_name)
+
+
+def _sdk_probe_key(provider_name: str) -> tuple:
+    """
+    Inputs an SDK import check depends on
+    
+    Installing or removing any package changes its site-packages directory's
+    modification time (the environment's, or the user site for pip --user),
+    so a cached result is dropped once dependencies change.
+    """
+    _, _, package = _PROVIDER_SDKS.get(provider_name, (None, None, None))
+    try:
+        version = importlib.metadata.version(package) if package else None
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    paths = sysconfig.get_paths()
+    site_mtimes = []
+    for directory in (paths["purelib"], paths["platlib"], site.getusersitepackages()):
+        try:
+            site_mtimes.append(os.stat(directory).st_mtime_ns)
+        except OSError:
+            site_mtimes.append(None)
+    return provider_name, version, sys.version_info[:2], tuple(site_mtimes)
+
+
+@persistent_memoize(_sdk_probe_key, cache_if=lambda error: error is not None)
+def _probe_provider_sdk(provider_name: str) -> Optional[str]:
+    """
+    Error from importing a provider's module, or None if it imports
+    
+    Only failures are cached across launches: a successful import happens in
+    _provider_class anyway, so caching it would save nothing.
+    """
+    try:
+        _provider_class(provider_name)
+    except ImportError as e:
+        import traceback
+        traceback.print_exc()
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+# Character config fields shown as "Label: value" in the system prompt, in prompt order
+_CHARACTER_LABELED_FIELDS = (
+    ("personality", "Personality"),
+    ("backstory", "Backstory"),
+    ("traits", "Traits"),
+    ("preferences", "Preferences"),
+    ("worldview_background", "Worldview Background"),
+    ("worldview_setting", "Worldview Setting"),
+)
+# All character config fields used in the system prompt
+_CHARACTER_PROMPT_FIELDS = ("output_example", "notes") + tuple(field for field, _ in _CHARACTER_LABELED_FIELDS)
+
+
+@functools.lru_cache(maxsize=8)
+def _build_static_prompt(
+    character_fields: Tuple[str, ...],
+    personality: str,
+    profile_snapshot: Tuple[str, Tuple[str, ...], Tuple[str, ...]],
+    max_tokens_bucket: int
+) -> str:
+    """
+    Build the part of the system prompt that doesn't depend on the current message
+    
+    Cached on its arguments, so the formatting runs again only when the character
+    config, personality, profile or max_tokens bucket actually changes. The same
+    string is returned every time, so it forms a stable prompt prefix.
+    
+    Args:
+        character_fields: Values of _CHARACTER_PROMPT_FIELDS as strings ("" if unset)
+        personality: Simple personality, used when the character config has none
+        profile_snapshot: (name, first 3 traits, first 3 goals) of the user profile
+        max_tokens_bucket: 0 for max_tokens <= 100, 1 for <= 200, else 2
+    
+    Returns:
+        Static system prompt (sections 1, 2, 3 and 5 of _build_system_prompt)
+    """
+    output_example, notes, *labeled_values = character_fields
+    parts = []
+    
+    # ===== 1. CRITICAL: Output Example & Performance (highest priority, placed first) =====
+    # This is the most important part: strictly follow user-set performance to generate messages
+    # Placed first to ensure AI sees and follows these requirements first
+    has_output_example = False
+    if output_example:
+        # Prioritize performance requirements in output_example, mark with CRITICAL
+        parts.append(f"⚠️ CRITICAL - Output Example & Performance Requirements (MUST FOLLOW EXACTLY):\n{output_example}")
+        has_output_example = True
+    
+    # Notes usually contain important length and style requirements, should be included
+    if notes:
+        # If output_example already exists, notes as supplement; otherwise notes as main guidance
+        if has_output_example:
+            # output_example already contains main requirements, notes as supplementary emphasis
+            parts.append(f"⚠️ CRITICAL - Additional Notes (MUST FOLLOW):\n{notes}")
+        else:
+            # When no output_example, notes as main guidance
+            parts.append(f"⚠️ CRITICAL - Response Guidelines (MUST FOLLOW):\n{notes}")
+            has_output_example = True
+    
+    # ===== 2. Character Personality (full mode, no truncation), then other config items =====
+    for (_, label), value in zip(_CHARACTER_LABELED_FIELDS, labeled_values):
+        if value:
+            parts.append(f"{label}: {value}")
+    
+    # Fallback to simple personality if no detailed config
+    if not labeled_values[0]:
+        if personality:
+            parts.append(f"Personality: {personality}")
+        else:
+            parts.append("You are a friendly and supportive AI companion.")
+    
+    # ===== 3. User Profile =====
+    name, profile_traits, goals = profile_snapshot
+    profile_summary = []
+    if name:
+        profile_summary.append(f"User: {name}")
+    if profile_traits:
+        profile_summary.append(f"Traits: {', '.join(profile_traits)}")
+    if goals:
+        profile_summary.append(f"Goals: {', '.join(goals)}")
+    if profile_summary:
+        parts.append(" | ".join(profile_summary))
+    
+    # ===== 5. Guidelines (only use default guidelines if output_example and notes don't exist) =====
+    if not has_output_example:
+        # Calculate target sentence count based on max_tokens
+        # Roughly: 50 tokens = 1 sentence, so adjust accordingly
+        target_sentences, target_words = (("1-2", "30-50"), ("2-3", "50-80"), ("2-4", "80-120"))[max_tokens_bucket]
+        parts.append(f"""Guidelines:
+- Use the user profile information naturally in conversation
+- Reference relevant past conversations when appropriate
+- Stay consistent with your personality
+- Be proactive and caring
+- IMPORTANT: Keep responses concise ({target_sentences} sentences, {target_words} words). Express your complete thought in these few sentences - be brief but complete. Do not start a long response that gets cut off.""")
+    
+    return "\n\n".join(parts)
+
+
+class WorkerSignals(QObject):
+    """
+    Signals of background AI tasks (QRunnable is not a QObject, so it can't have its own)
+    
+    One instance per task kind is created and connected once, then shared by all its tasks.
+    """
+    chunk_ready = pyqtSignal(str)
+    response_ready = pyqtSignal(str)
+    error_occurred = pyqtSignal(str)
+
+
+class AIResponseTask(QRunnable):
+    """Streams the AI reply to a user message (runs on the global thread pool)"""
+    
+    def __init__(self, signals: WorkerSignals, provider, messages, system_prompt, max_tokens):
+        super().__init__()
+        self.signals = signals
+        self.provider = provider
+        self.messages = messages
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+    
+    def run(self):
+        try:
+            if self.provider:
+                # Stream, so the reply shows up at first-token latency
+                chunks = []
+                for chunk in self.provider.stream_response(
+                    messages=self.messages,
+                    system_prompt=self.system_prompt,
+                    max_tokens=self.max_tokens
+                ):
+                    chunks.append(chunk)
+                    self.signals.chunk_ready.emit(chunk)
+                self.signals.response_ready.emit("".join(chunks))
+            else:
+                self.signals.error_occurred.emit("AI provider not initialized. Please check your API key in settings.")
+        except Exception as e:
+            self.signals.error_occurred.emit(f"Error: {str(e)}")
+
+
+class ProactiveTask(QRunnable):
+    """Generates a proactive check-in message (runs on the global thread pool)"""
+    
+    def __init__(self, signals: WorkerSignals, provider, conversation_history, system_prompt, max_tokens, memory_lookup=None):
+        super().__init__()
+        self.signals = signals
+        self.provider = provider
+        self.conversation_history = conversation_history
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.memory_lookup = memory_lookup  # Returns the RAG memory section to append ("" if none)
+    
+    def run(self):
+        try:
+            if self.provider:
+                # Build proactive conversation prompt
+                proactive_prompt = """Generate a brief, natural proactive message to check in with the user. 
+Keep it warm, caring, and not intrusive. It should feel like a friend checking in, not a notification.
+Keep it short (1-2 sentences). Express your complete thought concisely - don't cut off mid-sentence."""
+                
+                # Use simplified context (only include last 3 messages)
+                recent_context = self.conversation_history[-3:]
+                
+                # Build messages
+                messages = [*recent_context, {
+                    "role": "user",
+                    "content": "[Generate a proactive check-in message based on our conversation context and your personality]"
+                }]
+                
+                # Relevant memory (RAG) and the proactive instructions go after the
+                # static prompt, as in _build_system_prompt
+                memory_text = self.memory_lookup() if self.memory_lookup else ""
+                dynamic_prompt = f"{memory_text}\n\n{proactive_prompt}" if memory_text else proactive_prompt
+                
+                # Enhanced system prompt
+                enhanced_system_prompt = SystemPrompt(self.system_prompt, dynamic_prompt)
+                
+                response = self.provider.generate_response(
+                    messages=messages,
+                    system_prompt=enhanced_system_prompt,
+                    max_tokens=self.max_tokens
+                )
+                self.signals.response_ready.emit(response)
+            else:
+                self.signals.error_occurred.emit("AI provider not initialized")
+        except Exception as e:
+            self.signals.error_occurred.emit(f"Error: {str(e)}")
+
+
+class ProfileUpdateTask(QRunnable):
+    """Extracts user information from recent messages into the profile (runs on the global thread pool)"""
+    
+    def __init__(self, extractor, profile_manager, messages):
+        super().__init__()
+        self.extractor = extractor
+        self.profile_manager = profile_manager
+        self.messages = messages
+    
+    def run(self):
+        try:
+            print("🔍 Extracting user information from conversation...")
+            extracted_data = self.extractor.extract_user_info(self.messages)
+            self.profile_manager.update_profile_from_ai(extracted_data)
+            print(f"✓ Profile update completed")
+        except Exception as e:
+            print(f"✗ Profile update failed: {e}")
+
+
+def _load_vector_store():
+    """Create the vector store (None if it fails); importing ChromaDB is part of the cost"""
+    try:
+        from .infrastructure.memory.vector_store import VectorMemoryStore
+        return VectorMemoryStore(
+            persist_directory="./data/chromadb"
+        )
+    except Exception as e:
+        print(f"⚠ Warning: Failed to initialize vector store: {e}")
+        return None
+
+
 class DesktopPetApp:
     """Desktop pet application main class"""
     
     def __init__(self):
         self.app = QApplication(sys.argv)
         self.config_manager = ConfigManager()
+        # Config files are watched, so config lookups don't stat them on every call
+        self._fs_watcher = QFileSystemWatcher()
+        self._fs_watcher.fileChanged.connect(self._on_config_file_changed)
+        self._fs_watcher.directoryChanged.connect(self._on_config_file_changed)
+        self._watch_config_files()
         self.window = None
         self.setup_window = None
         self.chat_ui = None
         self.setup_ui = None
         self.ai_provider = None
+        self._ai_provider_settings = None  # Settings the current AI provider was built from
         # Load conversation history from file
-        self.conversation_history = self.config_manager.load_conversation_history()
+        # (a deque: appending beyond the last 20 messages drops the oldest)
+        self.conversation_history = deque(
+            self.config_manager.load_conversation_history(), maxlen=HISTORY_MAX_MESSAGES
+        )
+        # Content of the last user message (updated in _on_message_sent)
+        self._last_user_message = next(
+            (msg.get("content", "") for msg in reversed(self.conversation_history) if msg.get("role") == "user"),
+            ""
+        )
+        # AI message bubble being filled by a streaming response
+        self._streaming_message = None
+        self._streaming_text = ""
+        # History messages not yet written, appended together once messages stop
+        # arriving for HISTORY_SAVE_DELAY_MS (and on quit). The file is written by
+        # one background thread, so batches are appended in order, off the GUI thread
+        self._pending_history = []
+        self._history_save_timer = QTimer()
+        self._history_save_timer.setSingleShot(True)
+        self._history_save_timer.timeout.connect(self._flush_history)
+        self._history_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-writer")
+        self.app.aboutToQuit.connect(self._close_history)
+        
+        # RAG results by normalized query (cleared whenever a conversation is stored)
+        self._rag_lookup = functools.lru_cache(maxsize=64)(self._search_memory)
+        
+        # Signals of background AI tasks, connected once and shared by all tasks
+        self._ai_signals = WorkerSignals()
+        self._ai_signals.chunk_ready.connect(self._on_ai_chunk)
+        self._ai_signals.response_ready.connect(self._on_ai_response)
+        self._ai_signals.error_occurred.connect(self._on_ai_error)
+        self._proactive_signals = WorkerSignals()
+        self._proactive_signals.response_ready.connect(self._on_proactive_message)
+        self._proactive_signals.error_occurred.connect(self._on_proactive_error)
         
         # Initialize two-tier memory system
         # 1. Vector store for long-term memory (ChromaDB)
         # Uses free local SentenceTransformer model (no API key needed)
-        try:
-            self.vector_store = VectorMemoryStore(
-                persist_directory="./data/chromadb"
-            )
-        except Exception as e:
-            print(f"⚠ Warning: Failed to initialize vector store: {e}")
-            self.vector_store = None
+        # Loaded in the background so the window shows without waiting for it
+        loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-store-load")
+        self._vector_store_future = loader.submit(_load_vector_store)
+        loader.shutdown(wait=False)
         
         # 2. User profile manager
         try:
@@ -58,19 +397,69 @@ class DesktopPetApp:
         self.profile_extractor = None
         
         # Proactive conversation tracking
-        self.last_user_message_time = datetime.now()  # Record last user message time
+        self._last_user_ts = time.monotonic()  # Record last user message time (monotonic seconds)
         self.proactive_interval_minutes = 10  # Proactive conversation interval (minutes)
+        self._proactive_interval_ms = self.proactive_interval_minutes * 60 * 1000
         self.proactive_timer = None  # Proactive conversation timer
         
-        # Enable Ctrl+C to quit - use timer to process signals
+        # Enable Ctrl+C to quit. Python only runs signal handlers when it gets control
+        # back from Qt's event loop, so the signal writes a byte to a socket that Qt
+        # watches; handling that wakeup runs the handler without polling
         signal.signal(signal.SIGINT, self._handle_sigint)
-        # Create timer to process signals periodically
-        self.timer = QTimer()
-        self.timer.timeout.connect(lambda: None)  # Process events
-        self.timer.start(100)  # Check every 100ms
+        self.timer = None
+        self._wakeup_read, self._wakeup_write = socket.socketpair()
+        self._wakeup_read.setblocking(False)
+        self._wakeup_write.setblocking(False)
+        try:
+            signal.set_wakeup_fd(self._wakeup_write.fileno())
+            self._wakeup_notifier = QSocketNotifier(self._wakeup_read.fileno(), QSocketNotifier.Type.Read)
+            self._wakeup_notifier.activated.connect(self._on_signal_wakeup)
+        except (ValueError, OSError):
+            # Wakeup socket unsupported: create timer to process signals periodically
+            self.timer = QTimer()
+            self.timer.timeout.connect(lambda: None)  # Process events
+            self.timer.start(100)  # Check every 100ms
+    
+    def _watch_config_files(self):
+        """
+        Watch the config files and their directories
+        
+        Directories are watched because files saved by replacing them (as ConfigManager
+        and many editors do) drop out of the watcher; they are added back here.
+        """
+        config_manager = self.config_manager
+        paths = [config_manager.data_dir, config_manager.config_file, config_manager.personality_file]
+        if config_manager.fallback_dir:
+            fallback_dir = config_manager.fallback_dir
+            paths += [fallback_dir, fallback_dir / "config.json", fallback_dir / "personality.json"]
+        
+        watched = set(self._fs_watcher.files()) | set(self._fs_watcher.directories())
+        new_paths = [str(path) for path in paths if path.exists() and str(path) not in watched]
+        failed = self._fs_watcher.addPaths(new_paths) if new_paths else []
+        # Fall back to stat-checking the files if any can't be watched
+        config_manager.files_watched = not failed
+    
+    def _on_config_file_changed(self, path: str):
+        """A config file or directory changed on disk: drop cached config lookups"""
+        self.config_manager.invalidate_cache()
+        self._watch_config_files()
+    
+    @property
+    def vector_store(self):
+        """The vector store, or None while it is still loading (or if it failed to load)"""
+        future = self._vector_store_future
+        return future.result() if future.done() else None
+    
+    def _on_signal_wakeup(self):
+        """Drain the signal wakeup socket (the pending signal handler runs on return to Python)"""
+        try:
+            self._wakeup_read.recv(64)
+        except OSError:
+            pass
     
     def _handle_sigint(self, signum, frame):
         """Handle SIGINT (Ctrl+C) signal"""
+        self._close_history()
         self.app.quit()
         sys.exit(0)
     
@@ -115,15 +504,16 @@ class DesktopPetApp:
         # Set content
         self.window.set_content(self.chat_ui)
         
-        # Connect settings changed signal
-        if hasattr(self.window, 'settings_window') and self.window.settings_window:
-            self.window.settings_window.settings_changed.connect(self._on_settings_changed)
+        # Connect settings changed signal (forwarded by the window, whose settings
+        # window is only built when first opened)
+        self.window.settings_changed.connect(self._on_settings_changed)
+        
+        config = self.config_manager.load_config()
         
         # Initialize AI provider
-        self._init_ai_provider()
+        self._apply_ai_provider_settings(config)
         
         # Load window position and opacity
-        config = self.config_manager.load_config()
         window_config = config.get("window", {})
         self.window.move(
             window_config.get("x", 100),
@@ -146,10 +536,8 @@ class DesktopPetApp:
                 welcome_msg = "Hello! I'm your AI companion."
             
             self.chat_ui.add_message(welcome_msg, is_user=False)
-            # Add welcome message to conversation history
-            self.conversation_history.append({"role": "assistant", "content": welcome_msg})
-            # Save after adding welcome message
-            self._save_conversation_history()
+            # Add welcome message to conversation history (and save it)
+            self._add_history_message({"role": "assistant", "content": welcome_msg})
         
         # Show window
         self.window.show()
@@ -157,6 +545,26 @@ class DesktopPetApp:
         # Start proactive conversation timer
         self._start_proactive_timer()
     
+    def _provider_settings(self, config: dict) -> tuple:
+        """Settings the AI provider is built from"""
+        provider_name = self.config_manager.get_ai_provider()
+        return (
+            provider_name,
+            self.config_manager.get_api_key(provider_name),
+            self.config_manager.get_model(provider_name),
+            bool(config.get("llm_cache_enabled")),
+            bool(config.get("llm_semantic_cache_enabled")),
+            self.config_manager.get_api_key("openai"),  # Semantic cache embeddings
+        )
+    
+    def _apply_ai_provider_settings(self, config: dict):
+        """(Re)initialize the AI provider, unless it was already built from these settings"""
+        settings = self._provider_settings(config)
+        if self.ai_provider and settings == self._ai_provider_settings:
+            return
+        self._init_ai_provider()
+        self._ai_provider_settings = settings if self.ai_provider else None
+    
     def _init_ai_provider(self):
         """Initialize AI provider based on configuration"""
         try:
@@ -173,22 +581,34 @@ class DesktopPetApp:
                 self.ai_provider = None
                 return
             
-            if provider_name == "openai":
-                from .domain.ai.providers.openai_provider import OpenAIProvider
-                self.ai_provider = OpenAIProvider(api_key=api_key, model=model)
-                print("OpenAI provider initialized successfully")
-            elif provider_name == "claude":
-                from .domain.ai.providers.claude_provider import ClaudeProvider
-                self.ai_provider = ClaudeProvider(api_key=api_key, model=model)
-                print("Claude provider initialized successfully")
-            elif provider_name == "gemini":
-                from .domain.ai.providers.gemini_provider import GeminiProvider
-                self.ai_provider = GeminiProvider(api_key=api_key, model=model)
-                print("Gemini provider initialized successfully")
-            else:
+            # A provider whose SDK failed to import is skipped without retrying the
+            # import until the installed packages change
+            import_error = _probe_provider_sdk(provider_name)
+            if import_error:
+                print(f"Error: Failed to import provider module: {import_error}. Please install required packages.")
+                self.ai_provider = None
+                return
+            
+            # Persistent response cache (opt-in via "llm_cache_enabled" in config.json)
+            llm_cache = None
+            config = self.config_manager.load_config()
+            if config.get("llm_cache_enabled"):
+                from .infrastructure.api_clients.llm_cache import LLMCache
+                embed = None
+                openai_key = self.config_manager.get_api_key("openai")
+                if config.get("llm_semantic_cache_enabled") and openai_key:
+                    from .infrastructure.api_clients.openai_client import OpenAIClient
+                    embed = OpenAIClient(api_key=openai_key).create_embedding
+                llm_cache = LLMCache(self.config_manager.data_dir / "llm_cache.sqlite3", embed=embed)
+                print(f"LLM response cache enabled (semantic: {embed is not None})")
+            
+            provider_class = _provider_class(provider_name)
+            if provider_class is None:
                 print(f"Warning: Unknown provider {provider_name}")
                 self.ai_provider = None
                 return
+            self.ai_provider = provider_class(api_key=api_key, model=model, llm_cache=llm_cache)
+            print(f"{provider_class.__name__} initialized successfully")
             
             # Initialize profile extractor after AI provider is ready
             if self.ai_provider and self.profile_manager:
@@ -217,11 +637,13 @@ class DesktopPetApp:
     
     def _on_settings_changed(self):
         """Handle settings change"""
+        # Saved by the settings window's own ConfigManager: don't wait for the file watcher
+        self.config_manager.invalidate_cache()
         config = self.config_manager.load_config()
         opacity = config.get("opacity", 92)
         self._apply_opacity(opacity)
-        # Reinitialize AI provider in case API key changed
-        self._init_ai_provider()
+        # Reinitialize AI provider only if its settings changed (not e.g. for opacity)
+        self._apply_ai_provider_settings(config)
         # Refresh chat UI to show new avatars
         if self.chat_ui:
             # Re-add last message to refresh avatars
@@ -258,7 +680,7 @@ class DesktopPetApp:
     def _on_message_sent(self, message: str):
         """Callback when user sends a message"""
         # Update last user message time
-        self.last_user_message_time = datetime.now()
+        self._last_user_ts = time.monotonic()
         
         # Reset proactive timer (user is actively chatting)
         self._reset_proactive_timer()
@@ -266,17 +688,14 @@ class DesktopPetApp:
         # Display user message
         self.chat_ui.add_message(message, is_user=True)
         
-        # Add to conversation history
-        self.conversation_history.append({"role": "user", "content": message})
-        # Save conversation history after user message
-        self._save_conversation_history()
+        # Add to conversation history (and save it)
+        self._add_history_message({"role": "user", "content": message})
+        self._last_user_message = message
         
         # Show thinking indicator
         self.chat_ui.add_thinking_indicator()
         
         # Generate AI response in background
-        from PyQt6.QtCore import QThread, pyqtSignal
-        
         # Build system prompt from personality/character config
         # Always use full mode, don't limit personality and RAG
         
@@ -290,41 +709,25 @@ class DesktopPetApp:
         # Use dynamic history window
         relevant_history = self._get_relevant_history(message)
         
-        class AIWorker(QThread):
-            response_ready = pyqtSignal(str)
-            error_occurred = pyqtSignal(str)
-            
-            def __init__(self, provider, messages, system_prompt, max_tokens):
-                super().__init__()
-                self.provider = provider
-                self.messages = messages
-                self.system_prompt = system_prompt
-                self.max_tokens = max_tokens
-            
-            def run(self):
-                try:
-                    if self.provider:
-                        response = self.provider.generate_response(
-                            messages=self.messages,
-                            system_prompt=self.system_prompt,
-                            max_tokens=self.max_tokens
-                        )
-                        self.response_ready.emit(response)
-                    else:
-                        self.error_occurred.emit("AI provider not initialized. Please check your API key in settings.")
-                except Exception as e:
-                    self.error_occurred.emit(f"Error: {str(e)}")
-        
-        # Create and start worker thread
-        self.ai_worker = AIWorker(
+        # Start the task on the thread pool (its signals were connected in __init__)
+        self._streaming_message = None
+        self._streaming_text = ""
+        QThreadPool.globalInstance().start(AIResponseTask(
+            self._ai_signals,
             provider=self.ai_provider,
-            messages=relevant_history.copy(),  # Use filtered history
+            messages=relevant_history,  # Use filtered history
             system_prompt=system_prompt,
             max_tokens=max_tokens
-        )
-        self.ai_worker.response_ready.connect(self._on_ai_response)
-        self.ai_worker.error_occurred.connect(self._on_ai_error)
-        self.ai_worker.start()
+        ))
+    
+    def _on_ai_chunk(self, chunk: str):
+        """Show a streamed response chunk (the first one replaces the thinking indicator)"""
+        self._streaming_text += chunk
+        if self._streaming_message is None:
+            self.chat_ui.remove_thinking_indicator()
+            self._streaming_message = self.chat_ui.add_message(self._streaming_text, is_user=False)
+        else:
+            self.chat_ui.update_message(self._streaming_message, self._streaming_text)
     
     def _build_system_prompt(self, include_rag: bool = True) -> str:
         """
@@ -337,136 +740,84 @@ class DesktopPetApp:
         1. CRITICAL: Output Example & Performance (highest priority, placed first)
         2. Character Personality
         3. User Profile (from JSON)
-        4. Relevant Past Conversations (RAG)
         5. Guidelines (if output_example doesn't exist, use default guidelines)
+        4. Relevant Past Conversations (RAG)
+        
+        Sections 1-3 and 5 are static (cached, see _build_static_prompt); the RAG
+        memory changes per message, so it goes last and the rest stays a stable
+        prefix that providers' prompt caches can reuse.
         """
-        parts = []
         character_config = self.config_manager.load_character_config()
+        character_fields = tuple(
+            str(value) if (value := character_config.get(field)) else ""
+            for field in _CHARACTER_PROMPT_FIELDS
+        )
+        # Simple personality is only used when the character config has none
+        personality = "" if character_fields[2] else (self.config_manager.load_personality() or "")
         
-        # ===== 1. CRITICAL: Output Example & Performance (highest priority, placed first) =====
-        # This is the most important part: strictly follow user-set performance to generate messages
-        # Placed first to ensure AI sees and follows these requirements first
-        has_output_example = False
-        if character_config.get("output_example"):
-            # Prioritize performance requirements in output_example, mark with CRITICAL
-            parts.append(f"⚠️ CRITICAL - Output Example & Performance Requirements (MUST FOLLOW EXACTLY):\n{character_config['output_example']}")
-            has_output_example = True
-        
-        # Notes usually contain important length and style requirements, should be included
-        if character_config.get("notes"):
-            # If output_example already exists, notes as supplement; otherwise notes as main guidance
-            if has_output_example:
-                # output_example already contains main requirements, notes as supplementary emphasis
-                parts.append(f"⚠️ CRITICAL - Additional Notes (MUST FOLLOW):\n{character_config['notes']}")
-            else:
-                # When no output_example, notes as main guidance
-                parts.append(f"⚠️ CRITICAL - Response Guidelines (MUST FOLLOW):\n{character_config['notes']}")
-                has_output_example = True
-        
-        # ===== 2. Character Personality (full mode, no truncation) =====
-        if character_config.get("personality"):
-            personality = character_config['personality']
-            parts.append(f"Personality: {personality}")
-        
-        # Other config items always added
-        if character_config.get("backstory"):
-            parts.append(f"Backstory: {character_config['backstory']}")
-        if character_config.get("traits"):
-            parts.append(f"Traits: {character_config['traits']}")
-        if character_config.get("preferences"):
-            parts.append(f"Preferences: {character_config['preferences']}")
-        if character_config.get("worldview_background"):
-            parts.append(f"Worldview Background: {character_config['worldview_background']}")
-        if character_config.get("worldview_setting"):
-            parts.append(f"Worldview Setting: {character_config['worldview_setting']}")
-        
-        # Fallback to simple personality if no detailed config
-        if not any("Personality:" in p for p in parts):
-            personality = self.config_manager.load_personality()
-            if personality:
-                parts.append(f"Personality: {personality}")
-            else:
-                parts.append("You are a friendly and supportive AI companion.")
-        
-        # ===== 3. User Profile =====
+        profile_snapshot = ("", (), ())
         if self.profile_manager:
             profile = self.profile_manager.get_profile()
-            profile_summary = []
-            
-            if profile.name:
-                profile_summary.append(f"User: {profile.name}")
-            
-            if profile.personality_traits:
-                # Only take first 3 traits
-                traits = ", ".join(profile.personality_traits[:3])
-                profile_summary.append(f"Traits: {traits}")
-            
-            if profile.goals:
-                # Show first 3 goals
-                goals = ", ".join(profile.goals[:3])
-                profile_summary.append(f"Goals: {goals}")
-            
-            if profile_summary:
-                parts.append(" | ".join(profile_summary))
+            # Only first 3 traits and goals are shown
+            profile_snapshot = (
+                profile.name or "",
+                tuple(profile.personality_traits[:3]),
+                tuple(profile.goals[:3]),
+            )
+        
+        max_tokens = self.config_manager.get_max_tokens()
+        max_tokens_bucket = 0 if max_tokens <= 100 else 1 if max_tokens <= 200 else 2
+        
+        static_prompt = _build_static_prompt(
+            character_fields, personality, profile_snapshot, max_tokens_bucket
+        )
         
         # ===== 4. Relevant Past Conversations (RAG) - Load on demand, only include high relevance memories =====
-        if include_rag and self.vector_store and self.conversation_history:
-            last_user_msg = self._get_last_user_message()
-            if last_user_msg:
-                relevant_convs = self.vector_store.search_relevant_conversations(
-                    query=last_user_msg,
-                    n_results=2  # Reduced from 3 to 2
-                )
-                
-                # Only include high relevance memories (similarity > 0.7)
-                high_relevance_convs = [
-                    conv for conv in relevant_convs 
-                    if conv.get('relevance_score', 0) > 0.7
-                ]
-                
-                if high_relevance_convs:
-                    memory_text = "Relevant memory:\n"
-                    conv = high_relevance_convs[0]  # Only take the most relevant one
-                    # Limit length of each memory
-                    user_msg = conv.get('user_message', '')[:100]
-                    ai_resp = conv.get('ai_response', '')[:100]
-                    memory_text += f"U: {user_msg}...\nA: {ai_resp}..."
-                    parts.append(memory_text)
-        
-        # ===== 5. Guidelines (only use default guidelines if output_example and notes don't exist) =====
-        if not has_output_example:
-            # Get max_tokens to adjust response length instruction
-            max_tokens = self.config_manager.get_max_tokens()
-            
-            # Calculate target sentence count based on max_tokens
-            # Roughly: 50 tokens = 1 sentence, so adjust accordingly
-            if max_tokens <= 100:
-                target_sentences = "1-2"
-                target_words = "30-50"
-            elif max_tokens <= 200:
-                target_sentences = "2-3"
-                target_words = "50-80"
-            else:
-                target_sentences = "2-4"
-                target_words = "80-120"
-            
-            parts.append(f"""Guidelines:
-- Use the user profile information naturally in conversation
-- Reference relevant past conversations when appropriate
-- Stay consistent with your personality
-- Be proactive and caring
-- IMPORTANT: Keep responses concise ({target_sentences} sentences, {target_words} words). Express your complete thought in these few sentences - be brief but complete. Do not start a long response that gets cut off.""")
+        if include_rag:
+            memory_query = self._memory_query()
+            if memory_query:
+                memory_text = self._rag_lookup(memory_query)
+                if memory_text:
+                    return SystemPrompt(static_prompt, memory_text)
+        
+        return SystemPrompt(static_prompt)
+    
+    def _memory_query(self) -> str:
+        """RAG query for the last user message ("" when there is nothing to look up)"""
+        if not (self.vector_store and self.conversation_history):
+            return ""
+        last_user_msg = self._get_last_user_message()
+        # A short greeting has nothing worth recalling: skip the embedding and search
+        if not last_user_msg or (len(last_user_msg) < RAG_MIN_GREETING_CHARS and _GREETING_RE.search(last_user_msg)):
+            return ""
+        # Texts differing only in case or spacing embed the same, so they share an entry
+        return " ".join(last_user_msg.lower().split())
+    
+    def _search_memory(self, query: str) -> str:
+        """
+        System prompt section with the stored conversation most relevant to a query
+        ("" if none is relevant enough); formatted here so cached lookups reuse the text
+        """
+        relevant_convs = self.vector_store.search_relevant_conversations(
+            query=query,
+            n_results=2  # Reduced from 3 to 2
+        )
+        
+        # Only include high relevance memories (similarity > 0.7), and only the most relevant one
+        conv = next((c for c in relevant_convs if c.get('relevance_score', 0) > 0.7), None)
+        if conv is None:
+            return ""
         
-        return "\n\n".join(parts)
+        # Limit length of each memory
+        user_msg = conv.get('user_message', '')[:100]
+        ai_resp = conv.get('ai_response', '')[:100]
+        return f"Relevant memory:\nU: {user_msg}...\nA: {ai_resp}..."
     
     def _get_last_user_message(self) -> str:
         """Get user's last message"""
-        for msg in reversed(self.conversation_history):
-            if msg.get("role") == "user":
-                return msg.get("content", "")
-        return ""
+        return self._last_user_message
     
-    def _get_relevant_history(self, current_message: str) -> list:
+    def _get_relevant_history(self, current_message: str) -> tuple:
         """
         Intelligently select relevant history based on current message
         
@@ -475,26 +826,32 @@ class DesktopPetApp:
         - Ongoing discussion: need last 8-10 messages
         - Complex task: need full 15 messages
         """
-        message_lower = current_message.lower()
         word_count = len(current_message.split())
         
         # Determine message type
-        is_greeting = any(word in message_lower 
-                         for word in ['hello', 'hi', '你好', '嗨', 'hey'])
         is_simple = word_count < 10
-        is_question = '?' in current_message or '？' in current_message
+        is_question = not _QUESTION_MARKS.isdisjoint(current_message)
         
-        # Simple greeting or short message
-        if is_greeting or (is_simple and not is_question):
-            return self.conversation_history[-3:]  # Only take last 3 messages
+        # Short message or greeting (the regex only runs when the cheap checks don't decide)
+        if (is_simple and not is_question) or _GREETING_RE.search(current_message):
+            return self._recent_history(3)  # Only take last 3 messages
         
         # Medium complexity (general questions or discussion)
         elif word_count < 30:
-            return self.conversation_history[-8:]  # Medium complexity
+            return self._recent_history(8)  # Medium complexity
         
         # Complex discussion or long message
         else:
-            return self.conversation_history[-15:]  # Complex discussion (keep 15 instead of 20)
+            return self._recent_history(15)  # Complex discussion (keep 15 instead of 20)
+    
+    def _recent_history(self, count: int) -> tuple:
+        """
+        Last count messages of the conversation history
+        
+        A tuple: safe to hand to a worker thread as is, since neither side can change it.
+        """
+        history = self.conversation_history
+        return tuple(islice(history, max(0, len(history) - count), None))
     
     def _on_ai_response(self, response: str):
         """
@@ -506,31 +863,29 @@ class DesktopPetApp:
         3. Save to vector database (long-term memory)
         4. Increment conversation count
         5. Update user profile (every 5 conversations)
-        6. Limit history to last 20 messages
-        7. Save conversation history to JSON
+        (history keeps itself to the last 20 messages)
         """
-        # 1. Display message
+        # 1. Display message (already shown chunk by chunk if it was streamed)
         self.chat_ui.remove_thinking_indicator()
-        self.chat_ui.add_message(response, is_user=False)
+        if self._streaming_message is not None:
+            self.chat_ui.update_message(self._streaming_message, response)
+            self._streaming_message = None
+        else:
+            self.chat_ui.add_message(response, is_user=False)
         
-        # 2. Add to conversation history
-        self.conversation_history.append({"role": "assistant", "content": response})
+        # 2. Add to conversation history (and save it)
+        self._add_history_message({"role": "assistant", "content": response})
         
         # 3. Save to vector database (long-term memory)
-        if self.vector_store and len(self.conversation_history) >= 2:
+        if len(self.conversation_history) >= 2:
             # Get the user message and AI response pair
-            user_msg = ""
-            for msg in reversed(self.conversation_history[:-1]):  # Exclude the just-added AI response
-                if msg.get("role") == "user":
-                    user_msg = msg.get("content", "")
-                    break
+            user_msg = self._last_user_message
             
             if user_msg:
-                try:
-                    self.vector_store.add_conversation(user_msg, response)
-                    print(f"✓ Saved conversation to vector store")
-                except Exception as e:
-                    print(f"⚠ Warning: Failed to save to vector store: {e}")
+                # Saved as soon as the store has loaded (right away if it already has)
+                self._vector_store_future.add_done_callback(
+                    lambda future: self._save_to_vector_store(future.result(), user_msg, response)
+                )
         
         # 4. Increment conversation count
         if self.profile_manager:
@@ -540,43 +895,71 @@ class DesktopPetApp:
         if self.profile_manager and self.profile_manager.should_update_profile():
             print(f"📝 Updating user profile (conversation #{self.profile_manager.profile.conversation_count})")
             self._update_user_profile()
-        
-        # 6. Keep only last 20 messages to avoid context overflow
-        if len(self.conversation_history) > 20:
-            self.conversation_history = self.conversation_history[-20:]
-        
-        # 7. Save conversation history to JSON
-        self._save_conversation_history()
+    
+    def _save_to_vector_store(self, store, user_msg: str, response: str):
+        """Store a conversation in the vector store, if it loaded"""
+        if store is None:
+            return
+        # Embedding runs on the store's worker thread, off the UI thread
+        store.add_conversation_async(user_msg, response).add_done_callback(
+            self._on_vector_store_saved
+        )
+    
+    def _on_vector_store_saved(self, future):
+        """Report the result of a background vector store write (runs on the store's worker thread)"""
+        # The new conversation may now be the best match for a cached query
+        self._rag_lookup.cache_clear()
+        try:
+            if future.result():
+                print(f"✓ Saved conversation to vector store")
+        except Exception as e:
+            print(f"⚠ Warning: Failed to save to vector store: {e}")
     
     def _on_ai_error(self, error: str):
         """Handle AI error"""
         self.chat_ui.remove_thinking_indicator()
+        self._streaming_message = None
         error_msg = f"Sorry, I encountered an error: {error}"
         self.chat_ui.add_message(error_msg, is_user=False)
-        # Add error message to conversation history
-        self.conversation_history.append({"role": "assistant", "content": error_msg})
-        # Save conversation history after error
-        self._save_conversation_history()
+        # Add error message to conversation history (and save it)
+        self._add_history_message({"role": "assistant", "content": error_msg})
+    
+    def _add_history_message(self, message: dict):
+        """Add a message to the conversation history and schedule appending it to the history file"""
+        self.conversation_history.append(message)
+        self._pending_history.append(message)
+        self._history_save_timer.start(HISTORY_SAVE_DELAY_MS)  # Restarted by each message
     
-    def _save_conversation_history(self):
-        """Save conversation history to file"""
+    def _flush_history(self):
+        """Hand pending history messages to the writer thread (appended with one write)"""
+        self._history_save_timer.stop()
+        pending, self._pending_history = self._pending_history, []
+        if pending:
+            self._history_writer.submit(self._write_history, pending)
+    
+    def _write_history(self, messages: list):
+        """Append messages to the history file (runs on the writer thread)"""
         try:
-            self.config_manager.save_conversation_history(self.conversation_history)
+            self.config_manager.append_conversation_messages(messages)
         except Exception as e:
             print(f"Warning: Failed to save conversation history: {e}")
     
+    def _close_history(self):
+        """Flush pending history and wait for the writer thread to finish (on quit)"""
+        self._flush_history()
+        self._history_writer.shutdown(wait=True)
+    
     def _load_and_display_history(self):
         """Load conversation history from file and display in chat UI"""
         if not self.conversation_history:
             return
         
-        # Display all messages from history
-        for msg in self.conversation_history:
-            role = msg.get("role", "assistant")
-            content = msg.get("content", "")
-            if content:  # Skip empty messages
-                is_user = (role == "user")
-                self.chat_ui.add_message(content, is_user=is_user)
+        # Display all messages from history (in one batch: one layout pass and scroll)
+        self.chat_ui.add_messages([
+            (msg["content"], msg.get("role", "assistant") == "user")
+            for msg in self.conversation_history
+            if msg.get("content")  # Skip empty messages
+        ])
         
         # Update last user message time based on history
         for msg in reversed(self.conversation_history):
@@ -594,25 +977,25 @@ class DesktopPetApp:
         self.proactive_timer = QTimer()
         self.proactive_timer.timeout.connect(self._check_and_initiate_proactive_conversation)
         # 10 minutes = 600000 milliseconds
-        self.proactive_timer.start(self.proactive_interval_minutes * 60 * 1000)
+        self.proactive_timer.start(self._proactive_interval_ms)
         print(f"✓ Proactive conversation timer started (interval: {self.proactive_interval_minutes} minutes)")
     
     def _reset_proactive_timer(self):
         """Reset proactive conversation timer (after user sends message)"""
         if self.proactive_timer:
-            self.proactive_timer.stop()
-            self._start_proactive_timer()
+            # start() on a running timer restarts its interval
+            self.proactive_timer.start(self._proactive_interval_ms)
     
     def _check_and_initiate_proactive_conversation(self):
         """Check if proactive conversation should be initiated"""
         if not self.chat_ui or not self.ai_provider:
             return
         
-        # Calculate time since last user message
-        time_since_last_message = datetime.now() - self.last_user_message_time
+        # Calculate time since last user message (monotonic: unaffected by clock changes)
+        time_since_last_message = time.monotonic() - self._last_user_ts
         
         # If exceeds set interval, and last message is not AI-initiated
-        if time_since_last_message >= timedelta(minutes=self.proactive_interval_minutes):
+        if time_since_last_message >= self.proactive_interval_minutes * 60:
             # Check if last message was sent by user
             if self.conversation_history:
                 last_msg = self.conversation_history[-1]
@@ -632,83 +1015,35 @@ class DesktopPetApp:
         print(f"💬 Initiating proactive conversation after {self.proactive_interval_minutes} minutes of silence")
         
         # Generate proactive conversation message in background thread
-        from PyQt6.QtCore import QThread, pyqtSignal
-        
-        class ProactiveWorker(QThread):
-            message_ready = pyqtSignal(str)
-            error_occurred = pyqtSignal(str)
-            
-            def __init__(self, provider, conversation_history, system_prompt, max_tokens):
-                super().__init__()
-                self.provider = provider
-                self.conversation_history = conversation_history
-                self.system_prompt = system_prompt
-                self.max_tokens = max_tokens
-            
-            def run(self):
-                try:
-                    if self.provider:
-                        # Build proactive conversation prompt
-                        proactive_prompt = """Generate a brief, natural proactive message to check in with the user. 
-Keep it warm, caring, and not intrusive. It should feel like a friend checking in, not a notification.
-Keep it short (1-2 sentences). Express your complete thought concisely - don't cut off mid-sentence."""
-                        
-                        # Use simplified context (only include last 3 messages)
-                        recent_context = self.conversation_history[-3:] if len(self.conversation_history) > 3 else self.conversation_history
-                        
-                        # Build messages
-                        messages = recent_context.copy()
-                        messages.append({
-                            "role": "user",
-                            "content": "[Generate a proactive check-in message based on our conversation context and your personality]"
-                        })
-                        
-                        # Enhanced system prompt
-                        enhanced_system_prompt = f"{self.system_prompt}\n\n{proactive_prompt}"
-                        
-                        response = self.provider.generate_response(
-                            messages=messages,
-                            system_prompt=enhanced_system_prompt,
-                            max_tokens=self.max_tokens
-                        )
-                        self.message_ready.emit(response)
-                    else:
-                        self.error_occurred.emit("AI provider not initialized")
-                except Exception as e:
-                    self.error_occurred.emit(f"Error: {str(e)}")
-        
-        # Build system prompt
-        system_prompt = self._build_system_prompt(include_rag=True)
+        # Build system prompt; the RAG memory is looked up by the task, off the GUI thread
+        system_prompt = self._build_system_prompt(include_rag=False)
+        memory_query = self._memory_query()
         
         # Get max_tokens configuration
         max_tokens = self.config_manager.get_max_tokens()
         
-        # Create and start worker thread
-        self.proactive_worker = ProactiveWorker(
+        # Start the task on the thread pool (its signals were connected in __init__)
+        QThreadPool.globalInstance().start(ProactiveTask(
+            self._proactive_signals,
             provider=self.ai_provider,
-            conversation_history=self.conversation_history.copy(),
+            conversation_history=self._recent_history(3),
             system_prompt=system_prompt,
-            max_tokens=max_tokens
-        )
-        self.proactive_worker.message_ready.connect(self._on_proactive_message)
-        self.proactive_worker.error_occurred.connect(self._on_proactive_error)
-        self.proactive_worker.start()
+            max_tokens=max_tokens,
+            memory_lookup=functools.partial(self._rag_lookup, memory_query) if memory_query else None
+        ))
     
     def _on_proactive_message(self, message: str):
         """Handle proactive conversation message"""
         # Display message
         self.chat_ui.add_message(message, is_user=False)
         
-        # Add to conversation history, mark as proactively initiated
-        self.conversation_history.append({
+        # Add to conversation history (and save it), mark as proactively initiated
+        self._add_history_message({
             "role": "assistant",
             "content": message,
             "proactive": True  # Mark as proactively initiated
         })
         
-        # Save conversation history
-        self._save_conversation_history()
-        
         # Reset timer
         self._reset_proactive_timer()
         
@@ -730,29 +1065,12 @@ Keep it short (1-2 sentences). Express your complete thought concisely - don't c
             return
         
         # Get recent messages for analysis (last 10 messages)
-        recent_messages = self.conversation_history[-10:] if len(self.conversation_history) >= 10 else self.conversation_history
+        recent_messages = self._recent_history(10)
         
         # Run in background thread
-        from PyQt6.QtCore import QThread
-        
-        class ProfileUpdateWorker(QThread):
-            def __init__(self, extractor, profile_manager, messages):
-                super().__init__()
-                self.extractor = extractor
-                self.profile_manager = profile_manager
-                self.messages = messages
-            
-            def run(self):
-                try:
-                    print("🔍 Extracting user information from conversation...")
-                    extracted_data = self.extractor.extract_user_info(self.messages)
-                    self.profile_manager.update_profile_from_ai(extracted_data)
-                    print(f"✓ Profile update completed")
-                except Exception as e:
-                    print(f"✗ Profile update failed: {e}")
-        
-        worker = ProfileUpdateWorker(self.profile_extractor, self.profile_manager, recent_messages)
-        worker.start()
+        QThreadPool.globalInstance().start(
+            ProfileUpdateTask(self.profile_extractor, self.profile_manager, recent_messages)
+        )
 
 
 def main():
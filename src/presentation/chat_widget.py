@@ -6,21 +6,31 @@ from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, 
     QPushButton, QScrollArea, QLabel
 )
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QTextCursor
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QPixmap, QTextCursor
+from typing import List, Optional, Tuple
 from .ui_styles_refined import (
     INPUT_FIELD, INPUT_CONTAINER, SCROLL_AREA,
     SEND_BUTTON,
     USER_MESSAGE, AI_MESSAGE, MESSAGE_TEXT,
-    STATUS_INDICATOR, STATUS_TEXT,
-    COLORS
+    AVATAR_IMAGE, AVATAR_EMOJI,
+    STATUS_INDICATOR, STATUS_TEXT
 )
 from ..infrastructure.config_manager import ConfigManager
 from .thinking_indicator import ThinkingIndicator
 
 
 class ChatUI(QWidget):
-    """Chat interface component"""
+    """
+    Chat interface component
+    
+    Only the latest messages stay on screen: once more than MAX_MESSAGES are
+    displayed, the oldest TRIM_BATCH are removed together, so a long session
+    doesn't grow the widget tree (and its layout work on resize) without bound.
+    """
+    
+    MAX_MESSAGES = 200   # Max message widgets kept in the message area
+    TRIM_BATCH = 50      # Oldest widgets removed at once when over the limit
     
     # Signal: triggered when user sends a message
     message_sent = pyqtSignal(str)
@@ -29,6 +39,13 @@ class ChatUI(QWidget):
         super().__init__(parent)
         self.drag_position = None
         self.config_manager = ConfigManager()
+        # Config (for avatars) and scaled avatar pixmaps by path, reused by every bubble
+        # until invalidate_config_cache is called (on settings change)
+        self._config_cache = self.config_manager.load_config()
+        self._avatar_pixmaps = {}
+        # Widgets that take mouse presses themselves (no window dragging on or inside them)
+        self._interactive_widgets = set()
+        self._scroll_pending = False  # A deferred scroll to the bottom is queued
         self._setup_ui()
     
     def _setup_ui(self):
@@ -57,12 +74,14 @@ class ChatUI(QWidget):
         self.message_layout = QVBoxLayout(self.message_container)
         self.message_layout.setContentsMargins(16, 16, 16, 16)
         self.message_layout.setSpacing(8)  # Optimized spacing for readability
-        self.message_layout.addStretch()
+        # Messages stack from the top, so new ones are plain appends (no trailing stretch to insert before)
+        self.message_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
         
         # Add status indicator at the top
         self._add_status_indicator()
         
         scroll.setWidget(self.message_container)
+        self._interactive_widgets.add(scroll)
         return scroll
     
     def _create_input_area(self) -> QWidget:
@@ -80,10 +99,14 @@ class ChatUI(QWidget):
         self.input_field.setPlaceholderText("Type a message...")
         self.input_field.setStyleSheet(INPUT_FIELD)
         
-        # Bind Enter key event
+        # Bind Enter key event: (key, modifiers) -> handler, other keys go to the text field
+        self._key_handlers = {
+            (Qt.Key.Key_Return, Qt.KeyboardModifier.NoModifier): self._send_message,  # Enter (no Shift): send
+        }
         self.input_field.keyPressEvent = self._handle_key_press
         
         layout.addWidget(self.input_field, 1)
+        self._interactive_widgets.add(self.input_field)
         
         # Send button - minimal, no gradient
         send_btn = QPushButton("→")
@@ -91,21 +114,24 @@ class ChatUI(QWidget):
         send_btn.setStyleSheet(SEND_BUTTON)
         send_btn.clicked.connect(self._send_message)
         layout.addWidget(send_btn)
+        self._interactive_widgets.add(send_btn)
         
         return outer_container
     
     def _handle_key_press(self, event):
         """Handle keyboard key press events"""
-        if event.key() == Qt.Key.Key_Return and event.modifiers() == Qt.KeyboardModifier.NoModifier:
-            # Enter key (no Shift): send message
-            self._send_message()
-        elif event.key() == Qt.Key.Key_Return and event.modifiers() == Qt.KeyboardModifier.ShiftModifier:
-            # Shift+Enter: new line
-            QTextEdit.keyPressEvent(self.input_field, event)
+        handler = self._key_handlers.get((event.key(), event.modifiers()))
+        if handler is not None:
+            handler()
         else:
-            # Other keys: normal processing
+            # Other keys (including Shift+Enter: new line): normal processing
             QTextEdit.keyPressEvent(self.input_field, event)
     
+    def invalidate_config_cache(self):
+        """Reload the config (and avatar images) for the next messages, e.g. after a settings change"""
+        self._config_cache = self.config_manager.load_config()
+        self._avatar_pixmaps.clear()
+    
     def _send_message(self):
         """Send message"""
         text = self.input_field.toPlainText().strip()
@@ -115,30 +141,94 @@ class ChatUI(QWidget):
             # Reset cursor position
             self.input_field.setFocus()
     
-    def add_message(self, text: str, is_user: bool = True):
+    def add_message(self, text: str, is_user: bool = True) -> QWidget:
         """
         Add message to display area
         
         Args:
             text: Message text
             is_user: True for user message, False for AI message
+            
+        Returns:
+            The message widget (pass to update_message to change its text)
         """
         message_widget = self._create_message_bubble(text, is_user)
         
-        # Insert message before stretch
-        self.message_layout.insertWidget(
-            self.message_layout.count() - 1,
-            message_widget
-        )
+        self.message_layout.addWidget(message_widget)
+        self._trim_messages()
         
         # Scroll to bottom
-        scroll = self.message_area
-        scroll.verticalScrollBar().setValue(
-            scroll.verticalScrollBar().maximum()
-        )
+        self._request_scroll()
+        
+        return message_widget
+    
+    def add_messages(self, messages: List[Tuple[str, bool]]):
+        """
+        Add several messages at once (e.g. history on startup)
+        
+        Painting is suspended while the bubbles are inserted, and the view scrolls
+        to the bottom once, after the layout has settled.
+        
+        Args:
+            messages: List of (text, is_user) pairs, oldest first
+        """
+        if not messages:
+            return
+        
+        config = self._config_cache
+        self.message_container.setUpdatesEnabled(False)
+        try:
+            for text, is_user in messages:
+                self.message_layout.addWidget(self._create_message_bubble(text, is_user, config))
+            self._trim_messages()
+        finally:
+            self.message_container.setUpdatesEnabled(True)
+        
+        self._request_scroll()
+    
+    def _trim_messages(self):
+        """Remove the oldest message widgets once more than MAX_MESSAGES are displayed"""
+        excess = self.message_layout.count() - self.MAX_MESSAGES
+        if excess <= 0:
+            return
+        for _ in range(max(excess, self.TRIM_BATCH)):
+            item = self.message_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
     
-    def _create_message_bubble(self, text: str, is_user: bool) -> QWidget:
-        """Create message bubble with companion-like design"""
+    def _request_scroll(self):
+        """
+        Scroll to the bottom once control returns to the event loop
+        
+        Requests made before then (e.g. several streamed chunks) share one scroll,
+        and by then the layout has settled, so the scroll bar's maximum includes
+        the new content.
+        """
+        if not self._scroll_pending:
+            self._scroll_pending = True
+            QTimer.singleShot(0, self._do_scroll)
+    
+    def _do_scroll(self):
+        """Scroll to the bottom (runs once per batch of _request_scroll calls)"""
+        self._scroll_pending = False
+        scroll_bar = self.message_area.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+    
+    def update_message(self, message_widget: QWidget, text: str):
+        """
+        Replace the text of a displayed message (e.g. while a response streams in)
+        
+        Args:
+            message_widget: Widget returned by add_message
+            text: New message text
+        """
+        message_widget.text_label.setText(text)
+        
+        # Scroll to bottom
+        self._request_scroll()
+    
+    def _create_message_bubble(self, text: str, is_user: bool, config: Optional[dict] = None) -> QWidget:
+        """Create message bubble with companion-like design (config: the cached one if not given)"""
         # Outer container for avatar + bubble
         container = QWidget()
         layout = QHBoxLayout(container)
@@ -146,7 +236,8 @@ class ChatUI(QWidget):
         layout.setSpacing(8)
         
         # Load avatars from config
-        config = self.config_manager.load_config()
+        if config is None:
+            config = self._config_cache
         
         # Create message bubble widget
         bubble = QWidget()
@@ -191,47 +282,36 @@ class ChatUI(QWidget):
             # Add stretch to push content to left
             layout.addStretch()
         
+        # Keep the text label reachable for update_message
+        container.text_label = label
+        
         return container
     
     def _create_avatar(self, avatar_path: str = None, default_emoji: str = "👤") -> QLabel:
         """Create avatar label"""
-        from PyQt6.QtGui import QPixmap, QIcon
-        from PyQt6.QtCore import QSize
-        
         avatar = QLabel()
         avatar.setFixedSize(36, 36)
         
         if avatar_path:
             try:
-                pixmap = QPixmap(avatar_path)
-                if not pixmap.isNull():
-                    # Create circular mask for avatar
-                    scaled = pixmap.scaled(36, 36, Qt.AspectRatioMode.KeepAspectRatio,
-                                          Qt.TransformationMode.SmoothTransformation)
+                # Decoded and scaled once per path (None if it isn't a valid image)
+                if avatar_path not in self._avatar_pixmaps:
+                    pixmap = QPixmap(avatar_path)
+                    self._avatar_pixmaps[avatar_path] = None if pixmap.isNull() else pixmap.scaled(
+                        36, 36, Qt.AspectRatioMode.KeepAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation
+                    )
+                scaled = self._avatar_pixmaps[avatar_path]
+                if scaled is not None:
                     avatar.setPixmap(scaled)
-                    avatar.setStyleSheet(f"""
-                        QLabel {{
-                            background: transparent;
-                            border: 2px solid {COLORS["border_light"]};
-                            border-radius: 18px;
-                            padding: 0px;
-                        }}
-                    """)
+                    avatar.setStyleSheet(AVATAR_IMAGE)
                     return avatar
             except:
                 pass
         
         # Use emoji as fallback
         avatar.setText(default_emoji)
-        avatar.setStyleSheet(f"""
-            QLabel {{
-                background: {COLORS["bg_secondary"]};
-                border: 2px solid {COLORS["border_light"]};
-                border-radius: 18px;
-                font-size: 20px;
-                padding: 0px;
-            }}
-        """)
+        avatar.setStyleSheet(AVATAR_EMOJI)
         avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
         
         return avatar
@@ -240,20 +320,13 @@ class ChatUI(QWidget):
         """Add animated thinking indicator"""
         thinking_widget = ThinkingIndicator()
         
-        # Insert before stretch
-        self.message_layout.insertWidget(
-            self.message_layout.count() - 1,
-            thinking_widget
-        )
+        self.message_layout.addWidget(thinking_widget)
         
         # Store reference for removal
         self.current_thinking = thinking_widget
         
         # Scroll to bottom
-        scroll = self.message_area
-        scroll.verticalScrollBar().setValue(
-            scroll.verticalScrollBar().maximum()
-        )
+        self._request_scroll()
     
     def remove_thinking_indicator(self):
         """Remove thinking indicator"""
@@ -265,7 +338,7 @@ class ChatUI(QWidget):
     
     def clear_messages(self):
         """Clear all messages"""
-        while self.message_layout.count() > 1:  # Keep stretch
+        while self.message_layout.count():
             item = self.message_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
@@ -275,23 +348,8 @@ class ChatUI(QWidget):
         from PyQt6.QtCore import QPoint
         if event.button() == Qt.MouseButton.LeftButton:
             # Only allow dragging on empty areas (not on interactive elements)
-            widget = self.childAt(event.position().toPoint())
-            if widget:
-                # Check if it's an interactive widget
-                while widget:
-                    if isinstance(widget, (QPushButton, QTextEdit, QScrollArea, QLabel)):
-                        # Check if it's a message label (allow dragging on message area background)
-                        if isinstance(widget, QLabel):
-                            # Allow dragging on message area background, but not on message text
-                            parent = widget.parent()
-                            if parent and hasattr(parent, 'setStyleSheet'):
-                                # It's likely a message bubble, allow drag
-                                pass
-                            else:
-                                return super().mousePressEvent(event)
-                        else:
-                            return super().mousePressEvent(event)
-                    widget = widget.parent()
+            if self._is_interactive(self.childAt(event.position().toPoint())):
+                return super().mousePressEvent(event)
             
             # Start dragging
             parent_window = self.window()
@@ -301,6 +359,14 @@ class ChatUI(QWidget):
         else:
             super().mousePressEvent(event)
     
+    def _is_interactive(self, widget: Optional[QWidget]) -> bool:
+        """Whether widget is, or is inside, one of the registered interactive widgets"""
+        while widget is not None and widget is not self:
+            if widget in self._interactive_widgets:
+                return True
+            widget = widget.parentWidget()
+        return False
+    
     def mouseMoveEvent(self, event):
         """Handle mouse move for window dragging"""
         from PyQt6.QtCore import QPoint
@@ -340,19 +406,19 @@ class ChatUI(QWidget):
         
         status_layout.addStretch()
         
-        # Insert at the beginning (before stretch)
-        self.message_layout.insertWidget(0, status_widget)
+        # First item of the (still empty) message layout
+        self.message_layout.addWidget(status_widget)
         
         # Auto-hide after 3 seconds
-        from PyQt6.QtCore import QTimer
-        timer = QTimer()
-        timer.setSingleShot(True)
-        timer.timeout.connect(lambda: self._hide_status_indicator(status_widget))
-        timer.start(3000)
+        QTimer.singleShot(3000, lambda: self._hide_status_indicator(status_widget))
     
     def _hide_status_indicator(self, widget):
         """Hide status indicator with fade effect"""
         if widget:
-            self.message_layout.removeWidget(widget)
-            widget.deleteLater()
+            try:
+                self.message_layout.removeWidget(widget)
+                widget.deleteLater()
+            except RuntimeError:
+                # Already deleted (messages cleared)
+                pass
 
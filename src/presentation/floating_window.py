@@ -3,29 +3,38 @@ Main window module
 Implements core floating window functionality: always-on-top, frameless, draggable
 """
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton
-from PyQt6.QtCore import Qt, QPoint
-from PyQt6.QtGui import QMouseEvent, QColor
-from PyQt6.QtWidgets import QGraphicsDropShadowEffect
+from PyQt6.QtCore import Qt, QPoint, QRectF, pyqtSignal
+from PyQt6.QtGui import QMouseEvent, QColor, QPainter, QPixmap
 from .ui_styles_refined import (
     MAIN_WINDOW, CONTROL_BAR, 
     MINIMIZE_BTN, CLOSE_BTN, COLORS
 )
+from .settings_window import SettingsWindow
+from .setup_window import SetupWindow
 
 
 class FloatingWindow(QWidget):
     """Floating window class implementing always-on-top, frameless, draggable functionality"""
     
+    settings_changed = pyqtSignal()  # Forwarded from the settings window when settings are saved
+    
+    SHADOW_MARGIN = 12  # Transparent border around the content, holding the shadow
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.drag_position = QPoint()
         self.settings_window = None
+        self._shadow_pixmap = None  # Pre-rendered shadow (see paintEvent)
+        self._settings_content = None  # SettingsWindow inside settings_window
+        self._control_buttons = set()  # Control bar buttons (no dragging on them)
         self._setup_window()
         self._setup_ui()
     
     def _setup_window(self):
         """Set window properties"""
-        # Set window size - optimized for chat
-        self.setFixedSize(500, 650)
+        # Set window size - optimized for chat (500x650 content plus the shadow margin)
+        margin = self.SHADOW_MARGIN
+        self.setFixedSize(500 + 2 * margin, 650 + 2 * margin)
         
         # Set window flags: always-on-top + frameless
         self.setWindowFlags(
@@ -39,33 +48,55 @@ class FloatingWindow(QWidget):
         
         # Set window style with glassmorphism
         self.setStyleSheet(MAIN_WINDOW)
-        
-        # Add soft shadow effect
-        self._add_shadow_effect()
     
     def _setup_ui(self):
         """Set up UI layout"""
         layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
+        margin = self.SHADOW_MARGIN
+        layout.setContentsMargins(margin, margin, margin, margin)
         layout.setSpacing(0)
         
         # Top control bar
-        control_bar = self._create_control_bar()
-        layout.addWidget(control_bar)
+        self.control_bar = self._create_control_bar()
+        layout.addWidget(self.control_bar)
         
         # Content area (set by subclass or externally)
         self.content_widget = QWidget()
         self.content_widget.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, False)
         layout.addWidget(self.content_widget, 1)
     
-    def _add_shadow_effect(self):
-        """Add soft shadow effect to window"""
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(20)
-        shadow.setXOffset(0)
-        shadow.setYOffset(4)
-        shadow.setColor(QColor(0, 0, 0, 30))  # 12% opacity
-        self.setGraphicsEffect(shadow)
+    def paintEvent(self, event):
+        """
+        Draw the soft window shadow
+        
+        The shadow is rendered into a pixmap once and copied on each paint. A
+        QGraphicsDropShadowEffect would instead re-render the whole window offscreen
+        and blur it on every update (each keystroke, scroll or streamed chunk).
+        """
+        if self._shadow_pixmap is None or self._shadow_pixmap.size() != self.size():
+            self._shadow_pixmap = self._render_shadow()
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._shadow_pixmap)
+        painter.end()
+    
+    def _render_shadow(self) -> QPixmap:
+        """Render the shadow around the content area (12% black, offset 4px down)"""
+        pixmap = QPixmap(self.size())
+        pixmap.fill(Qt.GlobalColor.transparent)
+        
+        margin = self.SHADOW_MARGIN
+        content = QRectF(self.rect().adjusted(margin, margin, -margin, -margin)).translated(0, 4)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        # Nested translucent rounded rects: their alpha adds up towards the content,
+        # approximating the blurred edge
+        painter.setBrush(QColor(0, 0, 0, max(1, 30 // margin)))
+        for spread in range(margin, 0, -1):
+            radius = 26 + spread  # Window corner radius (MAIN_WINDOW) plus the spread
+            painter.drawRoundedRect(content.adjusted(-spread, -spread, spread, spread), radius, radius)
+        painter.end()
+        return pixmap
     
     def _create_control_bar(self) -> QWidget:
         """Create top control bar (contains close and minimize buttons)"""
@@ -97,6 +128,7 @@ class FloatingWindow(QWidget):
         settings_btn.setToolTip("Settings")
         settings_btn.clicked.connect(self._show_settings)
         layout.addWidget(settings_btn)
+        self._control_buttons.add(settings_btn)
         
         layout.addStretch()
         
@@ -106,6 +138,7 @@ class FloatingWindow(QWidget):
         minimize_btn.setStyleSheet(MINIMIZE_BTN)
         minimize_btn.clicked.connect(self.showMinimized)
         layout.addWidget(minimize_btn)
+        self._control_buttons.add(minimize_btn)
 
         # Close button
         close_btn = QPushButton("×")
@@ -113,20 +146,16 @@ class FloatingWindow(QWidget):
         close_btn.setStyleSheet(CLOSE_BTN)
         close_btn.clicked.connect(self.close)
         layout.addWidget(close_btn)
+        self._control_buttons.add(close_btn)
         
         return bar
     
     def _control_bar_press(self, event):
         """Handle mouse press on control bar"""
         if event.button() == Qt.MouseButton.LeftButton:
-            # Check if clicked on a button - if so, don't drag
-            widget = self.childAt(event.position().toPoint())
-            if widget:
-                # Check if it's a button or inside a button
-                while widget:
-                    if isinstance(widget, QPushButton):
-                        return
-                    widget = widget.parent()
+            # Clicked on a button (buttons have no child widgets) - don't drag
+            if self.control_bar.childAt(event.position().toPoint()) in self._control_buttons:
+                return
             
             # Start dragging
             self.drag_position = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
@@ -194,24 +223,27 @@ class FloatingWindow(QWidget):
         event.accept()
     
     def _show_settings(self):
-        """Show settings window"""
-        from .settings_window import SettingsWindow
-        from .setup_window import SetupWindow
-        
-        # Create settings window in a modal setup window
-        setup_win = SetupWindow()
-        settings_content = SettingsWindow()
-        settings_content.settings_changed.connect(self._on_settings_changed)
-        setup_win.set_content(settings_content)
-        
-        # Store reference
-        self.settings_window = setup_win
+        """Show settings window (built on first use, then reused)"""
+        if self.settings_window is None:
+            # Create settings window in a modal setup window
+            setup_win = SetupWindow()
+            self._settings_content = SettingsWindow()
+            self._settings_content.settings_changed.connect(self._on_settings_changed)
+            setup_win.set_content(self._settings_content)
+            self.settings_window = setup_win
+        elif not self.settings_window.isVisible():
+            # Reopened: drop unsaved edits from last time
+            self._settings_content._load_settings()
         
-        setup_win.show()
+        self.settings_window.show()
+        self.settings_window.raise_()
+        self.settings_window.activateWindow()
     
     def _on_settings_changed(self):
         """Handle settings change"""
         # Reload settings and update UI
-        # This will be handled by main.py
-        pass
+        # New messages pick up changed avatars; the rest is handled by main.py
+        if hasattr(self.content_widget, "invalidate_config_cache"):
+            self.content_widget.invalidate_config_cache()
+        self.settings_changed.emit()
 
@@ -801,7 +801,8 @@ class SettingsWindow(QWidget):
     
     def _save_settings(self):
         """Save settings"""
-        config = self.config_manager.load_config()
+        # Collected and written in one config update
+        config = {}
         
         # Save avatars
         if hasattr(self, 'user_avatar_path'):
@@ -814,39 +815,39 @@ class SettingsWindow(QWidget):
         
         # Save API settings
         if self.openai_radio.isChecked():
-            self.config_manager.set_ai_provider("openai")
+            config["ai_provider"] = "openai"
         elif self.claude_radio.isChecked():
-            self.config_manager.set_ai_provider("claude")
+            config["ai_provider"] = "claude"
         elif self.gemini_radio.isChecked():
-            self.config_manager.set_ai_provider("gemini")
+            config["ai_provider"] = "gemini"
         
         # Save API keys
         openai_key = self.openai_key_input.text().strip()
         if openai_key:
-            self.config_manager.save_api_key("openai", openai_key)
+            config["openai_api_key"] = openai_key
         
         claude_key = self.claude_key_input.text().strip()
         if claude_key:
-            self.config_manager.save_api_key("claude", claude_key)
+            config["claude_api_key"] = claude_key
         
         gemini_key = self.gemini_key_input.text().strip()
         if gemini_key:
-            self.config_manager.save_api_key("gemini", gemini_key)
+            config["gemini_api_key"] = gemini_key
         
         # Save max tokens
         try:
             max_tokens = int(self.max_tokens_input.text().strip())
             # Validate range (50-500)
             if 50 <= max_tokens <= 500:
-                self.config_manager.set_max_tokens(max_tokens)
+                config["max_tokens"] = max_tokens
             else:
                 # Use default if out of range
-                self.config_manager.set_max_tokens(250)
+                config["max_tokens"] = 250
         except ValueError:
             # Use default if invalid input
-            self.config_manager.set_max_tokens(250)
+            config["max_tokens"] = 250
         
-        self.config_manager.save_config(config)
+        self.config_manager.update_config(**config)
         
         # Save character settings
         character_config = {}
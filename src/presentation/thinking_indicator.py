@@ -2,13 +2,27 @@
 Thinking indicator with animated dots
 Provides emotional, non-intrusive loading state
 """
+import weakref
+
 from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel
 from PyQt6.QtCore import QTimer, Qt
 from .ui_styles_premium import COLORS, THINKING_TEXT
 
 
 class ThinkingIndicator(QWidget):
-    """Animated thinking indicator with emotional messages"""
+    """
+    Animated thinking indicator with emotional messages
+    
+    All running indicators are animated by one shared timer, which only runs
+    while at least one indicator is running.
+    """
+    
+    TICK_MS = 500            # Dot update interval
+    TICKS_PER_MESSAGE = 6    # Message changes every 6 ticks (3 seconds)
+    
+    _running = weakref.WeakSet()  # Indicators being animated
+    _ticker = None                # Shared QTimer (created on first use)
+    _tick_count = 0
     
     MESSAGES = [
         "Thinking...",
@@ -36,23 +50,41 @@ class ThinkingIndicator(QWidget):
         self.message_label.setStyleSheet(THINKING_TEXT)
         layout.addWidget(self.message_label)
         
-        # Animated dots
+        # Animated dots, fixed to the width of "..." so a tick only repaints the label
+        # (a changing size hint would re-run the layout of the whole chat on every tick)
         self.dots_label = QLabel("")
         self.dots_label.setStyleSheet(THINKING_TEXT)
+        self.dots_label.ensurePolished()
+        self.dots_label.setFixedWidth(self.dots_label.fontMetrics().horizontalAdvance("..."))
         layout.addWidget(self.dots_label)
         
         layout.addStretch()
     
     def _start_animation(self):
-        """Start dot animation"""
-        self.timer = QTimer()
-        self.timer.timeout.connect(self._update_dots)
-        self.timer.start(500)  # Update every 500ms
-        
-        # Change message every 3 seconds
-        self.message_timer = QTimer()
-        self.message_timer.timeout.connect(self._update_message)
-        self.message_timer.start(3000)
+        """Start dot animation (registers with the shared timer)"""
+        cls = ThinkingIndicator
+        cls._running.add(self)
+        if cls._ticker is None:
+            cls._ticker = QTimer()
+            cls._ticker.timeout.connect(cls._tick)
+        if not cls._ticker.isActive():
+            cls._ticker.start(cls.TICK_MS)
+    
+    @classmethod
+    def _tick(cls):
+        """Advance every running indicator; stop the timer once none is left"""
+        cls._tick_count += 1
+        change_message = cls._tick_count % cls.TICKS_PER_MESSAGE == 0
+        for indicator in list(cls._running):
+            try:
+                indicator._update_dots()
+                if change_message:
+                    indicator._update_message()
+            except RuntimeError:
+                # Widget deleted without stop()
+                cls._running.discard(indicator)
+        if not cls._running:
+            cls._ticker.stop()
     
     def _update_dots(self):
         """Update animated dots"""
@@ -67,8 +99,8 @@ class ThinkingIndicator(QWidget):
     
     def stop(self):
         """Stop animation"""
-        if hasattr(self, 'timer'):
-            self.timer.stop()
-        if hasattr(self, 'message_timer'):
-            self.message_timer.stop()
+        cls = ThinkingIndicator
+        cls._running.discard(self)
+        if not cls._running and cls._ticker is not None:
+            cls._ticker.stop()
 
@@ -136,6 +136,27 @@ MESSAGE_TEXT = f"""
     }}
 """
 
+# Message avatar showing an image
+AVATAR_IMAGE = f"""
+    QLabel {{
+        background: transparent;
+        border: 2px solid {COLORS["border_light"]};
+        border-radius: 18px;
+        padding: 0px;
+    }}
+"""
+
+# Message avatar showing an emoji (no avatar image set)
+AVATAR_EMOJI = f"""
+    QLabel {{
+        background: {COLORS["bg_secondary"]};
+        border: 2px solid {COLORS["border_light"]};
+        border-radius: 18px;
+        font-size: 20px;
+        padding: 0px;
+    }}
+"""
+
 # Input container - Unified design with enhanced visual
 INPUT_CONTAINER = f"""
     QWidget {{
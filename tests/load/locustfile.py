@@ -15,57 +15,83 @@ Usage:
 3. Ensure Mock AI Provider is used (USE_MOCK_AI=true) to avoid consuming API tokens
 """
 
-from locust import HttpUser, task, between
-import json
+from gevent.pool import Group
+from locust import FastHttpUser, task, constant_pacing
+import orjson
 import random
 import os
+import re
 
+# Chat messages sent by simulated users (picked at random)
+MESSAGES = (
+    "Hello, how are you?",
+    "What's the weather like?",
+    "Tell me a joke",
+    "How can you help me?",
+    "What do you remember about me?",
+    "你好",
+    "今天天气怎么样？",
+    "我有点累",
+    "给我讲个笑话",
+    "What's your favorite color?",
+    "Can you help me with my work?",
+    "I'm feeling stressed today",
+)
 
-class DesktopPetUser(HttpUser):
-    """Simulates desktop pet user"""
+# The messages as encoded JSON strings (UTF-8), ready to splice into a request body
+MESSAGES_JSON = tuple(orjson.dumps(message) for message in MESSAGES)
+
+# Host override for Kubernetes environments (read once, not per user)
+LOCUST_HOST = os.getenv('LOCUST_HOST')
+
+# JSON request headers (the body is sent as pre-encoded bytes rather than json=)
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# conversation_id field of a chat response (read without parsing the whole body)
+CONVERSATION_ID_RE = re.compile(rb'"conversation_id"\s*:\s*"([^"]*)"')
+
+# Simulated user IDs (picked at random, so users can share one)
+USER_IDS = tuple(f"test_user_{i}" for i in range(1000, 10000))
+
+
+class DesktopPetUser(FastHttpUser):
+    """
+    Simulates desktop pet user
     
-    wait_time = between(1, 3)  # User operation interval 1-3 seconds
+    FastHttpUser (geventhttpclient) instead of HttpUser (python-requests): less
+    client overhead per request, so the load generator itself doesn't cap the
+    request rate or inflate the measured latencies.
+    """
+    
+    wait_time = constant_pacing(2)  # One task every 2 seconds per user (request time included)
+    network_timeout = 30.0          # Seconds to wait for a response (chat calls the AI provider)
+    connection_timeout = 10.0       # Seconds to wait for a connection
     
     def on_start(self):
         """Initialize when user starts"""
         # Support reading host from environment variable for Kubernetes environment
-        host = os.getenv('LOCUST_HOST')
-        if host:
-            self.host = host
-        self.user_id = f"test_user_{random.randint(1000, 9999)}"
+        if LOCUST_HOST:
+            self.host = LOCUST_HOST
+        self.user_id = random.choice(USER_IDS)
         self.conversation_id = None
+        # Chat request body up to the message (the user ID is fixed per user)
+        self._payload_prefix = b'{"user_id":' + orjson.dumps(self.user_id) + b',"message":'
     
     @task(3)
     def send_message(self):
         """Send message (weight 3, more frequent)"""
-        messages = [
-            "Hello, how are you?",
-            "What's the weather like?",
-            "Tell me a joke",
-            "How can you help me?",
-            "What do you remember about me?",
-            "你好",
-            "今天天气怎么样？",
-            "我有点累",
-            "给我讲个笑话",
-            "What's your favorite color?",
-            "Can you help me with my work?",
-            "I'm feeling stressed today",
-        ]
-        
-        payload = {
-            "user_id": self.user_id,
-            "message": random.choice(messages)
-        }
+        # {"user_id": ..., "message": ...}, from pre-encoded parts
+        body = self._payload_prefix + random.choice(MESSAGES_JSON) + b'}'
         
         with self.client.post(
             "/api/v1/chat",
-            json=payload,
+            data=body,
+            headers=JSON_HEADERS,
             catch_response=True
         ) as response:
             if response.status_code == 200:
-                data = response.json()
-                self.conversation_id = data.get("conversation_id")
+                match = CONVERSATION_ID_RE.search(response.content)
+                self.conversation_id = match.group(1).decode() if match else None
                 response.success()
             else:
                 response.failure(f"Status code: {response.status_code}")
@@ -84,4 +110,17 @@ class DesktopPetUser(HttpUser):
     def health_check(self):
         """Health check (weight 1)"""
         self.client.get("/health")
+    
+    @task(1)
+    def get_user_state(self):
+        """
+        Get conversation, profile and health together, as a client refreshing its state would (weight 1)
+        
+        The three requests run concurrently on the user's keep-alive connection pool,
+        so the task takes one round-trip instead of three.
+        """
+        group = Group()
+        for path in (f"/api/v1/conversation/{self.user_id}", f"/api/v1/profile/{self.user_id}", "/health"):
+            group.spawn(self.client.get, path)
+        group.join()
 
@@ -2,12 +2,25 @@
 Startup test script
 Used to verify environment and dependencies are correct
 """
+import importlib.metadata
+import importlib.util
 import sys
 
+# Files that must exist, relative to the project root
+REQUIRED_FILES = (
+    "src/main.py",
+    "src/window.py",
+    "src/chat_ui.py",
+    "src/config_manager.py",
+    "src/personality_setup.py",
+    "run.py",
+    "requirements.txt",
+)
+
 def check_python_version():
     """Check Python version"""
     version = sys.version_info
-    if version.major < 3 or (version.major == 3 and version.minor < 10):
+    if version < (3, 10):
         print(f"❌ Python version too low: {version.major}.{version.minor}")
         print("   Requires Python 3.10 or higher")
         return False
@@ -15,34 +28,33 @@ def check_python_version():
     return True
 
 def check_pyqt6():
-    """Check if PyQt6 is installed"""
-    try:
-        import PyQt6
-        print(f"✅ PyQt6 installed: {PyQt6.__version__}")
-        return True
-    except ImportError:
+    """Check if PyQt6 is installed (without importing it, which loads the Qt libraries)"""
+    if importlib.util.find_spec("PyQt6") is None:
         print("❌ PyQt6 not installed")
         print("   Please run: pip install -r requirements.txt")
         return False
+    try:
+        version = importlib.metadata.version("PyQt6")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown version"
+    print(f"✅ PyQt6 installed: {version}")
+    return True
 
 def check_project_structure():
     """Check project structure"""
     import os
-    from pathlib import Path
-    
-    required_files = [
-        "src/main.py",
-        "src/window.py",
-        "src/chat_ui.py",
-        "src/config_manager.py",
-        "src/personality_setup.py",
-        "run.py",
-        "requirements.txt"
-    ]
     
+    # One directory listing per parent directory instead of a stat per file
+    listings = {}
     missing = []
-    for file in required_files:
-        if not Path(file).exists():
+    for file in REQUIRED_FILES:
+        parent, name = os.path.split(file)
+        if parent not in listings:
+            try:
+                listings[parent] = set(os.listdir(parent or "."))
+            except OSError:
+                listings[parent] = set()
+        if name not in listings[parent]:
             missing.append(file)
     
     if missing:
@@ -0,0 +1,119 @@
+"""Unit tests for response caching and single-flight calls in CachedAIProvider"""
+
+import threading
+import time
+
+from src.domain.ai.providers.base_provider import CachedAIProvider
+
+
+class CountingProvider(CachedAIProvider):
+    """Provider whose uncached call counts invocations and can be held open"""
+    
+    def __init__(self, reply="reply", error=None):
+        super().__init__()
+        self.calls = 0
+        self.reply = reply
+        self.error = error
+        self.release = threading.Event()
+        self.release.set()
+    
+    def _generate(self, messages, system_prompt="", **kwargs):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+    
+    def generate_response(self, messages, system_prompt="", **kwargs):
+        return self._cached_generate(self._generate, messages, system_prompt, **kwargs)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_repeated_prompt_cached():
+    provider = CountingProvider()
+    assert provider.generate_response(MESSAGES) == "reply"
+    assert provider.generate_response(MESSAGES) == "reply"
+    assert provider.calls == 1
+
+
+def test_parameters_part_of_key():
+    provider = CountingProvider()
+    provider.generate_response(MESSAGES)
+    provider.generate_response(MESSAGES, temperature=0.5)
+    provider.generate_response(MESSAGES, system_prompt="Be brief")
+    assert provider.calls == 3
+
+
+def test_stale_response_regenerated():
+    provider = CountingProvider()
+    provider.cache_ttl = 0.0
+    provider.generate_response(MESSAGES)
+    provider.generate_response(MESSAGES)
+    assert provider.calls == 2
+
+
+def test_cache_bounded():
+    provider = CountingProvider()
+    provider.cache_size = 2
+    for content in ("a", "b", "c"):
+        provider.generate_response([{"role": "user", "content": content}])
+    assert len(provider._response_cache) == 2
+    
+    # The oldest prompt was evicted
+    provider.generate_response([{"role": "user", "content": "a"}])
+    assert provider.calls == 4
+
+
+def test_empty_response_not_cached():
+    provider = CountingProvider(reply="")
+    provider.generate_response(MESSAGES)
+    provider.generate_response(MESSAGES)
+    assert provider.calls == 2
+
+
+def run_concurrently(provider, count):
+    """Call the provider from count threads while its first call is held open"""
+    provider.release.clear()
+    results = [None] * count
+    
+    def call(i):
+        try:
+            results[i] = provider.generate_response(MESSAGES)
+        except Exception as e:
+            results[i] = e
+    
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    # Let every thread reach the in-flight call before it completes
+    deadline = time.monotonic() + 5
+    while not provider._inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    provider.release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_calls_deduplicated():
+    provider = CountingProvider()
+    results = run_concurrently(provider, 8)
+    assert results == ["reply"] * 8
+    assert provider.calls == 1
+    assert not provider._inflight
+
+
+def test_error_propagates_to_waiters():
+    provider = CountingProvider(error=RuntimeError("API down"))
+    results = run_concurrently(provider, 4)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert provider.calls == 1
+    assert not provider._inflight
+    
+    # The failure isn't cached: the next call tries again
+    provider.error = None
+    assert provider.generate_response(MESSAGES) == "reply"
+    assert provider.calls == 2
@@ -0,0 +1,125 @@
+"""Unit tests for conversation history storage in ConfigManager"""
+
+import io
+import json
+
+import pytest
+
+from src.infrastructure.config_manager import (
+    HISTORY_COMPACT_LINES,
+    HISTORY_MAX_MESSAGES,
+    HISTORY_TAIL_BLOCK,
+    ConfigManager,
+    _read_tail_lines,
+)
+
+
+def tail(data, count):
+    return _read_tail_lines(io.BytesIO(data), count)
+
+
+def test_read_tail_empty_file():
+    assert tail(b"", 5) == ([], 0)
+
+
+def test_read_tail_fewer_lines_than_requested():
+    assert tail(b"a\nb\nc\n", 5) == ([b"a", b"b", b"c"], 3)
+
+
+def test_read_tail_no_trailing_newline():
+    assert tail(b"a\nb\nc", 2) == ([b"b", b"c"], 3)
+
+
+def test_read_tail_skips_blank_lines():
+    assert tail(b"a\n\nb\n\n", 5) == ([b"a", b"b"], 2)
+
+
+@pytest.mark.parametrize("size", [HISTORY_TAIL_BLOCK - 1, HISTORY_TAIL_BLOCK, HISTORY_TAIL_BLOCK + 1])
+def test_read_tail_block_sized_line(size):
+    data = b"x" * (size - 1) + b"\n"
+    assert tail(data, 1) == ([b"x" * (size - 1)], 1)
+
+
+def test_read_tail_line_straddling_block_boundary():
+    # The first kept line starts before the last block and ends inside it
+    long_line = b"y" * HISTORY_TAIL_BLOCK
+    data = b"first\n" + long_line + b"\nlast\n"
+    assert tail(data, 2) == ([long_line, b"last"], 3)
+
+
+def test_read_tail_partial_read_has_no_total():
+    lines = [b"%06d" % i for i in range(5000)]
+    data = b"\n".join(lines) + b"\n"
+    assert len(data) > HISTORY_TAIL_BLOCK
+    assert tail(data, 3) == (lines[-3:], None)
+
+
+def test_read_tail_drops_partial_first_line():
+    # A block boundary falling mid-line must not yield the cut fragment
+    lines = [b"line-%05d" % i for i in range(2000)]
+    data = b"\n".join(lines) + b"\n"
+    assert tail(data, 900)[0] == lines[-900:]
+
+
+def message(i):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+
+
+def test_history_append_and_load(tmp_path):
+    manager = ConfigManager(base_dir=str(tmp_path))
+    assert manager.load_conversation_history() == []
+    
+    for i in range(HISTORY_MAX_MESSAGES + 5):
+        assert manager.append_conversation_message(message(i))
+    
+    history = ConfigManager(base_dir=str(tmp_path)).load_conversation_history()
+    assert history == [message(i) for i in range(5, HISTORY_MAX_MESSAGES + 5)]
+
+
+def test_history_compacted(tmp_path):
+    manager = ConfigManager(base_dir=str(tmp_path))
+    for i in range(HISTORY_COMPACT_LINES + 1):
+        manager.append_conversation_message(message(i))
+    
+    lines = manager.conversation_history_file.read_bytes().splitlines()
+    assert len(lines) <= HISTORY_MAX_MESSAGES
+    assert json.loads(lines[-1]) == message(HISTORY_COMPACT_LINES)
+
+
+def test_legacy_history_migrated(tmp_path):
+    legacy = [message(i) for i in range(HISTORY_MAX_MESSAGES + 3)]
+    legacy_file = tmp_path / "conversation_history.json"
+    legacy_file.write_text(json.dumps({"history": legacy}), encoding="utf-8")
+    
+    manager = ConfigManager(base_dir=str(tmp_path))
+    assert manager.load_conversation_history() == legacy[-HISTORY_MAX_MESSAGES:]
+    assert not legacy_file.exists()
+    assert manager.conversation_history_file.exists()
+    
+    # Later loads and appends use the JSONL file
+    manager.append_conversation_message(message(100))
+    history = ConfigManager(base_dir=str(tmp_path)).load_conversation_history()
+    assert history[-1] == message(100)
+    assert history[:-1] == legacy[-(HISTORY_MAX_MESSAGES - 1):]
+
+
+def test_history_skips_truncated_line(tmp_path):
+    manager = ConfigManager(base_dir=str(tmp_path))
+    manager.append_conversation_messages([message(0), message(1)])
+    with open(manager.conversation_history_file, "ab") as f:
+        f.write(b'{"role": "user", "cont')
+    
+    assert ConfigManager(base_dir=str(tmp_path)).load_conversation_history() == [message(0), message(1)]
+
+
+def test_append_after_truncated_line(tmp_path):
+    manager = ConfigManager(base_dir=str(tmp_path))
+    manager.append_conversation_messages([message(0), message(1)])
+    with open(manager.conversation_history_file, "ab") as f:
+        f.write(b'{"role": "user", "cont')
+    
+    # The next session's messages start on a new line instead of joining the partial one
+    manager = ConfigManager(base_dir=str(tmp_path))
+    manager.append_conversation_message(message(2))
+    manager.append_conversation_message(message(3))
+    assert ConfigManager(base_dir=str(tmp_path)).load_conversation_history() == [message(i) for i in range(4)]
@@ -0,0 +1,121 @@
+"""Unit tests for the persistent LLM response cache"""
+
+import zlib
+
+import numpy as np
+import pytest
+
+from src.infrastructure.api_clients.llm_cache import LLMCache, cache_request
+
+
+def bag_of_words(text):
+    """Deterministic embedding: word counts hashed into 64 buckets"""
+    vector = np.zeros(64, dtype=np.float32)
+    for word in text.lower().split():
+        vector[zlib.crc32(word.encode()) % 64] += 1.0
+    return vector
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.db")
+    yield cache
+    cache.close()
+
+
+def make_request(cache, question, history=()):
+    messages = list(history) + [{"role": "user", "content": question}]
+    return cache_request(cache, None, "test-model", messages, 0.0, 100)
+
+
+def test_get_set(cache):
+    key = LLMCache.make_key("test-model", [{"role": "user", "content": "hi"}], 0.0, 100)
+    assert cache.get(key) is None
+    cache.set(key, "hello")
+    assert cache.get(key) == "hello"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_covers_parameters():
+    messages = [{"role": "user", "content": "hi"}]
+    key = LLMCache.make_key("test-model", messages, 0.0, 100)
+    assert key == LLMCache.make_key("test-model", messages, 0.0, 100)
+    assert key != LLMCache.make_key("other-model", messages, 0.0, 100)
+    assert key != LLMCache.make_key("test-model", messages, 0.0, 200)
+    assert key != LLMCache.make_key("test-model", messages, 0.0, 100, top_p=0.5)
+
+
+def test_empty_response_not_cached(cache):
+    cache.set("key", "")
+    assert cache.get("key") is None
+
+
+def test_only_deterministic_requests_cached(cache):
+    messages = [{"role": "user", "content": "hi"}]
+    assert cache_request(cache, None, "test-model", messages, 0.7, 100) is None
+    assert cache_request(cache, True, "test-model", messages, 0.7, 100) is not None
+    assert cache_request(cache, False, "test-model", messages, 0.0, 100) is None
+    assert cache_request(None, True, "test-model", messages, 0.0, 100) is None
+
+
+def test_lookup_store(cache):
+    request = make_request(cache, "what is the capital of france")
+    assert cache.lookup(request) is None
+    cache.store(request, "Paris")
+    assert cache.lookup(request) == "Paris"
+
+
+def test_persists_across_instances(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.db")
+    cache.store(make_request(cache, "what is the capital of france"), "Paris")
+    cache.close()
+    
+    cache = LLMCache(tmp_path / "llm_cache.db")
+    try:
+        assert cache.lookup(make_request(cache, "what is the capital of france")) == "Paris"
+    finally:
+        cache.close()
+
+
+@pytest.fixture
+def semantic_cache(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.db", embed=bag_of_words)
+    yield cache
+    cache.close()
+
+
+def test_semantic_hit(semantic_cache):
+    semantic_cache.store(make_request(semantic_cache, "what is the capital of france"), "Paris")
+    assert semantic_cache.lookup(make_request(semantic_cache, "what is the capital of france ?")) == "Paris"
+    assert semantic_cache.semantic_hits == 1
+    assert semantic_cache.lookup(make_request(semantic_cache, "tell me a joke about cats")) is None
+
+
+def test_semantic_hit_requires_same_context(semantic_cache):
+    semantic_cache.store(make_request(semantic_cache, "what is the capital of france"), "Paris")
+    history = [{"role": "user", "content": "answer in german"}, {"role": "assistant", "content": "ok"}]
+    assert semantic_cache.lookup(make_request(semantic_cache, "what is the capital of france ?", history)) is None
+
+
+def test_semantic_index_persists(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.db", embed=bag_of_words)
+    cache.store(make_request(cache, "what is the capital of france"), "Paris")
+    cache.close()
+    
+    cache = LLMCache(tmp_path / "llm_cache.db", embed=bag_of_words)
+    try:
+        assert cache.lookup(make_request(cache, "what is the capital of france ?")) == "Paris"
+    finally:
+        cache.close()
+
+
+def test_semantic_index_bounded(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.db", embed=bag_of_words)
+    cache.semantic_max_entries = 8
+    try:
+        for i in range(20):
+            cache.store(make_request(cache, f"question number {i}"), f"answer {i}")
+            assert cache._sem_size <= cache.semantic_max_entries
+        assert cache._sem_texts[-1] == "answer 19"
+    finally:
+        cache.close()
@@ -0,0 +1,22 @@
+"""Unit tests for validating profile extractor output"""
+
+from src.domain.ai.profile_extractor import ExtractedProfile
+
+
+def test_items_coerced():
+    extracted = ExtractedProfile.model_validate({
+        "name": None,
+        "facts": ["a", 3, None],
+        "goals": "learn piano",
+        "preferences": {"food": ["pizza"], "drink": None},
+    })
+    assert extracted.name is None
+    assert extracted.facts == ["a", "3"]
+    assert extracted.goals == ["learn piano"]
+    assert extracted.preferences == {"food": "pizza"}
+
+
+def test_invalid_field_defaults():
+    extracted = ExtractedProfile.model_validate({"name": "Sam", "important_dates": "soon"})
+    assert extracted.name == "Sam"
+    assert extracted.important_dates == {}
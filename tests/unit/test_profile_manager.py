@@ -0,0 +1,84 @@
+"""Unit tests for loading and saving the user profile"""
+
+import json
+
+from src.domain.profile.profile_manager import ProfileManager
+
+
+def write_profile(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_missing_file_gives_empty_profile(tmp_path):
+    manager = ProfileManager(tmp_path / "user_profile.json")
+    assert manager.profile.is_empty()
+
+
+def test_loosely_typed_profile_loaded(tmp_path):
+    profile_file = tmp_path / "user_profile.json"
+    write_profile(profile_file, {
+        "name": "  Sam ",
+        "personality_traits": "curious",
+        "goals": ["learn piano", None, ""],
+        "facts": ["likes tea", 3, None],
+        "preferences": {"food": ["pizza", "tacos"], "music": "jazz", "color": None},
+        "important_dates": {"birthday": "May 1", "anniversary": None},
+        "conversation_count": "7",
+    })
+    
+    profile = ProfileManager(profile_file).profile
+    assert profile.name == "Sam"
+    assert profile.personality_traits == ["curious"]
+    assert profile.goals == ["learn piano"]
+    assert profile.facts == ["likes tea", "3"]
+    assert profile.preferences == {"food": "pizza, tacos", "music": "jazz"}
+    assert profile.important_dates == {"birthday": "May 1"}
+    assert profile.conversation_count == 7
+
+
+def test_legacy_profile_missing_fields_loaded(tmp_path):
+    profile_file = tmp_path / "user_profile.json"
+    write_profile(profile_file, {"name": "Sam", "facts": ["likes tea"]})
+    
+    profile = ProfileManager(profile_file).profile
+    assert profile.name == "Sam"
+    assert profile.facts == ["likes tea"]
+    assert profile.preferences == {}
+    assert profile.conversation_count == 0
+
+
+def test_unreadable_profile_backed_up(tmp_path):
+    profile_file = tmp_path / "user_profile.json"
+    profile_file.write_text("{broken", encoding="utf-8")
+    
+    manager = ProfileManager(profile_file)
+    assert manager.profile.is_empty()
+    assert (tmp_path / "user_profile.json.bak").read_text(encoding="utf-8") == "{broken"
+
+
+def test_unreadable_profile_not_overwritten_without_backup(tmp_path, monkeypatch):
+    profile_file = tmp_path / "user_profile.json"
+    profile_file.write_text("{broken", encoding="utf-8")
+    
+    def fail_copy(*args, **kwargs):
+        raise OSError("disk full")
+    
+    monkeypatch.setattr("src.domain.profile.profile_manager.shutil.copy2", fail_copy)
+    manager = ProfileManager(profile_file)
+    manager.profile.name = "Sam"
+    assert not manager.save_profile()
+    assert profile_file.read_text(encoding="utf-8") == "{broken"
+
+
+def test_save_and_reload(tmp_path):
+    profile_file = tmp_path / "user_profile.json"
+    manager = ProfileManager(profile_file)
+    manager.profile.name = "Sam"
+    manager.profile.facts = ["likes tea"]
+    manager.profile.preferences = {"food": "pizza"}
+    assert manager.save_profile()
+    
+    profile = ProfileManager(profile_file).profile
+    assert profile.name == "Sam"
+    assert profile.facts == ["likes tea"]
+    assert profile.preferences == {"food": "pizza"}
@@ -0,0 +1,56 @@
+"""Unit tests for the persistent startup-check cache"""
+
+from src.infrastructure import startup_cache
+
+
+def make_probe(monkeypatch, tmp_path, results, cache_if=None):
+    """Memoized function returning results[arg], recording its calls and key computations"""
+    monkeypatch.setattr(startup_cache, "CACHE_DIR", tmp_path)
+    calls, keys = [], []
+    
+    def key_fn(arg):
+        keys.append(arg)
+        return arg
+    
+    @startup_cache.persistent_memoize(key_fn, cache_if=cache_if)
+    def probe(arg):
+        calls.append(arg)
+        return results[arg]
+    
+    return probe, calls, keys
+
+
+def test_results_persist(monkeypatch, tmp_path):
+    probe, calls, _ = make_probe(monkeypatch, tmp_path, {"a": 1})
+    assert probe("a") == 1
+    assert probe("a") == 1
+    assert calls == ["a"]
+    
+    # A new process loads the stored result
+    probe, calls, _ = make_probe(monkeypatch, tmp_path, {"a": 2})
+    assert probe("a") == 1
+    assert calls == []
+
+
+def test_only_selected_results_stored(monkeypatch, tmp_path):
+    results = {"ok": None, "broken": "ImportError"}
+    probe, calls, keys = make_probe(monkeypatch, tmp_path, results, cache_if=lambda result: result is not None)
+    
+    # Nothing cached yet: no key is computed for a result that isn't stored
+    assert probe("ok") is None
+    assert keys == []
+    
+    assert probe("broken") == "ImportError"
+    assert probe("broken") == "ImportError"
+    assert probe("ok") is None
+    assert calls == ["ok", "broken", "ok"]
+    assert not (tmp_path / "probe.tmp").exists()
+
+
+def test_cache_clear(monkeypatch, tmp_path):
+    probe, calls, _ = make_probe(monkeypatch, tmp_path, {"a": 1})
+    probe("a")
+    probe.cache_clear()
+    assert not (tmp_path / "probe.pkl").exists()
+    probe("a")
+    assert calls == ["a", "a"]
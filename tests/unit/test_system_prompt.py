@@ -0,0 +1,30 @@
+"""Unit tests for system prompts with a static prefix"""
+
+import json
+import pickle
+
+from src.infrastructure.api_clients.system_prompt import SystemPrompt
+
+
+def test_static_only():
+    prompt = SystemPrompt("You are a cat.")
+    assert prompt == "You are a cat."
+    assert prompt.static == "You are a cat."
+    assert prompt.dynamic == ""
+
+
+def test_static_and_dynamic():
+    prompt = SystemPrompt("You are a cat.", "Relevant memory:\nU: hi")
+    assert prompt == "You are a cat.\n\nRelevant memory:\nU: hi"
+    assert prompt.static == "You are a cat."
+    assert prompt.dynamic == "Relevant memory:\nU: hi"
+
+
+def test_behaves_as_plain_string():
+    prompt = SystemPrompt("You are a cat.", "Relevant memory")
+    assert json.dumps({"sys": prompt}) == json.dumps({"sys": str(prompt)})
+    assert hash(prompt) == hash(str(prompt))
+    
+    restored = pickle.loads(pickle.dumps(prompt))
+    assert restored == prompt
+    assert restored.static == "You are a cat."